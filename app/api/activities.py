@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
 from app.db.database import get_db
 from app.models.activity import Activity
 from app.models.activity_meta import ActivityLike, ActivityComment, ActivityJoin
 from app.schemas.activity import ActivityCreate, ActivityOut, ActivityCommentCreate, ActivityCommentOut
+from app.schemas.discovery import ClassSlotOut
+from app.services.class_discovery import (
+    DEFAULT_RADIUS_KM, DEFAULT_WINDOW_HOURS, MAX_DISCOVERY_RESULTS, discover_classes, release_activity_spot,
+    reserve_activity_spot
+)
 from app.api.deps import get_current_business
 from app.api.auth import get_current_user   # <-- ADD THIS
 from app.models.business import Business
@@ -48,6 +55,41 @@ def create_activity(
 def list_activities(db: Session = Depends(get_db)):
     return db.query(Activity).filter(Activity.is_active == True).all()
 
+# Classes and activities near a point, starting soon, with spots left
+@router.get("/discover", response_model=list[ClassSlotOut])
+def discover_activities(
+    latitude: float = Query(..., ge=-90, le=90, description="User's current latitude"),
+    longitude: float = Query(..., ge=-180, le=180, description="User's current longitude"),
+    radius_km: float = Query(DEFAULT_RADIUS_KM, gt=0, le=100, description="Search radius in km"),
+    within_hours: float = Query(DEFAULT_WINDOW_HOURS, gt=0, le=168, description="Starting within this many hours"),
+    starts_from: Optional[datetime] = Query(None, description="Start of the window; defaults to now"),
+    min_spots: int = Query(1, ge=0, description="Minimum open spots; 0 includes full classes"),
+    kind: Optional[str] = Query(None, pattern="^(schedule|activity)$", description="Only schedules or activities"),
+    limit: int = Query(50, ge=1, le=MAX_DISCOVERY_RESULTS),
+    db: Session = Depends(get_db)
+):
+    results = discover_classes(
+        db, latitude, longitude, radius_km=radius_km, starts_from=starts_from,
+        within_hours=within_hours, min_spots=min_spots, kind=kind, limit=limit
+    )
+    return [
+        ClassSlotOut(
+            kind=slot.kind,
+            source_id=slot.source_id,
+            business_id=slot.business_id,
+            title=slot.title,
+            location=slot.location,
+            latitude=slot.latitude,
+            longitude=slot.longitude,
+            start_time=slot.start_time,
+            end_time=slot.end_time,
+            capacity=slot.capacity,
+            spots_left=None if slot.capacity is None else max(0, slot.capacity - slot.booked),
+            distance_km=round(distance_km, 3),
+        )
+        for slot, distance_km in results
+    ]
+
 # List business-specific activities
 @router.get("/my-activities", response_model=list[ActivityOut])
 def list_my_activities(
@@ -178,14 +220,31 @@ def join_activity(activity_id: int, db: Session = Depends(get_db), current_user:
     join = db.query(ActivityJoin).filter_by(activity_id=activity_id, user_id=current_user.id).first()
     if join:
         raise HTTPException(status_code=400, detail="Already joined")
-    db.add(ActivityJoin(activity_id=activity_id, user_id=current_user.id))
-    # increment join_count
     activity = db.query(Activity).filter_by(id=activity_id).first()
-    if activity:
-        activity.join_count += 1
+    # The join is unique per user, so of two concurrent joins only one goes on to take a spot
+    try:
+        with db.begin_nested():
+            db.add(ActivityJoin(activity_id=activity_id, user_id=current_user.id))
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Already joined")
+    if activity and not reserve_activity_spot(db, activity_id):
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Activity is full")
     db.commit()
     return {"message": "Joined"}
 
+# Leave an activity
+@router.delete("/{activity_id}/join")
+def leave_activity(activity_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    left = db.query(ActivityJoin).filter_by(
+        activity_id=activity_id, user_id=current_user.id
+    ).delete(synchronize_session=False)
+    if not left:
+        raise HTTPException(status_code=404, detail="Not joined")
+    release_activity_spot(db, activity_id)
+    db.commit()
+    return {"message": "Left"}
+
 # Get likes count on an activity
 @router.get("/{activity_id}/likes/count")
 def get_activity_likes_count(
@@ -1,22 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from collections import defaultdict
 from app.db.database import get_db
-from app.models.analytics import AnalyticsEvent, BusinessMetrics
+from app.models.analytics import AnalyticsEvent, BusinessMetrics, AnalyticsSession, BusinessBenchmark
 from app.models.payment import Payment
 from app.models.booking import Booking
 from app.models.activity import Activity
 from app.models.user import User
 from app.models.member import Member, MemberInvoice
 from app.schemas.analytics import (
-    AnalyticsEventCreate, AnalyticsEventOut, BusinessMetricsOut,
+    AnalyticsEventCreate, AnalyticsEventOut, AnalyticsSessionOut, BusinessMetricsOut,
     DashboardMetrics, RevenueAnalytics, UserAnalytics, 
-    ActivityAnalytics, ConversionFunnel
+    ActivityAnalytics, ConversionFunnel, MetricQuantilesOut, BusinessBenchmarkOut
 )
-from app.api.deps import get_current_business, get_current_user
+from app.api.deps import get_current_business, get_current_user, get_current_admin
+from app.services.sessionizer import run_sessionizer
+from app.services.event_sampling import event_sampler
+from app.services.metrics_rollup import rollup_business_metrics
+from app.services.peer_benchmarks import compute_peer_benchmarks
+from app.services.metric_sketch_service import metric_quantiles, SKETCH_METRICS
 
 router = APIRouter()
 
@@ -61,10 +67,18 @@ def track_event(
     current_business = Depends(get_current_business),
     current_user = Depends(get_current_user)
 ):
-    """Track an analytics event"""
+    """Track an analytics event. High volume, low value event types may be sampled."""
+    weight = event_sampler.decide(current_business.id, event_data.event_type)
+    if weight is None:
+        return JSONResponse(
+            status_code=202,
+            content={"message": "Event sampled out", "event_type": event_data.event_type}
+        )
+
     event = AnalyticsEvent(
         business_id=current_business.id,
         user_id=current_user.id,
+        sample_weight=weight,
         **event_data.dict()
     )
     
@@ -99,6 +113,88 @@ def get_events(
     
     return query.order_by(desc(AnalyticsEvent.event_timestamp)).limit(limit).all()
 
+@router.get("/events/timeseries")
+def get_event_timeseries(
+    db: Session = Depends(get_db),
+    current_business = Depends(get_current_business),
+    event_type: Optional[str] = Query(None),
+    interval: str = Query("day", description="day or hour"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None)
+):
+    """Get weighted event counts per time bucket (sampled events count 1/p each)"""
+    if interval not in ("day", "hour"):
+        raise HTTPException(status_code=400, detail="interval must be 'day' or 'hour'")
+
+    day_bucket = func.date(AnalyticsEvent.event_timestamp)
+    columns = [day_bucket.label("day")]
+    if interval == "hour":
+        columns.append(func.extract('hour', AnalyticsEvent.event_timestamp).label("hour"))
+
+    query = db.query(
+        *columns,
+        AnalyticsEvent.event_type,
+        func.sum(AnalyticsEvent.sample_weight).label("count")
+    ).filter(AnalyticsEvent.business_id == current_business.id)
+
+    if event_type:
+        query = query.filter(AnalyticsEvent.event_type == event_type)
+    if date_from:
+        query = query.filter(day_bucket >= date_from)
+    if date_to:
+        query = query.filter(day_bucket <= date_to)
+
+    group_columns = columns + [AnalyticsEvent.event_type]
+    rows = query.group_by(*group_columns).order_by(*columns).all()
+
+    series = []
+    for row in rows:
+        bucket = str(row.day)
+        if interval == "hour":
+            bucket = f"{row.day} {int(row.hour):02d}:00"
+        series.append({
+            "bucket": bucket,
+            "event_type": row.event_type,
+            "count": round(float(row.count or 0), 2)
+        })
+    return series
+
+# Sessions
+@router.get("/sessions", response_model=List[AnalyticsSessionOut])
+def get_sessions(
+    db: Session = Depends(get_db),
+    current_business = Depends(get_current_business),
+    user_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(100, le=1000)
+):
+    """Get sessionized analytics events for the current business"""
+    query = db.query(AnalyticsSession).filter(
+        AnalyticsSession.business_id == current_business.id
+    )
+
+    if user_id:
+        query = query.filter(AnalyticsSession.user_id == user_id)
+    if date_from:
+        query = query.filter(func.date(AnalyticsSession.started_at) >= date_from)
+    if date_to:
+        query = query.filter(func.date(AnalyticsSession.started_at) <= date_to)
+
+    return query.order_by(desc(AnalyticsSession.started_at)).limit(limit).all()
+
+@router.post("/sessions/sessionize")
+def sessionize_events(
+    gap_minutes: int = Query(30, ge=1, description="Inactivity gap that closes a session"),
+    lateness_minutes: int = Query(5, ge=0, description="How late an event may be recorded and still be sessionized"),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Run the streaming sessionizer over events since the last run's watermark"""
+    return run_sessionizer(
+        db, gap=timedelta(minutes=gap_minutes), allowed_lateness=timedelta(minutes=lateness_minutes)
+    )
+
 # Dashboard Analytics
 @router.get("/dashboard", response_model=DashboardMetrics)
 def get_dashboard_metrics(
@@ -130,7 +226,7 @@ def get_dashboard_metrics(
         )
     ).scalar() or 0
     
-    current_check_ins = db.query(func.count(AnalyticsEvent.id)).filter(
+    current_check_ins = db.query(func.sum(AnalyticsEvent.sample_weight)).filter(
         and_(
             AnalyticsEvent.business_id == current_business.id,
             AnalyticsEvent.event_type == "check_in",
@@ -162,7 +258,7 @@ def get_dashboard_metrics(
     # Real peak hours data from check-ins
     peak_hours_data = db.query(
         func.extract('hour', AnalyticsEvent.event_timestamp).label('hour'),
-        func.count(AnalyticsEvent.id).label('count')
+        func.sum(AnalyticsEvent.sample_weight).label('count')
     ).filter(
         and_(
             AnalyticsEvent.business_id == current_business.id,
@@ -174,7 +270,7 @@ def get_dashboard_metrics(
     
     # Format peak hours data
     peak_hours_list = [
-        {"hour": f"{int(hour):02d}:00", "count": count}
+        {"hour": f"{int(hour):02d}:00", "count": int(round(count or 0))}
         for hour, count in peak_hours_data
     ]
     
@@ -185,7 +281,7 @@ def get_dashboard_metrics(
     return DashboardMetrics(
         total_revenue=current_revenue,
         total_transactions=current_transactions,
-        total_check_ins=current_check_ins,
+        total_check_ins=int(round(current_check_ins)),
         total_members=total_members,
         active_members=active_members,
         new_members=new_members,
@@ -266,6 +362,61 @@ def get_business_metrics(
     
     return query.order_by(BusinessMetrics.date.desc()).all()
 
+@router.post("/metrics/rollup")
+def run_metrics_rollup(
+    day: Optional[date] = Query(None, description="Day to roll up (defaults to yesterday)"),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Recompute the daily BusinessMetrics rollup for every business"""
+    day = day or date.today() - timedelta(days=1)
+    written = rollup_business_metrics(db, day)
+    return {"date": day, "businesses": written}
+
+@router.get("/benchmarks", response_model=BusinessBenchmarkOut)
+def get_peer_benchmarks(
+    db: Session = Depends(get_db),
+    current_business = Depends(get_current_business)
+):
+    """Get how the business compares with gyms in the same state and center type"""
+    benchmark = db.query(BusinessBenchmark).filter(
+        BusinessBenchmark.business_id == current_business.id
+    ).first()
+    if not benchmark:
+        raise HTTPException(status_code=404, detail="Benchmarks have not been computed yet")
+    return benchmark
+
+@router.post("/benchmarks/compute")
+def run_peer_benchmarks(
+    period_days: int = Query(30, ge=1, le=365),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Nightly job: recompute peer benchmark percentiles for every business"""
+    written = compute_peer_benchmarks(db, period_days=period_days)
+    return {"businesses": written, "period_days": period_days}
+
+@router.get("/metrics/quantiles", response_model=MetricQuantilesOut)
+def get_metric_quantiles(
+    metric: str = Query(..., description="session_duration or payment_amount"),
+    q: str = Query("0.5,0.9,0.99", description="Comma separated quantiles between 0 and 1"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_business = Depends(get_current_business)
+):
+    """Get p50/p90/p99 style quantiles by merging the daily sketches in the range"""
+    if metric not in SKETCH_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric. Use one of: {', '.join(SKETCH_METRICS)}")
+    try:
+        quantiles = [float(value) for value in q.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Quantiles must be numbers between 0 and 1")
+    if not quantiles or any(value < 0 or value > 1 for value in quantiles):
+        raise HTTPException(status_code=400, detail="Quantiles must be numbers between 0 and 1")
+
+    return metric_quantiles(db, current_business.id, metric, quantiles, date_from, date_to)
+
 # Admin Analytics Endpoints
 @router.get("/checkins")
 def get_checkin_analytics(
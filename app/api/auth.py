@@ -11,8 +11,7 @@ from app.models.user import User
 from app.db.database import get_db
 from app.utils.email import send_reset_email  # Optional, mock for now
 from sqlalchemy import func
-from app.models.check_in import CheckIn
-from app.models.check_out import CheckOut
+from app.services.occupancy import user_dwell_summary
 from app.models.community import CommunityMember, Community
 import re
 from app.models.business import Business
@@ -160,25 +159,8 @@ def get_profile(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Calculate total check-in time per center
-    checkins = db.query(CheckIn).filter(CheckIn.user_id == current_user.id).all()
-    checkouts = db.query(CheckOut).filter(CheckOut.user_id == current_user.id).all()
-    checkin_map = {(c.center_id, c.id): c for c in checkins}
-    checkout_map = {(c.center_id, c.checkin_id): c for c in checkouts}
-
-    center_time = {}
-    for (center_id, checkin_id), checkin in checkin_map.items():
-        checkout = checkout_map.get((center_id, checkin_id))
-        if checkout and checkout.checked_out_at and checkin.checked_in_at:
-            minutes = int((checkout.checked_out_at - checkin.checked_in_at).total_seconds() // 60)
-            if center_id not in center_time:
-                center_time[center_id] = {"total_minutes": 0, "center_name": getattr(checkin, "center_name", str(center_id))}
-            center_time[center_id]["total_minutes"] += max(minutes, 0)
-
-    checkin_summary = [
-        {"center_id": cid, "center_name": data["center_name"], "total_minutes": data["total_minutes"]}
-        for cid, data in center_time.items()
-    ]
+    # Total time per center, kept as visits close
+    checkin_summary = user_dwell_summary(db, current_user.id)
 
     # Achievements: communities joined
     communities_joined = db.query(CommunityMember).filter(CommunityMember.user_id == current_user.id).count()
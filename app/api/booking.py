@@ -9,6 +9,7 @@ from app.models.booking import Booking, BookingStatus
 from app.models.user import User
 from app.models.business import Business
 from app.api.deps import get_current_business
+from app.services.class_discovery import RELEASED_STATUSES, release_schedule_spot, reserve_schedule_spot
 
 router = APIRouter()
 
@@ -158,9 +159,21 @@ def update_booking(
     
     verify_business_access(db, booking.business_id, current_business)
     
+    was_released = booking.status in RELEASED_STATUSES
     for field, value in booking_update.dict(exclude_unset=True).items():
         setattr(booking, field, value)
     
+    # Keep the schedule's spot count in step with the booking holding or giving up its spot
+    if booking.schedule_id is not None and was_released != (booking.status in RELEASED_STATUSES):
+        if was_released and not reserve_schedule_spot(db, booking.schedule_id):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Schedule is fully booked"
+            )
+        if not was_released:
+            release_schedule_spot(db, booking.schedule_id)
+    
     try:
         db.commit()
         db.refresh(booking)
@@ -233,6 +246,8 @@ def reject_booking(
     
     booking.status = BookingStatus.rejected
     booking.rejection_reason = reason
+    if booking.schedule_id is not None:
+        release_schedule_spot(db, booking.schedule_id)
     
     try:
         db.commit()
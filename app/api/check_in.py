@@ -1,23 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import List, Optional
+from app.core.config import settings
 from app.models.user import User
 from app.models.center import Center
 from app.db.database import get_db
 from app.api.auth import get_current_user
-from app.schemas.check_in import CheckInRequest, QRCodeResponse, ScanConfirmRequest, CheckInHistoryCenterOut
-import qrcode
-import io
-import base64
+from app.api.deps import get_current_admin, get_current_business
+from app.models.business import Business
+from app.models.occupancy import CenterOccupancy
+from app.schemas.check_in import (
+    CheckInRequest, QRCodeResponse, ScanConfirmRequest, CheckInHistoryCenterOut,
+    CenterOccupancyOut, OccupancyLimitUpdate
+)
 from app.models.check_in import CheckIn
 from app.models.analytics import AnalyticsEvent
+from app.services.flex_credits import center_credit_cost, deduct_flex_credit
+from app.services.occupancy import admit, business_occupancy, close_stale_visits, is_full
+from app.services.occupancy_feed import mark_occupancy_changed, occupancy_feed
+from app.services.qr_render import PNG, QR_FORMAT_PATTERN, render_qr
+from app.services.qr_tokens import InvalidQRToken, ReplayedQRToken, check_qr_token, issue_qr_token, spend_qr_token, verify_qr_token
+from app.services.scan_windows import once_per_scan_window
 
 router = APIRouter()
 
+# How often an idle occupancy stream sends a comment line
+OCCUPANCY_KEEP_ALIVE_SECONDS = 15.0
+
 @router.post("/", response_model=QRCodeResponse)
 def check_in(
     request: CheckInRequest,
+    qr_format: str = Query(PNG, alias="format", pattern=QR_FORMAT_PATTERN, description="png, svg, or token to render client side"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -38,6 +56,9 @@ def check_in(
         if not member.is_active:
             raise HTTPException(status_code=400, detail="Member is not active")
         
+        if admit(db, request.center_id, member_id=member.id) is None:
+            raise HTTPException(status_code=409, detail="Center is at full capacity")
+        
         # Create check-in record for member
         check_in_record = CheckIn(
             user_id=None,
@@ -80,56 +101,44 @@ def check_in(
             status_code=402,
             detail="Insufficient flex credit. Please top up to check in."
         )
-    # Generate QR code with user ID, center ID, and timestamp
-    payload = {
-        "user_id": user.id,
-        "center_id": center.id,
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    qr_data = f"{payload['user_id']}|{payload['center_id']}|{payload['timestamp']}"
-    qr_img = qrcode.make(qr_data)
-    buf = io.BytesIO()
-    qr_img.save(buf, format="PNG")
-    qr_base64 = base64.b64encode(buf.getvalue()).decode("utf-8")
+    if is_full(db, center.id):
+        raise HTTPException(status_code=409, detail="Center is at full capacity")
+    # Generate QR code with a signed, short-lived token for this user and center
+    token = issue_qr_token(user.id, center.id)
+    claims = verify_qr_token(token)
     return QRCodeResponse(
         message="Check-in allowed. Show this QR code at the center.",
-        qr_code_base64=qr_base64
+        **render_qr(token, qr_format),
+        token=token,
+        expires_at=datetime.utcfromtimestamp(claims.expires_at)
     )
 
 @router.get("/current")
 def get_current_checked_in_members(
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_business: Business = Depends(get_current_business)
 ):
-    """Get currently checked-in members (business interface)"""
+    """Get members currently checked in at the business's centers (business interface)"""
     from app.models.member import Member
-    from app.api.deps import get_current_business
-    from app.models.business import Business
-    
-    try:
-        # For now, we'll get all businesses since auth might not be set up properly
-        current_checkins = db.query(CheckIn).filter(
-            CheckIn.status == "active",
-            CheckIn.member_id.isnot(None)
-        ).all()
-        
-        checked_in_members = []
-        for checkin in current_checkins:
-            if checkin.member:
-                checked_in_members.append({
-                    "id": checkin.id,
-                    "member_id": checkin.member.id,
-                    "member_name": f"{checkin.member.first_name} {checkin.member.last_name}",
-                    "member_email": checkin.member.email,
-                    "check_in_time": checkin.check_in_time.isoformat(),
-                    "membership_type": checkin.member.membership_type,
-                    "is_active": checkin.member.is_active
-                })
-        
-        return checked_in_members
-        
-    except Exception as e:
-        # Return empty list if there's an error
-        return []
+
+    business_centers = select(Center.id).where(Center.business_id == current_business.id)
+    current_checkins = db.query(CheckIn, Member).join(Member, Member.id == CheckIn.member_id).filter(
+        CheckIn.status == "active",
+        or_(CheckIn.business_id == current_business.id, CheckIn.center_id.in_(business_centers))
+    ).order_by(CheckIn.check_in_time).all()
+
+    return [
+        {
+            "id": checkin.id,
+            "member_id": member.id,
+            "member_name": f"{member.first_name} {member.last_name}",
+            "member_email": member.email,
+            "check_in_time": checkin.check_in_time.isoformat() if checkin.check_in_time else None,
+            "membership_type": member.membership_type,
+            "is_active": member.is_active
+        }
+        for checkin, member in current_checkins
+    ]
 
 @router.post("/scan-confirm")
 def confirm_scan(
@@ -138,34 +147,62 @@ def confirm_scan(
 ):
     """
     Confirm QR scan at center and deduct flex credit.
+    The signed token is verified without a database read and marked spent in spent_qr_tokens.
+    A repeat scan of the same user at the same center within the dedup window
+    (a scanner double read) gets the first scan's result and is not charged.
+    Refused with 409 while the center is at its max_occupancy.
     """
-    user = db.query(User).filter(User.id == data.user_id).first()
-    center = db.query(Center).filter(Center.id == data.center_id).first()
-    if not user or not center:
-        raise HTTPException(status_code=404, detail="User or Center not found")
-    if user.flex_credit < center.credit_required:
-        raise HTTPException(
-            status_code=402,
-            detail="Insufficient flex credit. Please top up."
+    try:
+        claims = check_qr_token(data.token, center_id=data.center_id, user_id=data.user_id)
+    except InvalidQRToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def charge():
+        # Deduct, admit and record the check-in in one short transaction
+        remaining = deduct_flex_credit(
+            db, claims.user_id, center_credit_cost(claims.center_id), reference=f"center:{claims.center_id}"
         )
-    user.flex_credit -= center.credit_required
-    check_in_record = CheckIn(user_id=user.id, center_id=center.id)
-    db.add(check_in_record)
-    
-    # Track analytics event for check-in
-    analytics_event = AnalyticsEvent(
-        business_id=center.business_id if hasattr(center, 'business_id') else None,
-        user_id=user.id,
-        event_type="check_in",
-        event_category="facility_usage",
-        event_properties={"center_id": center.id, "center_name": center.name}
-    )
-    db.add(analytics_event)
-    
-    db.commit()
+        if remaining is None:
+            db.rollback()
+            if not db.query(User.id).filter(User.id == claims.user_id).first() or \
+                    not db.query(Center.id).filter(Center.id == claims.center_id).first():
+                raise HTTPException(status_code=404, detail="User or Center not found")
+            raise HTTPException(
+                status_code=402,
+                detail="Insufficient flex credit. Please top up."
+            )
+        if admit(db, claims.center_id, user_id=claims.user_id) is None:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Center is at full capacity")
+        center = db.query(Center).filter(Center.id == claims.center_id).first()
+        check_in_record = CheckIn(user_id=claims.user_id, center_id=center.id)
+        db.add(check_in_record)
+        
+        # Track analytics event for check-in
+        analytics_event = AnalyticsEvent(
+            business_id=center.business_id if hasattr(center, 'business_id') else None,
+            user_id=claims.user_id,
+            event_type="check_in",
+            event_category="facility_usage",
+            event_properties={"center_id": center.id, "center_name": center.name}
+        )
+        db.add(analytics_event)
+        
+        # Spent last, so a refused scan leaves the QR code usable
+        try:
+            spend_qr_token(db, claims)
+        except ReplayedQRToken as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+        db.commit()
+        return {"remaining_flex_credit": remaining}
+
+    result, _ = once_per_scan_window(claims.user_id, claims.center_id, charge)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Scan already in progress")
     return {
         "message": "Check-in confirmed and credit deducted.",
-        "remaining_flex_credit": user.flex_credit
+        "remaining_flex_credit": result["remaining_flex_credit"]
     }
 
 @router.get("/history/{user_id}", response_model=List[CheckInHistoryCenterOut])
@@ -193,4 +230,80 @@ def get_check_in_history(
             timestamp=record.timestamp
         )
         for record in records
-    ]
\ No newline at end of file
+    ]
+
+async def _occupancy_events(request: Request, business_id: int):
+    """An `occupancy` event with every center's counters whenever one changes"""
+    queue = occupancy_feed.subscribe(business_id)
+    try:
+        while not await request.is_disconnected():
+            try:
+                snapshot = await asyncio.wait_for(queue.get(), OCCUPANCY_KEEP_ALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: occupancy\ndata: {json.dumps(snapshot)}\n\n"
+    finally:
+        occupancy_feed.unsubscribe(business_id, queue)
+
+@router.get("/occupancy", response_model=List[CenterOccupancyOut])
+def get_occupancy(
+    db: Session = Depends(get_db),
+    current_business: Business = Depends(get_current_business)
+):
+    """Visitors currently inside each of the business's centers"""
+    return business_occupancy(db, current_business.id)
+
+@router.get("/occupancy/stream")
+async def stream_occupancy(
+    request: Request,
+    current_business: Business = Depends(get_current_business)
+):
+    """
+    Server-Sent Events feed of the business's live occupancy. The first event has
+    the current counters and another follows each change, so dashboards need not poll.
+    """
+    return StreamingResponse(
+        _occupancy_events(request, current_business.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.put("/occupancy/{center_id}", response_model=CenterOccupancyOut)
+def set_max_occupancy(
+    center_id: int,
+    data: OccupancyLimitUpdate,
+    db: Session = Depends(get_db),
+    current_business: Business = Depends(get_current_business)
+):
+    """Set or remove (null) the most visitors a center admits at once"""
+    center = db.query(Center).filter(Center.id == center_id).first()
+    if not center:
+        raise HTTPException(status_code=404, detail="Center not found")
+    if center.business_id != current_business.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this center")
+    occupancy = db.query(CenterOccupancy).filter(CenterOccupancy.center_id == center_id).first()
+    if occupancy is None:
+        occupancy = CenterOccupancy(center_id=center_id, active=0)
+        db.add(occupancy)
+    occupancy.max_occupancy = data.max_occupancy
+    occupancy.updated_at = datetime.utcnow()
+    mark_occupancy_changed(db, center_id)
+    db.commit()
+    return CenterOccupancyOut(
+        center_id=center.id,
+        center_name=center.name,
+        active=occupancy.active,
+        max_occupancy=occupancy.max_occupancy,
+        updated_at=occupancy.updated_at
+    )
+
+@router.post("/occupancy/sweep")
+def sweep_stale_visits(
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Periodic job: close visits left open longer than VISIT_MAX_HOURS and free their places"""
+    closed = close_stale_visits(db)
+    return {"closed": closed, "max_hours": settings.VISIT_MAX_HOURS}
@@ -7,16 +7,17 @@ from app.models.center import Center
 from app.models.check_out import CheckOut
 from app.db.database import get_db
 from app.api.auth import get_current_user
+from app.services.metric_sketch_service import record_metric_value, SESSION_DURATION
 from app.schemas.check_out import CheckOutRequest, CheckOutQRCodeResponse, CheckOutScanConfirmRequest, CheckOutHistoryCenterOut
-import qrcode
-import io
-import base64
+from app.services.occupancy import depart
+from app.services.qr_render import PNG, QR_FORMAT_PATTERN, render_qr
 
 router = APIRouter()
 
 @router.post("/", response_model=CheckOutQRCodeResponse)
 def check_out(
     request: CheckOutRequest,
+    qr_format: str = Query(PNG, alias="format", pattern=QR_FORMAT_PATTERN, description="png, svg, or token to render client side"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -44,6 +45,14 @@ def check_out(
         
         # Update check-in status to completed
         active_checkin.status = "completed"
+        # Closing the visit records its duration
+        visit = depart(db, active_checkin.center_id or request.center_id, member_id=member.id)
+        if visit is None and active_checkin.check_in_time:
+            # Checked in before visits were tracked
+            duration_minutes = (datetime.utcnow() - active_checkin.check_in_time).total_seconds() / 60
+            record_metric_value(
+                db, active_checkin.business_id or member.business_id, SESSION_DURATION, duration_minutes
+            )
         
         # Create check-out record
         check_out_record = CheckOut(
@@ -72,19 +81,17 @@ def check_out(
         "timestamp": datetime.utcnow().isoformat()
     }
     qr_data = f"{payload['user_id']}|{payload['center_id']}|{payload['timestamp']}|CHECKED_OUT"
-    qr_img = qrcode.make(qr_data)
-    buf = io.BytesIO()
-    qr_img.save(buf, format="PNG")
-    qr_base64 = base64.b64encode(buf.getvalue()).decode("utf-8")
 
-    # Log the check-out
+    # Log the check-out and free the user's place
     check_out_record = CheckOut(user_id=user.id, center_id=center.id)
     db.add(check_out_record)
+    depart(db, center.id, user_id=user.id)
     db.commit()
 
     return CheckOutQRCodeResponse(
         message="Check-out successful. Show this QR code at the center.",
-        qr_code_base64=qr_base64
+        **render_qr(qr_data, qr_format),
+        token=qr_data
     )
 
 @router.post("/scan-confirm")
@@ -1,58 +1,189 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, Request, UploadFile, File, Form, Path
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException, Request, Response, UploadFile, File, Form, Path
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from app.models.center import Center
-from app.schemas.center import CenterOut, CenterCreate, CenterRating, CenterComment
+from app.schemas.center import (
+    CenterOut, CenterClusterOut, CenterFacetsOut, CenterCreate, CenterRating, CenterComment, CenterCommentPage,
+    CenterImportOut
+)
 from app.models.user import User
 from app.db.database import get_db
 from app.api.auth import get_current_user
-# from geopy.distance import geodesic  # Temporarily commented out
+from app.api.deps import get_current_admin
+from app.services.explore_search import SORT_DISTANCE, nearby_centers_page, nearby_facet_counts
+from app.services.center_feedback import add_comment, add_rating, comments_page
+from app.services.center_import import CSV, GEOJSON, IMPORT_FORMATS, import_centers
+from app.services.center_facets import CREDIT_BUCKETS, facet_index
+from app.services.center_hours import local_time
+from app.services.center_clusters import cluster_index
+from app.services.center_catalog import center_catalog
+from app.services.center_snapshots import GZIP_ETAG_SUFFIX, snapshot_store
 import shutil
 import os
 
 router = APIRouter()
 
+DEFAULT_RADIUS_KM = 20
+
 @router.get("/", response_model=List[CenterOut])
 def explore_centers(
     request: Request,
+    response: Response,
     latitude: float = Query(..., description="User's current latitude"),
     longitude: float = Query(..., description="User's current longitude"),
     center_type: Optional[str] = Query(None, description="Filter by center type"),
+    radius_km: float = Query(DEFAULT_RADIUS_KM, gt=0, le=500, description="Search radius in km"),
+    k: Optional[int] = Query(None, ge=1, le=200, description="Page size; enables load-more paging"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    services: Optional[List[str]] = Query(None, description="Required services/amenities"),
+    match: str = Query("all", pattern="^(all|any)$", description="Require all or any of the services"),
+    credit: Optional[List[str]] = Query(None, description="Credit buckets: 1, 2, 3-5, 6+"),
+    open_now: bool = Query(False, description="Only centers open right now"),
+    open_at: Optional[datetime] = Query(None, description="Only centers open at this time (local if no offset)"),
+    sort: str = Query(SORT_DISTANCE, pattern="^(distance|rating)$", description="Nearest first or best rated first"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Show centers/facilities close to the user using their state and current location.
-    Optional filter by center type.
+    Show centers/facilities close to the user's current location, nearest first
+    or, with sort=rating, by Bayesian average rating.
+    Distances come from the in-memory center catalog, so centers across a
+    state line are included. Optional filters by center type, services, credit bucket
+    and opening hours.
+    With `k`, returns one page and sets the X-Next-Cursor header when more remain.
     """
-    # Get all centers in user's state
-    centers_query = db.query(Center).filter(Center.state == current_user.state)
-    if center_type:
-        centers_query = centers_query.filter(Center.center_type == center_type)
-    centers = centers_query.all()
+    if credit and not set(credit) <= {label for label, _, _ in CREDIT_BUCKETS}:
+        raise HTTPException(status_code=400, detail="Unknown credit bucket")
+    center_catalog.refresh(db)
+    allowed = facet_index.matching(services=services, match_all=match == "all", credit_buckets=credit)
+    if open_now and open_at is None:
+        open_at = local_time()
+    try:
+        center_ids, distances, next_cursor = nearby_centers_page(
+            db, latitude, longitude, radius_km, center_type=center_type, k=k, cursor=cursor,
+            allowed=allowed, open_at=open_at, sort=sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if len(center_ids) == 0:
+        return []
+    centers = {
+        center.id: center
+        for center in db.query(Center).filter(Center.id.in_(center_ids.tolist())).all()
+    }
 
-    user_location = (latitude, longitude)
     results = []
-    for center in centers:
-        center_location = (center.latitude, center.longitude)
-        # distance_km = geodesic(user_location, center_location).km
-        # Simple distance calculation as fallback (not accurate but works)
-        distance_km = ((center.latitude - latitude) ** 2 + (center.longitude - longitude) ** 2) ** 0.5 * 111
-        if distance_km <= 20:  # Show centers within 20km radius, adjust as needed
-            results.append(CenterOut(
-                id=center.id,
-                name=center.name,
-                address=center.address,
-                state=center.state,
-                latitude=center.latitude,
-                longitude=center.longitude,
-                center_type=center.center_type,
-                distance_km=round(distance_km, 2)
-            ))
-    # Sort by distance
-    results.sort(key=lambda x: x.distance_km)
+    for center_id, distance_km in zip(center_ids.tolist(), distances.tolist()):
+        center = centers.get(center_id)
+        if center is None:
+            continue
+        results.append(CenterOut(
+            id=center.id,
+            name=center.name,
+            address=center.address,
+            state=center.state,
+            latitude=center.latitude,
+            longitude=center.longitude,
+            center_type=center.center_type,
+            images=center.images or [],
+            services=center.services or [],
+            description=center.description,
+            booking_schedule=center.booking_schedule,
+            credit_required=center.credit_required,
+            rating=center.rating,
+            rating_count=center.rating_count,
+            bayesian_score=center.bayesian_score,
+            distance_km=round(distance_km, 2)
+        ))
     return results
 
+@router.get("/facets", response_model=CenterFacetsOut)
+def explore_facets(
+    latitude: float = Query(..., description="User's current latitude"),
+    longitude: float = Query(..., description="User's current longitude"),
+    center_type: Optional[str] = Query(None, description="Filter by center type"),
+    radius_km: float = Query(DEFAULT_RADIUS_KM, gt=0, le=500, description="Search radius in km"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Counts of centers per service, center type and credit bucket within the radius.
+    """
+    return nearby_facet_counts(db, latitude, longitude, radius_km, center_type=center_type)
+
+@router.get("/clusters", response_model=List[CenterClusterOut])
+def explore_clusters(
+    bbox: str = Query(..., description="Map viewport as min_lon,min_lat,max_lon,max_lat"),
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Clustered center markers for a map viewport.
+    Single-center clusters carry the center_id; zooms past the deepest
+    cluster level use that level.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox minimums must not exceed maximums")
+    return cluster_index.clusters(db, min_lon, min_lat, max_lon, max_lat, zoom)
+
+def _snapshot_version(etag: str) -> str:
+    """The snapshot ETag a (possibly weak or gzip) ETag refers to"""
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    if etag.endswith(GZIP_ETAG_SUFFIX + '"'):
+        etag = etag[:-len(GZIP_ETAG_SUFFIX) - 1] + '"'
+    return etag
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [_snapshot_version(value) for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+@router.get("/snapshots/{state}")
+def download_state_snapshot(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    state: str = Path(..., description="State whose centers to download"),
+    since: Optional[str] = Query(None, description="ETag of the snapshot the client already has"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Offline snapshot of every center in a state (CenterOut fields plus hours bitmaps),
+    gzip encoded with a strong ETag (the gzip representation's ends in -gz).
+    If-None-Match returns 304 when unchanged; with `since` set to an earlier ETag
+    only the changed and removed centers are sent.
+    """
+    snapshot, needs_rebuild = snapshot_store.snapshot(db, state)
+    if needs_rebuild:
+        background_tasks.add_task(snapshot_store.rebuild_in_background, db.get_bind(), state)
+
+    since = _snapshot_version(since) if since else None
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    etag = snapshot.etag[:-1] + GZIP_ETAG_SUFFIX + '"' if use_gzip else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), snapshot.etag) or since == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+
+    body, gzipped = snapshot.body, snapshot.gzipped
+    base = snapshot_store.previous(state, since) if since else None
+    if base is not None:
+        body, gzipped = snapshot.delta_from(base)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=gzipped, media_type="application/json", headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.post("/upload", response_model=CenterOut)
 async def upload_center(
     name: str = Form(...),
@@ -69,6 +200,7 @@ async def upload_center(
     account_name: str = Form(...),
     credit_required: int = Form(...),  # <-- Add this line
     images: List[UploadFile] = File(..., description="Exactly 3 images"),
+    business_id: Optional[int] = Form(None, description="Business that owns the center"),
     db: Session = Depends(get_db)
 ):
     """
@@ -89,6 +221,7 @@ async def upload_center(
     services_list = json.loads(services) if isinstance(services, str) else services
 
     center = Center(
+        business_id=business_id,
         name=name,
         address=address,
         state=state,
@@ -122,9 +255,30 @@ async def upload_center(
         booking_schedule=center.booking_schedule,
         credit_required=center.credit_required,  # <-- Return it in the response
         rating=center.rating,
-        comments=center.comments
+        comments=[]
     )
 
+@router.post("/import", response_model=CenterImportOut)
+def bulk_import_centers(
+    file: UploadFile = File(..., description="CSV with a header row, or a GeoJSON FeatureCollection"),
+    file_format: Optional[str] = Query(None, alias="format", description="csv or geojson; defaults from the file name"),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """
+    Bulk import centers (e.g. a new franchise). Rows that fail validation are
+    reported with their errors and skipped; the rest are inserted.
+    """
+    if file_format is None:
+        name = (file.filename or "").lower()
+        file_format = GEOJSON if name.endswith((".geojson", ".json")) else CSV
+    if file_format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+    try:
+        return import_centers(db, file.file, file_format)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read {file_format} file: {e}")
+
 @router.post("/{center_id}/rate")
 def rate_center(
     center_id: int,
@@ -134,15 +288,17 @@ def rate_center(
     """
     Rate a center/facility.
     """
-    center = db.query(Center).filter(Center.id == center_id).first()
-    if not center:
+    aggregate = add_rating(db, center_id, rating_data.rating)
+    if aggregate is None:
         raise HTTPException(status_code=404, detail="Center not found")
-    # Update average rating
-    total_rating = center.rating * center.rating_count
-    center.rating_count += 1
-    center.rating = (total_rating + rating_data.rating) / center.rating_count
     db.commit()
-    return {"message": "Rating submitted", "new_rating": center.rating}
+    rating, rating_count, bayesian_score = aggregate
+    return {
+        "message": "Rating submitted",
+        "new_rating": rating,
+        "rating_count": rating_count,
+        "bayesian_score": bayesian_score
+    }
 
 @router.post("/{center_id}/comment")
 def comment_center(
@@ -153,29 +309,44 @@ def comment_center(
     """
     Add a comment to a center/facility.
     """
-    center = db.query(Center).filter(Center.id == center_id).first()
-    if not center:
+    if not db.query(Center.id).filter(Center.id == center_id).first():
         raise HTTPException(status_code=404, detail="Center not found")
-    comments = center.comments or []
-    comments.append(comment_data.comment)
-    center.comments = comments
+    add_comment(db, center_id, comment_data.comment)
     db.commit()
     return {"message": "Comment added"}
 
+@router.get("/{center_id}/comments", response_model=CenterCommentPage)
+def get_center_comments(
+    center_id: int = Path(..., description="ID of the center"),
+    before_id: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Comments for a center/facility, newest first.
+    """
+    entries, next_cursor = comments_page(db, center_id, before_id=before_id, limit=limit)
+    return CenterCommentPage(comments=entries, next_cursor=next_cursor)
+
 @router.get("/{center_id}/feedback")
 def get_center_feedback(
     center_id: int = Path(..., description="ID of the center"),
+    limit: int = Query(20, ge=1, le=100, description="Number of newest comments to include"),
     db: Session = Depends(get_db)
 ):
     """
-    Get all comments and the average rating for a center/facility.
+    Get the newest comments and the average rating for a center/facility.
+    Older comments are paged through /{center_id}/comments.
     """
     center = db.query(Center).filter(Center.id == center_id).first()
     if not center:
         raise HTTPException(status_code=404, detail="Center not found")
+    entries, next_cursor = comments_page(db, center_id, limit=limit)
     return {
         "center_id": center.id,
         "average_rating": center.rating,
-        "rating_count": getattr(center, "rating_count", 0),
-        "comments": center.comments or []
-    }
\ No newline at end of file
+        "rating_count": center.rating_count or 0,
+        "bayesian_score": center.bayesian_score,
+        "comments": [entry.comment for entry in entries],
+        "next_cursor": next_cursor
+    }
@@ -8,6 +8,7 @@ from app.schemas.member import (
     MemberInvoiceCreate, MemberInvoiceOut, MemberInvoiceUpdateStatus
 )
 from app.api.deps import get_current_business
+from app.services.metric_sketch_service import record_metric_value, PAYMENT_AMOUNT
 from datetime import datetime, timedelta
 from typing import List
 
@@ -266,6 +267,7 @@ def add_payment(
         payment_method=payment.payment_method or "card"
     )
     db.add(db_payment)
+    record_metric_value(db, member.business_id, PAYMENT_AMOUNT, payment.amount)
     
     # Update member status when payment is made
     member.payment_status = "paid"
@@ -1,12 +1,16 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc, func
 from typing import List, Optional
 from datetime import datetime, date, timedelta
+from app.core.config import settings
 from app.db.database import get_db
 from app.models.payment import Payment
-from app.schemas.payment import PaymentCreate, PaymentOut, PaymentUpdate
-from app.api.deps import get_current_business, get_current_user
+from app.schemas.payment import PaymentCreate, PaymentOut, PaymentUpdate, CreditBalanceOut, CreditLedgerPage
+from app.api.deps import get_current_admin, get_current_business, get_current_user
+from app.services.credit_ledger import credit_totals, ledger_page, snapshot_credit_balances
+from app.services.metric_sketch_service import record_metric_value, PAYMENT_AMOUNT
 
 router = APIRouter()
 
@@ -23,6 +27,7 @@ def create_payment(
     )
     
     db.add(payment)
+    record_metric_value(db, payment.business_id, PAYMENT_AMOUNT, payment.amount)
     db.commit()
     db.refresh(payment)
     return payment
@@ -179,6 +184,7 @@ def create_user_payment(
     )
     
     db.add(payment)
+    record_metric_value(db, payment.business_id, PAYMENT_AMOUNT, payment.amount)
     db.commit()
     db.refresh(payment)
     return payment
@@ -215,7 +221,8 @@ def topup_flex_credits(
     current_user = Depends(get_current_user)
 ):
     """Top up user's flex credits"""
-    from app.models.user import User
+    from app.services.flex_credits import add_flex_credit
+    from app.services.scan_windows import topup_velocity
     
     # Calculate credits based on amount (example rate: 1 credit per $1)
     credits_to_add = int(amount)
@@ -230,18 +237,29 @@ def topup_flex_credits(
         description=f"Flex credit top-up: {credits_to_add} credits"
     )
     
-    # Update user's flex credit balance
-    user = db.query(User).filter(User.id == current_user.id).first()
-    user.flex_credit += credits_to_add
-    
     db.add(payment)
+    db.flush()
+    # Update user's flex credit balance without racing concurrent scans
+    new_balance = add_flex_credit(db, current_user.id, credits_to_add, reference=f"payment:{payment.id}")
+    
+    # Unusually frequent top-ups are flagged for review, not blocked
+    topups_in_window, velocity_flagged = topup_velocity(current_user.id)
+    if velocity_flagged:
+        payment.payment_metadata = json.dumps({
+            "velocity_flag": {
+                "topups_in_window": topups_in_window,
+                "window_seconds": settings.TOPUP_VELOCITY_WINDOW_SECONDS,
+            }
+        })
+    
     db.commit()
     db.refresh(payment)
     
     return {
         "message": "Top-up successful",
         "credits_added": credits_to_add,
-        "new_balance": user.flex_credit,
+        "new_balance": new_balance,
+        "velocity_flagged": velocity_flagged,
         "payment": payment
     }
 
@@ -294,3 +312,32 @@ def get_user_balance(
         "flex_credit": current_user.flex_credit,
         "plan": current_user.plan
     }
+
+@router.get("/user/credits/ledger", response_model=CreditLedgerPage)
+def get_credit_ledger(
+    before_id: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Every change to the user's flex credits, newest first"""
+    entries, next_cursor = ledger_page(db, current_user.id, before_id=before_id, limit=limit)
+    return CreditLedgerPage(entries=entries, next_cursor=next_cursor)
+
+@router.get("/user/credits/balance", response_model=CreditBalanceOut)
+def get_credit_balance(
+    at: Optional[datetime] = Query(None, description="Balance as of this time (UTC); defaults to now"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """User's flex credit balance and lifetime totals, now or at a past time, from the ledger"""
+    return credit_totals(db, current_user.id, at=at)
+
+@router.post("/credits/snapshots")
+def run_credit_snapshots(
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Periodic job: fold recent ledger entries into per-user balance snapshots"""
+    written = snapshot_credit_balances(db)
+    return {"snapshots": written}
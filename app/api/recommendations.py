@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Tuple
+from app.db.database import get_db
+from app.api.deps import get_current_user, get_current_admin
+from app.models.center import Center
+from app.models.community import Community
+from app.models.group_activity import Group
+from app.models.user import User
+from app.schemas.recommendation import RecommendationOut
+from app.services.recommendations import (
+    CENTER, COMMUNITY, GROUP, build_similar_items, recommend_for_user, similar_items
+)
+
+router = APIRouter()
+
+_NAMED_MODELS = {CENTER: Center, COMMUNITY: Community, GROUP: Group}
+
+
+def _with_names(db: Session, item_type: str, scored: List[Tuple[int, float]]) -> List[RecommendationOut]:
+    model = _NAMED_MODELS[item_type]
+    ids = [item_id for item_id, _ in scored]
+    names = dict(db.query(model.id, model.name).filter(model.id.in_(ids)).all()) if ids else {}
+    # Items deleted since the last build are skipped
+    return [
+        RecommendationOut(item_type=item_type, item_id=item_id, name=names[item_id], score=score)
+        for item_id, score in scored if item_id in names
+    ]
+
+
+@router.get("/centers/{center_id}/similar", response_model=List[RecommendationOut])
+def get_similar_centers(
+    center_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """People who go here also go to..."""
+    return _with_names(db, CENTER, similar_items(db, CENTER, center_id, limit=limit))
+
+
+@router.get("/centers", response_model=List[RecommendationOut])
+def recommend_centers(
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Centers recommended from the user's own check-ins"""
+    return _with_names(db, CENTER, recommend_for_user(db, CENTER, current_user.id, limit=limit))
+
+
+@router.get("/communities", response_model=List[RecommendationOut])
+def recommend_communities(
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Communities joined by people in the user's communities"""
+    return _with_names(db, COMMUNITY, recommend_for_user(db, COMMUNITY, current_user.id, limit=limit))
+
+
+@router.get("/groups", response_model=List[RecommendationOut])
+def recommend_groups(
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Groups joined by people in the user's groups"""
+    return _with_names(db, GROUP, recommend_for_user(db, GROUP, current_user.id, limit=limit))
+
+
+@router.post("/rebuild")
+def rebuild_recommendations(
+    top_n: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Nightly job: recompute the similar item lists"""
+    return {"items": build_similar_items(db, top_n=top_n), "top_n": top_n}
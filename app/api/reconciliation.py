@@ -4,13 +4,14 @@ from sqlalchemy import and_, desc, func
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from app.db.database import get_db
-from app.models.reconciliation import Reconciliation, ReconciliationLineItem
+from app.models.reconciliation import Reconciliation, ReconciliationLineItem, ReconciliationAnomaly
 from app.models.payment import Payment
 from app.schemas.reconciliation import (
     ReconciliationCreate, ReconciliationOut, ReconciliationUpdate,
-    ReconciliationLineItemOut, ReconciliationSummary
+    ReconciliationLineItemOut, ReconciliationSummary, ReconciliationAnomalyOut
 )
-from app.api.deps import get_current_business
+from app.api.deps import get_current_business, get_current_admin
+from app.services.anomaly_detection import detect_anomalies
 
 router = APIRouter()
 
@@ -82,6 +83,43 @@ def get_reconciliations(
     
     return query.order_by(desc(Reconciliation.created_at)).limit(limit).all()
 
+# Declared before /{reconciliation_id} so "anomalies" is not parsed as an id
+@router.get("/anomalies", response_model=List[ReconciliationAnomalyOut])
+def get_anomalies(
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin),
+    business_id: Optional[int] = Query(None),
+    metric: Optional[str] = Query(None, description="revenue or check_ins"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(100, le=1000)
+):
+    """Get daily revenue and check-in anomalies across businesses (admin)"""
+    query = db.query(ReconciliationAnomaly)
+
+    if business_id:
+        query = query.filter(ReconciliationAnomaly.business_id == business_id)
+    if metric:
+        query = query.filter(ReconciliationAnomaly.metric == metric)
+    if date_from:
+        query = query.filter(ReconciliationAnomaly.date >= date_from)
+    if date_to:
+        query = query.filter(ReconciliationAnomaly.date <= date_to)
+
+    return query.order_by(desc(ReconciliationAnomaly.date), desc(func.abs(ReconciliationAnomaly.robust_z))).limit(limit).all()
+
+@router.post("/anomalies/detect")
+def run_anomaly_detection(
+    lookback_days: int = Query(7, ge=1, le=90),
+    window_days: int = Query(28, ge=7, le=180),
+    threshold: float = Query(3.5, gt=0),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Score the daily revenue and check-in series of every business and store anomalies"""
+    found = detect_anomalies(db, lookback_days=lookback_days, window=window_days, threshold=threshold)
+    return {"anomalies": found, "lookback_days": lookback_days}
+
 @router.get("/{reconciliation_id}", response_model=ReconciliationOut)
 def get_reconciliation(
     reconciliation_id: int,
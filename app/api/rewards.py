@@ -10,7 +10,10 @@ from app.models.payment import Payment
 from app.models.workout import Workout
 from app.models.group_activity import GroupActivity
 from app.models.challenge import MonthlyChallenge
-from sqlalchemy import func, extract
+from app.models.credit_ledger import REWARD
+from app.services.credit_ledger import credit_totals
+from app.services.flex_credits import add_flex_credit
+from sqlalchemy import func, extract, update
 from app.schemas.reward import RewardOut
 from pydantic import BaseModel
 
@@ -82,7 +85,18 @@ def claim_reward(reward_id: int, db: Session = Depends(get_db), current_user: Us
         raise HTTPException(status_code=400, detail="Reward already claimed")
     if user_reward.progress < user_reward.total:
         raise HTTPException(status_code=400, detail="Reward not yet unlocked")
-    user_reward.claimed = 1
+    # Only the request that flips the flag grants the reward, so concurrent claims pay once
+    claimed = db.execute(
+        update(UserReward).where(
+            UserReward.id == user_reward.id, func.coalesce(UserReward.claimed, 0) == 0
+        ).values(claimed=1).execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not claimed:
+        raise HTTPException(status_code=400, detail="Reward already claimed")
+    if user_reward.reward.reward_type == "credits":
+        add_flex_credit(
+            db, current_user.id, int(user_reward.reward.reward_value), kind=REWARD, reference=f"reward:{reward_id}"
+        )
     db.commit()
     return {"message": "Reward claimed"}
 
@@ -124,7 +138,7 @@ def check_and_unlock_rewards(db: Session, user: User):
 
         # "Power User"
         if reward.name == "Power User":
-            credits_used = getattr(user, "credits_used", 0)  # Replace with your real logic
+            credits_used = credit_totals(db, user.id)["credits_spent"]
             if not user_reward:
                 user_reward = UserReward(user_id=user.id, reward_id=reward.id, claimed=0, progress=credits_used, total=500)
                 db.add(user_reward)
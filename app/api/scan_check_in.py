@@ -1,41 +1,179 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional
+from app.api.deps import get_current_business
+from app.models.business import Business
 from app.models.user import User
 from app.models.center import Center
 from app.models.scan_check_in import ScanCheckIn
 from app.db.database import get_db
-from app.schemas.scan_check_in import ScanCheckInRequest, ScanCheckInResponse, ScanCheckInHistoryOut
+from app.schemas.scan_check_in import (
+    ScanCheckInRequest, ScanCheckInResponse, ScanCheckInHistoryOut,
+    GateScanBatchRequest, GateScanBatchResponse, GateAllowlistOut, MAX_BATCH_SCANS
+)
+from app.services.flex_credits import center_credit_cost, deduct_flex_credit
+from app.services.occupancy import admit
+from app.services.qr_tokens import InvalidQRToken, ReplayedQRToken, check_qr_token, spend_qr_token
+from app.services.scan_windows import once_per_scan_window
+from app.services.gate_allowlist import build_allowlist
+from app.services.gate_scans import ACCEPTED, DUPLICATE, process_scan_batch
+from app.services.scan_protocol import (
+    SCAN_CONTENT_TYPE, decode_batch_request, decode_scan_request, encode_batch_response, encode_scan_response
+)
 
 router = APIRouter()
 
-@router.post("/", response_model=ScanCheckInResponse)
+async def _raw_body(request: Request) -> bytes:
+    return await request.body()
+
+def _is_binary(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip() == SCAN_CONTENT_TYPE
+
+def _parse_json(model, body: bytes):
+    try:
+        return model.model_validate_json(body or b"null")
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+
+def _body_docs(model) -> dict:
+    """Request body docs for routes that read JSON or the binary scan encoding themselves"""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema()},
+        SCAN_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+    }}}
+
+@router.post("/", response_model=ScanCheckInResponse, openapi_extra=_body_docs(ScanCheckInRequest))
 def scan_check_in(
-    data: ScanCheckInRequest,
+    request: Request,
+    body: bytes = Depends(_raw_body),
     db: Session = Depends(get_db)
 ):
     """
     Center scans user's QR code, checks and deducts flex credit, confirms check-in, and records it.
+    Send Content-Type application/vnd.fitaccess.scan for the compact binary encoding.
+    Refused with 409 while the center is at its max_occupancy.
     """
-    user = db.query(User).filter(User.id == data.user_id).first()
-    center = db.query(Center).filter(Center.id == data.center_id).first()
-    if not user or not center:
-        raise HTTPException(status_code=404, detail="User or Center not found")
-    if user.flex_credit < center.credit_required:
-        raise HTTPException(
-            status_code=402,
-            detail="Insufficient flex credit. Please top up."
+    if _is_binary(request):
+        try:
+            center_id, token = decode_scan_request(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        user_id = None
+    else:
+        data = _parse_json(ScanCheckInRequest, body)
+        center_id, token, user_id = data.center_id, data.token, data.user_id
+    try:
+        claims = check_qr_token(token, center_id=center_id, user_id=user_id)
+    except InvalidQRToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def charge():
+        remaining = deduct_flex_credit(
+            db, claims.user_id, center_credit_cost(claims.center_id), reference=f"center:{claims.center_id}"
         )
-    user.flex_credit -= center.credit_required
-    scan_check_in_record = ScanCheckIn(user_id=user.id, center_id=center.id, timestamp=datetime.fromisoformat(data.timestamp))
-    db.add(scan_check_in_record)
-    db.commit()
+        if remaining is None:
+            db.rollback()
+            if not db.query(User.id).filter(User.id == claims.user_id).first() or \
+                    not db.query(Center.id).filter(Center.id == claims.center_id).first():
+                raise HTTPException(status_code=404, detail="User or Center not found")
+            raise HTTPException(
+                status_code=402,
+                detail="Insufficient flex credit. Please top up."
+            )
+        if admit(db, claims.center_id, user_id=claims.user_id) is None:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Center is at full capacity")
+        scan_check_in_record = ScanCheckIn(user_id=claims.user_id, center_id=claims.center_id, timestamp=datetime.utcnow())
+        db.add(scan_check_in_record)
+        # Spent last, so a refused scan leaves the QR code usable
+        try:
+            spend_qr_token(db, claims)
+        except ReplayedQRToken as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+        db.commit()
+        return {"remaining_flex_credit": remaining}
+
+    # Scanner double reads inside the dedup window get the first result, uncharged
+    result, _ = once_per_scan_window(claims.user_id, claims.center_id, charge)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Scan already in progress")
+    remaining = result["remaining_flex_credit"]
+    if _is_binary(request):
+        return Response(content=encode_scan_response(remaining), media_type=SCAN_CONTENT_TYPE)
     return ScanCheckInResponse(
         message="Scan check-in successful. User access granted.",
-        remaining_flex_credit=user.flex_credit
+        remaining_flex_credit=remaining
     )
 
+def _owned_center(db: Session, center_id: int, business: Business) -> Center:
+    center = db.query(Center).filter(Center.id == center_id).first()
+    if not center:
+        raise HTTPException(status_code=404, detail="Center not found")
+    if center.business_id != business.id:
+        raise HTTPException(status_code=403, detail="Not authorized for this center")
+    return center
+
+@router.post("/batch", response_model=GateScanBatchResponse, openapi_extra=_body_docs(GateScanBatchRequest))
+def scan_check_in_batch(
+    request: Request,
+    body: bytes = Depends(_raw_body),
+    db: Session = Depends(get_db),
+    current_business: Business = Depends(get_current_business)
+):
+    """
+    Upload scans a gate device collected, possibly while offline, in scan order.
+    Each scan is charged at most once: re-sending a scan ID returns its original
+    result with status "duplicate". Accepts and answers the binary encoding too.
+    """
+    binary = _is_binary(request)
+    if binary:
+        try:
+            center_id, device_id, scans = decode_batch_request(body, max_scans=MAX_BATCH_SCANS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        data = _parse_json(GateScanBatchRequest, body)
+        center_id, device_id = data.center_id, data.device_id
+        scans = [
+            {
+                "scan_id": item.scan_id,
+                "token": item.token,
+                "scanned_at": item.scanned_at.astimezone(timezone.utc).replace(tzinfo=None)
+                if item.scanned_at.tzinfo else item.scanned_at,
+            }
+            for item in data.scans
+        ]
+    _owned_center(db, center_id, current_business)
+    results = process_scan_batch(db, center_id, device_id, scans)
+    accepted = sum(1 for result in results if result["status"] == ACCEPTED)
+    duplicates = sum(1 for result in results if result["status"] == DUPLICATE)
+    if binary:
+        return Response(
+            content=encode_batch_response(results, accepted, len(results) - accepted - duplicates, duplicates),
+            media_type=SCAN_CONTENT_TYPE
+        )
+    return GateScanBatchResponse(
+        results=results,
+        accepted=accepted,
+        rejected=len(results) - accepted - duplicates,
+        duplicates=duplicates
+    )
+
+@router.get("/allowlist/{center_id}", response_model=GateAllowlistOut)
+def get_gate_allowlist(
+    center_id: int,
+    since: Optional[str] = Query(None, description="Version the device already has; returns a delta if still known"),
+    db: Session = Depends(get_db),
+    current_business: Business = Depends(get_current_business)
+):
+    """Signed list of users with enough flex credit for this center, for offline admission"""
+    center = _owned_center(db, center_id, current_business)
+    return build_allowlist(db, center.id, center.credit_required or 0, since=since)
+
 @router.get("/history/{user_id}", response_model=List[ScanCheckInHistoryOut])
 def get_scan_check_in_history(
     user_id: int,
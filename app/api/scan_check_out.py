@@ -6,6 +6,7 @@ from app.models.user import User
 from app.models.center import Center
 from app.models.scan_check_out import ScanCheckOut
 from app.db.database import get_db
+from app.services.occupancy import depart
 from app.schemas.scan_check_out import ScanCheckOutRequest, ScanCheckOutResponse, ScanCheckOutHistoryOut
 
 router = APIRouter()
@@ -28,6 +29,7 @@ def scan_check_out(
         timestamp=datetime.fromisoformat(data.timestamp)
     )
     db.add(scan_check_out_record)
+    depart(db, center.id, user_id=user.id)
     db.commit()
     return ScanCheckOutResponse(
         message="Scan check-out successful. User has left the center."
@@ -5,12 +5,13 @@ from typing import List, Optional
 from datetime import datetime, date, time, timedelta
 from app.db.database import get_db
 from app.models.schedule import Schedule
-from app.models.booking import Booking
+from app.models.booking import Booking, BookingStatus
 from app.schemas.schedule import (
     ScheduleCreate, ScheduleOut, ScheduleUpdate,
     ScheduleSearch, ScheduleAvailability
 )
 from app.api.deps import get_current_business, get_current_user
+from app.services.class_discovery import reserve_schedule_spot
 
 router = APIRouter()
 
@@ -134,11 +135,7 @@ def get_schedule_availability(
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    # Count current bookings
-    current_bookings = db.query(func.count(Booking.id)).filter(
-        Booking.schedule_id == schedule_id
-    ).scalar() or 0
-    
+    current_bookings = schedule.current_bookings or 0
     available_spots = max(0, schedule.capacity - current_bookings)
     is_available = available_spots > 0 and schedule.start_time > datetime.now()
     
@@ -174,32 +171,31 @@ def book_schedule(
     if schedule.start_time <= datetime.now():
         raise HTTPException(status_code=400, detail="Cannot book past schedules")
     
-    # Check availability
-    current_bookings = db.query(func.count(Booking.id)).filter(
-        Booking.schedule_id == schedule_id
-    ).scalar() or 0
-    
-    if current_bookings >= schedule.capacity:
-        raise HTTPException(status_code=400, detail="Schedule is fully booked")
-    
     # Check if user already booked
     existing_booking = db.query(Booking).filter(
         and_(
             Booking.schedule_id == schedule_id,
-            Booking.user_id == current_user.id
+            Booking.member_id == current_user.id
         )
     ).first()
     
     if existing_booking:
         raise HTTPException(status_code=400, detail="You have already booked this schedule")
     
+    # Take a spot atomically; concurrent bookings cannot overfill the schedule
+    if not reserve_schedule_spot(db, schedule_id):
+        raise HTTPException(status_code=400, detail="Schedule is fully booked")
+    
     # Create booking
     booking = Booking(
-        user_id=current_user.id,
+        member_id=current_user.id,
         business_id=current_business.id,
         schedule_id=schedule_id,
         activity_id=schedule.activity_id,
-        status="confirmed"
+        date=schedule.start_time,
+        time_slot=schedule.start_time.strftime("%H:%M"),
+        activity=schedule.title,
+        status=BookingStatus.approved
     )
     
     db.add(booking)
@@ -234,16 +230,7 @@ def search_available_schedules(
     if activity_id:
         query = query.filter(Schedule.activity_id == activity_id)
     
-    schedules = query.order_by(Schedule.start_time).all()
-    
     # Filter out fully booked schedules
-    available_schedules = []
-    for schedule in schedules:
-        current_bookings = db.query(func.count(Booking.id)).filter(
-            Booking.schedule_id == schedule.id
-        ).scalar() or 0
-        
-        if current_bookings < schedule.capacity:
-            available_schedules.append(schedule)
-    
-    return available_schedules
+    query = query.filter(Schedule.current_bookings < Schedule.capacity)
+    
+    return query.order_by(Schedule.start_time).all()
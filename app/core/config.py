@@ -11,5 +11,18 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     MAIL_STARTTLS: bool = True
     USE_CREDENTIALS: bool = True
+    BUSINESS_TIMEZONE: str = "Africa/Lagos"  # Business hours are entered in this timezone
+    QR_TOKEN_SECRET: str = "change-me-qr-token-secret"  # HMAC key for check-in QR tokens
+    QR_TOKEN_TTL_SECONDS: int = 120
+    QR_RENDER_PROCESSES: int = 2  # PNG rendering pool size; 0 renders in the request thread
+    QR_PNG_CACHE_SIZE: int = 1024
+    ALLOWLIST_SIGNING_SECRET: str = "change-me-allowlist-secret"  # Shared with gate devices; not the QR key
+    ALLOWLIST_TTL_SECONDS: int = 900
+    SLIDING_WINDOW_STORE: str = ""  # SQLite file shared by workers on one host; empty uses the temp dir
+    SCAN_DEDUP_WINDOW_SECONDS: int = 10  # Repeat scans of a user at a center inside this get the first result
+    TOPUP_VELOCITY_WINDOW_SECONDS: int = 600
+    TOPUP_VELOCITY_MAX: int = 5  # More top-ups than this inside the window are flagged
+    VISIT_MAX_HOURS: float = 6  # Visits still open after this are closed by the stale sweep
+    OCCUPANCY_STREAM_INTERVAL_SECONDS: float = 2.0  # How often the occupancy SSE feed checks for changes from other workers
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,46 @@
+from typing import List
+from sqlalchemy import inspect, literal
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import DDL
+from app.db.database import Base
+
+
+def _column_ddl(column, dialect) -> str:
+    """Column definition for ALTER TABLE ... ADD COLUMN; only scalar defaults allow NOT NULL"""
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, (bool, int, float, str)):
+        value = literal(default, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    """
+    Add model columns missing from tables created before them, with their indexes;
+    create_all only creates missing tables. Existing rows get the column default,
+    or NULL, which the startup backfills fill in. Idempotent.
+    Returns the added columns as "table.column".
+    """
+    existing = inspect(engine)
+    tables = set(existing.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            columns = {column["name"] for column in existing.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in columns]
+            if not missing:
+                continue
+            quoted = connection.dialect.identifier_preparer.quote(table.name)
+            for column in missing:
+                connection.execute(DDL(f"ALTER TABLE {quoted} ADD COLUMN {_column_ddl(column, connection.dialect)}"))
+                added.append(f"{table.name}.{column.name}")
+            names = {column.name for column in missing}
+            for index in table.indexes:
+                if {column.name for column in index.columns} & names:
+                    index.create(connection, checkfirst=True)
+    return added
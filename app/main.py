@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.db.database import Base, engine, get_db
+from app.db.migrations import add_missing_columns
 from app.api import (
     explore,
     check_in,
@@ -24,10 +25,17 @@ from app.api import (
     business_auth,
     admin,
     advertisements,
+    recommendations,
 )
 from fastapi.responses import JSONResponse
 from fastapi.requests import Request
 from app.api.rewards_seed import seed_rewards
+from app.services.center_hours import ensure_compiled_hours
+from app.services.center_feedback import ensure_center_feedback
+from app.services.class_discovery import ensure_class_slots
+from app.services.occupancy import ensure_center_occupancy
+from app.services.credit_ledger import ensure_credit_ledger
+from app.services.peer_benchmarks import ensure_center_business
 
 app = FastAPI(
     title="FitAccess API",
@@ -41,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 # Register all route modules with a prefix
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
@@ -65,6 +74,7 @@ app.include_router(reconciliation.router, prefix="/reconciliation", tags=["Recon
 app.include_router(schedule.router, prefix="/schedule", tags=["Schedule"])
 app.include_router(transaction.router, prefix="/transaction", tags=["Transaction"])
 app.include_router(groups.router, prefix="/groups", tags=["Groups"])
+app.include_router(recommendations.router, prefix="/recommendations", tags=["Recommendations"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
 
 # Serve static files for uploaded images
@@ -88,9 +98,20 @@ async def startup_event():
     print("🚀 FitAccess API is running and ready to accept requests.")
     # Create all tables (models are already imported via API routers)
     Base.metadata.create_all(bind=engine)
+    # ...and the columns added to existing tables since
+    add_missing_columns(engine)
     # Seed rewards
     db = next(get_db())
-    seed_rewards(db)
+    try:
+        seed_rewards(db)
+        ensure_center_business(db)
+        ensure_compiled_hours(db)
+        ensure_center_feedback(db)
+        ensure_class_slots(db)
+        ensure_center_occupancy(db)
+        ensure_credit_ledger(db)
+    finally:
+        db.close()
 
 @app.middleware("http")
 async def catch_all_404(request: Request, call_next):
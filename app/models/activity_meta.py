@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String, Text
+from sqlalchemy import Column, Index, Integer, ForeignKey, String, Text
 from app.db.database import Base
 
 class ActivityLike(Base):
@@ -16,6 +16,9 @@ class ActivityComment(Base):
 
 class ActivityJoin(Base):
     __tablename__ = "activity_joins"
+    __table_args__ = (
+        Index("ix_activity_joins_activity_user", "activity_id", "user_id", unique=True),
+    )
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey("activities.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Date, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Date, JSON, UniqueConstraint, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -19,6 +19,7 @@ class AnalyticsEvent(Base):
     ip_address = Column(String(50), nullable=True)
     country = Column(String(100), nullable=True)
     city = Column(String(100), nullable=True)
+    sample_weight = Column(Float, nullable=False, default=1.0)  # inverse sampling probability
     event_timestamp = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -43,3 +44,80 @@ class BusinessMetrics(Base):
     
     # Relationships
     # business = relationship("Business", back_populates="business_metrics")  # Commented out to avoid startup errors
+
+class MetricSketch(Base):
+    """Per business, per day quantile sketch of a metric (see app.utils.quantile_sketch)"""
+    __tablename__ = "metric_sketches"
+    __table_args__ = (
+        UniqueConstraint("business_id", "date", "metric", name="uq_metric_sketch_business_date_metric"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    metric = Column(String(50), nullable=False)  # session_duration, payment_amount
+    count = Column(Integer, nullable=False, default=0)
+    sketch = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MetricValue(Base):
+    """
+    A raw metric value not yet folded into its MetricSketch. Writers only append
+    here, so concurrent writes never contend on the sketch row; the rollup folds
+    and deletes them.
+    """
+    __tablename__ = "metric_values"
+    __table_args__ = (
+        Index("ix_metric_values_business_metric_date", "business_id", "metric", "date"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    metric = Column(String(50), nullable=False)
+    value = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AnalyticsSession(Base):
+    """Compact session record derived from AnalyticsEvent by app.services.sessionizer"""
+    __tablename__ = "analytics_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    session_id = Column(String(200), nullable=True)  # client session id, if sent
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    duration_seconds = Column(Float, nullable=False, default=0.0)
+    event_count = Column(Integer, nullable=False, default=0)
+    entry_event = Column(String(100), nullable=True)
+    exit_event = Column(String(100), nullable=True)
+    first_event_id = Column(Integer, nullable=True)
+    last_event_id = Column(Integer, nullable=True, index=True)
+    device_type = Column(String(50), nullable=True)
+    browser = Column(String(100), nullable=True)
+    os = Column(String(100), nullable=True)
+    is_open = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class BusinessBenchmark(Base):
+    """Latest peer benchmark snapshot per business (see app.services.peer_benchmarks)"""
+    __tablename__ = "business_benchmarks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False, unique=True, index=True)
+    state = Column(String, nullable=True)
+    center_type = Column(String, nullable=True)
+    peer_count = Column(Integer, nullable=False, default=0)
+    period_days = Column(Integer, nullable=False, default=30)
+    checkins_per_member = Column(Float, nullable=True)
+    checkins_per_member_percentile = Column(Float, nullable=True)
+    revenue_per_member = Column(Float, nullable=True)
+    revenue_per_member_percentile = Column(Float, nullable=True)
+    booking_approval_rate = Column(Float, nullable=True)
+    booking_approval_rate_percentile = Column(Float, nullable=True)
+    peak_utilization = Column(Float, nullable=True)
+    peak_utilization_percentile = Column(Float, nullable=True)
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, JSON, Boolean, LargeBinary, event
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.opening_hours import compile_hours
 
 class Business(Base):
     __tablename__ = "businesses"
@@ -66,8 +67,16 @@ class BusinessProfile(Base):
     cac_number = Column(String, nullable=True)
     membership_plans = Column(JSON, nullable=True)  # [{"name": "Daily Pass", "price": 10}, ...]
     business_hours = Column(JSON, nullable=True)    # {"Monday": {"open": "06:00", "close": "22:00"}, ...}
+    hours_bitmap = Column(LargeBinary, nullable=True)  # business_hours compiled to 7x96 quarter hours
     description = Column(String, nullable=True)
     longitude = Column(Float, nullable=True)
     latitude = Column(Float, nullable=True)
 
     business = relationship("Business")
+
+@event.listens_for(BusinessProfile, "before_insert")
+@event.listens_for(BusinessProfile, "before_update")
+def _compile_business_hours(mapper, connection, profile):
+    bitmap = compile_hours(profile.business_hours)
+    if bitmap != profile.hours_bitmap:
+        profile.hours_bitmap = bitmap
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, JSON
+from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, Index, DateTime, LargeBinary, Text, event, inspect, select
+from datetime import datetime
 from app.db.database import Base
+from app.models.business import BusinessProfile
+from app.utils.rating import RATING_PRIOR_MEAN
 
 class Center(Base):
     __tablename__ = "centers"
 
     id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=True, index=True)  # Owning business, if any
     name = Column(String)
     address = Column(String)
     state = Column(String)
@@ -14,4 +18,49 @@ class Center(Base):
     credit_required = Column(Integer, default=1)  # Flex credit required for entry
     rating = Column(Float, default=0.0)
     rating_count = Column(Integer, default=0)
-    comments = Column(JSON, default=[])
\ No newline at end of file
+    rating_sum = Column(Float, default=0.0)
+    bayesian_score = Column(Float, default=RATING_PRIOR_MEAN, index=True)  # Rating shrunk towards the prior, for sorting
+    comments = Column(JSON, default=[])  # Legacy; comments live in center_comments
+    # Written by /explore/upload
+    images = Column(JSON, default=[])
+    services = Column(JSON, default=[])
+    description = Column(String, nullable=True)
+    booking_schedule = Column(String, nullable=True)
+    cac_number = Column(String, nullable=True)
+    bank_name = Column(String, nullable=True)
+    account_number = Column(String, nullable=True)
+    account_name = Column(String, nullable=True)
+    hours_bitmap = Column(LargeBinary, nullable=True)  # Copy of the owning business's compiled hours
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class CenterCommentEntry(Base):
+    """Append-only center comments, read newest first by id"""
+    __tablename__ = "center_comments"
+    __table_args__ = (
+        Index("ix_center_comments_center_id_id", "center_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    center_id = Column(Integer, ForeignKey("centers.id"), nullable=False)
+    comment = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+@event.listens_for(Center, "before_insert")
+def _copy_business_hours(mapper, connection, center):
+    if center.business_id is not None and center.hours_bitmap is None:
+        profiles = BusinessProfile.__table__
+        center.hours_bitmap = connection.execute(
+            select(profiles.c.hours_bitmap).where(profiles.c.business_id == center.business_id)
+        ).scalar()
+
+@event.listens_for(BusinessProfile, "after_insert")
+@event.listens_for(BusinessProfile, "after_update")
+def _propagate_business_hours(mapper, connection, profile):
+    if not inspect(profile).attrs.hours_bitmap.history.has_changes():
+        return
+    centers = Center.__table__
+    connection.execute(
+        centers.update().where(centers.c.business_id == profile.business_id).values(
+            hours_bitmap=profile.hours_bitmap, updated_at=datetime.utcnow()
+        )
+    )
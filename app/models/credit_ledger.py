@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.db.database import Base
+
+# CreditLedgerEntry.kind values
+OPENING = "opening"  # Balance held before the ledger existed
+TOPUP = "topup"
+DEDUCTION = "deduction"
+REWARD = "reward"
+REFUND = "refund"
+EXPIRY = "expiry"
+CREDIT_KINDS = (OPENING, TOPUP, DEDUCTION, REWARD, REFUND, EXPIRY)
+
+class CreditLedgerEntry(Base):
+    """
+    Append-only record of every flex credit change, written in the same transaction
+    as the change to User.flex_credit. Rows are never updated or deleted.
+    """
+    __tablename__ = "credit_ledger"
+    __table_args__ = (
+        Index("ix_credit_ledger_user_id_id", "user_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    delta = Column(Integer, nullable=False)  # Signed change to the balance
+    reference = Column(String(64), nullable=True)  # What caused it, e.g. "payment:12" or "center:3"
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class CreditBalanceSnapshot(Base):
+    """
+    A user's balance and running totals over their ledger up to and including
+    `entry_id`; anything later is the tail, added on read
+    """
+    __tablename__ = "credit_balance_snapshots"
+    __table_args__ = (
+        Index("ix_credit_balance_snapshots_user_id_as_of", "user_id", "as_of"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    entry_id = Column(Integer, primary_key=True)  # Last ledger entry included
+    as_of = Column(DateTime, nullable=False)  # created_at of that entry
+    balance = Column(Integer, nullable=False)
+    credits_spent = Column(Integer, nullable=False, default=0)  # Deductions
+    credits_added = Column(Integer, nullable=False, default=0)  # Top-ups, rewards and refunds
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,150 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, event, inspect, select
+from datetime import datetime, timedelta
+from app.db.database import Base
+from app.models.activity import Activity
+from app.models.business import BusinessProfile
+from app.models.center import Center
+from app.models.schedule import Schedule, ScheduleStatus
+from app.utils.geo import grid_cell
+
+SCHEDULE = "schedule"
+ACTIVITY = "activity"
+
+_TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p", "%I%p")
+
+class ClassSlot(Base):
+    """
+    One bookable class or activity occurrence, keyed by grid cell and start time so
+    "near me, starting soon, with spots left" is a single indexed range query.
+    Kept in sync with schedules and activities by the listeners below.
+    """
+    __tablename__ = "class_slots"
+    __table_args__ = (
+        Index("ix_class_slots_cell_start", "cell_row", "cell_col", "start_time"),
+        Index("ix_class_slots_source", "kind", "source_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # schedule, activity
+    source_id = Column(Integer, nullable=False)
+    business_id = Column(Integer, nullable=False, index=True)
+    title = Column(String(200), nullable=False)
+    location = Column(String(200), nullable=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    cell_row = Column(Integer, nullable=False)
+    cell_col = Column(Integer, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=True)
+    capacity = Column(Integer, nullable=True)  # None means unlimited
+    booked = Column(Integer, nullable=False, default=0)
+
+def parse_activity_start(activity) -> datetime:
+    """Activity.date plus its free-form Activity.time, or None if the time can't be read"""
+    if activity.date is None or not activity.time:
+        return None
+    for fmt in _TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(activity.time.strip().upper(), fmt)
+        except ValueError:
+            continue
+        return datetime.combine(activity.date, parsed.time())
+    return None
+
+def business_location(connection, business_id, center_id=None):
+    """(latitude, longitude) of a business profile, else of the given or first center"""
+    profiles = BusinessProfile.__table__
+    row = connection.execute(
+        select(profiles.c.latitude, profiles.c.longitude).where(profiles.c.business_id == business_id)
+    ).first()
+    if row and row[0] is not None and row[1] is not None:
+        return row[0], row[1]
+    centers = Center.__table__
+    query = select(centers.c.latitude, centers.c.longitude).where(
+        centers.c.latitude.isnot(None), centers.c.longitude.isnot(None)
+    )
+    query = query.where(centers.c.id == center_id) if center_id is not None else query.where(
+        centers.c.business_id == business_id
+    )
+    row = connection.execute(query.limit(1)).first()
+    return (row[0], row[1]) if row else None
+
+def slot_values(connection, kind, source):
+    """Column values of the slot for a schedule/activity, or None if it should not be listed"""
+    if kind == SCHEDULE:
+        if source.status in (ScheduleStatus.cancelled, ScheduleStatus.completed):
+            return None
+        values = {
+            "title": source.title,
+            "start_time": source.start_time,
+            "end_time": source.end_time,
+            "capacity": source.capacity,
+            "booked": source.current_bookings or 0,
+        }
+        location = business_location(connection, source.business_id)
+    else:
+        start_time = parse_activity_start(source)
+        if not source.is_active or start_time is None:
+            return None
+        values = {
+            "title": source.name,
+            "start_time": start_time,
+            "end_time": start_time + timedelta(minutes=source.duration) if source.duration else None,
+            "capacity": source.capacity,
+            "booked": source.join_count or 0,
+        }
+        location = business_location(connection, source.business_id, source.center_id)
+    if location is None:
+        return None
+    row, col = grid_cell(*location)
+    values.update(
+        kind=kind,
+        source_id=source.id,
+        business_id=source.business_id,
+        location=source.location,
+        latitude=location[0],
+        longitude=location[1],
+        cell_row=row,
+        cell_col=col,
+    )
+    return values
+
+def _sync_slot(connection, kind, source):
+    table = ClassSlot.__table__
+    connection.execute(table.delete().where((table.c.kind == kind) & (table.c.source_id == source.id)))
+    values = slot_values(connection, kind, source)
+    if values is not None:
+        connection.execute(table.insert().values(**values))
+
+@event.listens_for(Schedule, "after_insert")
+@event.listens_for(Schedule, "after_update")
+def _index_schedule(mapper, connection, schedule):
+    _sync_slot(connection, SCHEDULE, schedule)
+
+@event.listens_for(Activity, "after_insert")
+@event.listens_for(Activity, "after_update")
+def _index_activity(mapper, connection, activity):
+    _sync_slot(connection, ACTIVITY, activity)
+
+@event.listens_for(Schedule, "after_delete")
+def _unindex_schedule(mapper, connection, schedule):
+    table = ClassSlot.__table__
+    connection.execute(table.delete().where((table.c.kind == SCHEDULE) & (table.c.source_id == schedule.id)))
+
+@event.listens_for(Activity, "after_delete")
+def _unindex_activity(mapper, connection, activity):
+    table = ClassSlot.__table__
+    connection.execute(table.delete().where((table.c.kind == ACTIVITY) & (table.c.source_id == activity.id)))
+
+@event.listens_for(BusinessProfile, "after_update")
+def _relocate_business_slots(mapper, connection, profile):
+    state = inspect(profile)
+    if not (state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes()):
+        return
+    if profile.latitude is None or profile.longitude is None:
+        return
+    row, col = grid_cell(profile.latitude, profile.longitude)
+    table = ClassSlot.__table__
+    connection.execute(table.update().where(table.c.business_id == profile.business_id).values(
+        latitude=profile.latitude, longitude=profile.longitude, cell_row=row, cell_col=col
+    ))
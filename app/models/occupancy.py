@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index, event
+from datetime import datetime
+from app.db.database import Base
+from app.models.center import Center
+
+# Visit.end_reason values
+CHECKED_OUT = "checked_out"
+EXPIRED = "expired"
+
+class CenterOccupancy(Base):
+    """Visitors currently inside each center, counted by app.services.occupancy"""
+    __tablename__ = "center_occupancy"
+
+    center_id = Column(Integer, ForeignKey("centers.id"), primary_key=True)
+    active = Column(Integer, nullable=False, default=0)
+    max_occupancy = Column(Integer, nullable=True)  # None admits without limit
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class Visit(Base):
+    """One visit session at a center: opened on admission, closed on check-out or by the stale sweep"""
+    __tablename__ = "visits"
+    __table_args__ = (
+        Index("ix_visits_open", "ended_at", "started_at"),
+        Index("ix_visits_center_user", "center_id", "user_id"),
+        Index("ix_visits_center_member", "center_id", "member_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    center_id = Column(Integer, ForeignKey("centers.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    member_id = Column(Integer, nullable=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ended_at = Column(DateTime, nullable=True)  # None while the visitor is inside
+    end_reason = Column(String(20), nullable=True)  # checked_out, expired
+    duration_seconds = Column(Integer, nullable=True)  # Set when closed
+
+class UserCenterDwell(Base):
+    """Running dwell totals of a user at a center, added to as checked-out visits close"""
+    __tablename__ = "user_center_dwell"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    center_id = Column(Integer, ForeignKey("centers.id"), primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Integer, nullable=False, default=0)
+    last_visit_at = Column(DateTime, nullable=True)
+
+class CenterDwellDay(Base):
+    """Running dwell totals of a center per day (of visit start), for session length analytics"""
+    __tablename__ = "center_dwell_days"
+
+    center_id = Column(Integer, ForeignKey("centers.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Integer, nullable=False, default=0)
+
+@event.listens_for(Center, "after_insert")
+def _add_center_occupancy(mapper, connection, center):
+    connection.execute(CenterOccupancy.__table__.insert().values(center_id=center.id, active=0))
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from datetime import datetime
+from app.db.database import Base
+
+class SimilarItems(Base):
+    """Top-N most similar items of one item, written by app.services.recommendations"""
+    __tablename__ = "similar_items"
+    __table_args__ = (
+        UniqueConstraint("item_type", "item_id", name="uq_similar_items_item"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_type = Column(String(20), nullable=False)  # center, community, group
+    item_id = Column(Integer, nullable=False)
+    neighbors = Column(JSON, default=[])  # [[item_id, score], ...] best first
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Date
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Date, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy import Enum as SQLEnum
 from datetime import datetime
@@ -56,3 +56,20 @@ class ReconciliationLineItem(Base):
     # Relationships
     reconciliation = relationship("Reconciliation", back_populates="line_items")
     payment = relationship("Payment")
+
+class ReconciliationAnomaly(Base):
+    """Daily revenue / check-in spike or dip flagged by app.services.anomaly_detection"""
+    __tablename__ = "reconciliation_anomalies"
+    __table_args__ = (
+        UniqueConstraint("business_id", "date", "metric", name="uq_anomaly_business_date_metric"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id"), nullable=False, index=True)
+    date = Column(Date, nullable=False, index=True)
+    metric = Column(String(50), nullable=False)  # revenue, check_ins
+    value = Column(Float, nullable=False, default=0.0)
+    baseline = Column(Float, nullable=False, default=0.0)  # rolling median
+    robust_z = Column(Float, nullable=False, default=0.0)
+    direction = Column(String(10), nullable=False)  # spike, dip
+    detected_at = Column(DateTime, default=datetime.utcnow)
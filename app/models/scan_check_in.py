@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, String
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -12,4 +12,37 @@ class ScanCheckIn(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     # user = relationship("User")  # Commented out to avoid startup errors
-    # center = relationship("Center")  # Commented out to avoid startup errors
\ No newline at end of file
+    # center = relationship("Center")  # Commented out to avoid startup errors
+
+class GateScan(Base):
+    """
+    Outcome of one scan uploaded by a gate device, keyed by the device's scan ID
+    so re-uploading a batch returns the original results instead of charging twice
+    """
+    __tablename__ = "gate_scans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_id = Column(String(64), unique=True, nullable=False)
+    device_id = Column(String(64), nullable=True)
+    center_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    nonce = Column(String(32), unique=True, nullable=True)  # QR token nonce; a token is spent once
+    scanned_at = Column(DateTime, nullable=False)  # Device clock
+    status = Column(String(20), nullable=False)  # accepted, rejected
+    detail = Column(String(200), nullable=True)
+    remaining_flex_credit = Column(Integer, nullable=True)
+    scan_check_in_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SpentQRToken(Base):
+    """
+    Nonces of redeemed check-in QR tokens, shared by every worker and by live and
+    batch scans, so a token is charged once however it is replayed
+    """
+    __tablename__ = "spent_qr_tokens"
+
+    nonce = Column(String(32), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    center_id = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # Rows past this can be purged; the token no longer verifies
+    spent_at = Column(DateTime, default=datetime.utcnow)
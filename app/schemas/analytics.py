@@ -22,11 +22,31 @@ class AnalyticsEventOut(AnalyticsEventBase):
     id: int
     business_id: int
     user_id: Optional[int] = None
+    sample_weight: float = 1.0
     event_timestamp: datetime
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
+# Session schemas
+class AnalyticsSessionOut(BaseModel):
+    id: int
+    business_id: int
+    user_id: Optional[int] = None
+    session_id: Optional[str] = None
+    started_at: datetime
+    ended_at: datetime
+    duration_seconds: float
+    event_count: int
+    entry_event: Optional[str] = None
+    exit_event: Optional[str] = None
+    device_type: Optional[str] = None
+    browser: Optional[str] = None
+    os: Optional[str] = None
+    is_open: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
 # Business Metrics schemas
 class BusinessMetricsOut(BaseModel):
     id: int
@@ -43,6 +63,25 @@ class BusinessMetricsOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Peer Benchmarks
+class BusinessBenchmarkOut(BaseModel):
+    business_id: int
+    state: Optional[str] = None
+    center_type: Optional[str] = None
+    peer_count: int
+    period_days: int
+    checkins_per_member: Optional[float] = None
+    checkins_per_member_percentile: Optional[float] = None
+    revenue_per_member: Optional[float] = None
+    revenue_per_member_percentile: Optional[float] = None
+    booking_approval_rate: Optional[float] = None
+    booking_approval_rate_percentile: Optional[float] = None
+    peak_utilization: Optional[float] = None
+    peak_utilization_percentile: Optional[float] = None
+    computed_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
 # Dashboard Analytics
 class DashboardMetrics(BaseModel):
     total_revenue: float
@@ -103,3 +142,15 @@ class ConversionFunnel(BaseModel):
     signup_conversion_rate: float
     booking_conversion_rate: float
     completion_rate: float
+
+# Quantile Sketches
+class QuantileValue(BaseModel):
+    q: float
+    value: Optional[float] = None
+
+class MetricQuantilesOut(BaseModel):
+    metric: str
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    quantiles: List[QuantileValue] = []
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
+from datetime import datetime
 
 class CenterCreate(BaseModel):
     name: str
@@ -23,16 +24,54 @@ class CenterOut(BaseModel):
     state: str
     latitude: float
     longitude: float
-    images: List[str]
-    services: List[str]
-    description: str
-    booking_schedule: str
-    credit_required: int  # Flex credit required for entry
+    center_type: Optional[str] = None
+    images: Optional[List[str]] = []
+    services: Optional[List[str]] = []
+    description: Optional[str] = None
+    booking_schedule: Optional[str] = None
+    credit_required: int = 1  # Flex credit required for entry
     rating: Optional[float] = None
+    rating_count: Optional[int] = None
+    bayesian_score: Optional[float] = None
     comments: Optional[List[str]] = []
+    distance_km: Optional[float] = None
+
+class CenterClusterOut(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    center_id: Optional[int] = None  # Set when the cluster is a single center
+    expansion_zoom: Optional[int] = None
+
+class CenterFacetsOut(BaseModel):
+    total: int
+    service: Dict[str, int] = {}
+    center_type: Dict[str, int] = {}
+    credit: Dict[str, int] = {}
 
 class CenterRating(BaseModel):
-    rating: float
+    rating: float = Field(..., ge=0, le=5)
 
 class CenterComment(BaseModel):
-    comment: str
\ No newline at end of file
+    comment: str
+
+class CenterCommentOut(BaseModel):
+    id: int
+    comment: str
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CenterCommentPage(BaseModel):
+    comments: List[CenterCommentOut]
+    next_cursor: Optional[int] = None  # Pass as before_id for the next page
+
+class CenterImportError(BaseModel):
+    row: int  # CSV line number or GeoJSON feature number
+    errors: List[str]
+
+class CenterImportOut(BaseModel):
+    total_rows: int
+    inserted: int
+    failed: int
+    errors: List[CenterImportError] = []
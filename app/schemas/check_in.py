@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
@@ -10,11 +10,16 @@ class CheckInRequest(BaseModel):
 class QRCodeResponse(BaseModel):
     message: str
     qr_code_base64: str
+    qr_code_svg: Optional[str] = None  # Set when format=svg
+    token: Optional[str] = None  # Signed payload encoded in the QR code; render client side with format=token
+    expires_at: Optional[datetime] = None
 
 class ScanConfirmRequest(BaseModel):
-    user_id: int
-    center_id: int
-    timestamp: str
+    token: str  # Scanned from the user's QR code
+    # Optional cross-check by the scanner; the token is authoritative
+    center_id: Optional[int] = None
+    user_id: Optional[int] = None
+    timestamp: Optional[str] = None
 
 class CheckInHistoryCenterOut(BaseModel):
     center_id: int
@@ -25,4 +30,13 @@ class CheckInHistoryCenterOut(BaseModel):
 
 class CheckInHistoryFilter(BaseModel):
     start_date: Optional[datetime] = None
-    end_date: Optional[datetime] = None
\ No newline at end of file
+    end_date: Optional[datetime] = None
+class CenterOccupancyOut(BaseModel):
+    center_id: int
+    center_name: Optional[str] = None
+    active: int  # Visitors inside now
+    max_occupancy: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+class OccupancyLimitUpdate(BaseModel):
+    max_occupancy: Optional[int] = Field(None, ge=1)  # None removes the limit
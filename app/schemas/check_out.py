@@ -10,6 +10,8 @@ class CheckOutRequest(BaseModel):
 class CheckOutQRCodeResponse(BaseModel):
     message: str
     qr_code_base64: str
+    qr_code_svg: Optional[str] = None  # Set when format=svg
+    token: Optional[str] = None  # Payload encoded in the QR code; render client side with format=token
 
 class CheckOutScanConfirmRequest(BaseModel):
     user_id: int
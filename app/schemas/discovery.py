@@ -0,0 +1,19 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from datetime import datetime
+
+class ClassSlotOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    kind: str  # schedule, activity
+    source_id: int
+    business_id: int
+    title: str
+    location: Optional[str] = None
+    latitude: float
+    longitude: float
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    capacity: Optional[int] = None
+    spots_left: Optional[int] = None  # None means unlimited
+    distance_km: float
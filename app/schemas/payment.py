@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -46,3 +46,23 @@ class PaymentOut(PaymentBase):
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+class CreditLedgerEntryOut(BaseModel):
+    id: int
+    kind: str  # opening, topup, deduction, reward, refund, expiry
+    delta: int
+    reference: Optional[str] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CreditLedgerPage(BaseModel):
+    entries: List[CreditLedgerEntryOut]
+    next_cursor: Optional[int] = None  # Pass as before_id for the next page
+
+class CreditBalanceOut(BaseModel):
+    balance: int
+    credits_spent: int
+    credits_added: int
+    last_entry_id: Optional[int] = None
+    as_of: datetime
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class RecommendationOut(BaseModel):
+    item_type: str
+    item_id: int
+    name: Optional[str] = None
+    score: float
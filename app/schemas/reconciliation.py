@@ -70,3 +70,16 @@ class ReconciliationSummary(BaseModel):
     total_actual_amount: float
     variance: float
     period_days: int
+
+class ReconciliationAnomalyOut(BaseModel):
+    id: int
+    business_id: int
+    date: date
+    metric: str
+    value: float
+    baseline: float
+    robust_z: float
+    direction: str
+    detected_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,10 +1,13 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
+from typing import List, Optional
 
 class ScanCheckInRequest(BaseModel):
-    user_id: int
-    center_id: int
-    timestamp: str  # from QR code
+    token: str  # from QR code
+    # Optional cross-check by the scanner; the token is authoritative
+    center_id: Optional[int] = None
+    user_id: Optional[int] = None
+    timestamp: Optional[str] = None
 
 class ScanCheckInResponse(BaseModel):
     message: str
@@ -12,4 +15,41 @@ class ScanCheckInResponse(BaseModel):
 
 class ScanCheckInHistoryOut(BaseModel):
     center_id: int
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+MAX_BATCH_SCANS = 500
+
+class GateScanItem(BaseModel):
+    scan_id: str = Field(..., min_length=1, max_length=64)  # Device generated, unique per scan
+    token: str  # from QR code
+    scanned_at: datetime  # Device clock; UTC if no offset
+
+class GateScanBatchRequest(BaseModel):
+    center_id: int
+    device_id: Optional[str] = Field(None, max_length=64)
+    scans: List[GateScanItem] = Field(..., max_length=MAX_BATCH_SCANS)
+
+class GateScanResult(BaseModel):
+    scan_id: str
+    status: str  # accepted, rejected, duplicate
+    detail: Optional[str] = None
+    user_id: Optional[int] = None
+    remaining_flex_credit: Optional[int] = None
+
+class GateScanBatchResponse(BaseModel):
+    results: List[GateScanResult]
+    accepted: int
+    rejected: int
+    duplicates: int
+
+class GateAllowlistOut(BaseModel):
+    center_id: int
+    credit_required: int
+    version: str
+    base_version: Optional[str] = None  # Set when this is a delta
+    user_ids: Optional[List[int]] = None  # Full list
+    added: Optional[List[int]] = None  # Delta
+    removed: Optional[List[int]] = None
+    issued_at: str
+    expires_at: str
+    signature: str  # HMAC-SHA256 of the canonical JSON of the other fields
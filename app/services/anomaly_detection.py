@@ -0,0 +1,162 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.check_in import CheckIn
+from app.models.center import Center
+from app.models.member import Member, MemberPayment
+from app.models.payment import Payment
+from app.models.reconciliation import ReconciliationAnomaly
+
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_Z_THRESHOLD = 3.5
+# Makes the MAD a consistent estimator of the standard deviation for normal data
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def rolling_robust_z(series: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Robust z-score of each day against the median/MAD of the `window` days before it,
+    for every row of a (businesses x days) array at once.
+    Returns (z, baseline) shaped (businesses, days - window).
+    """
+    history = sliding_window_view(series[:, :-1], window, axis=1)
+    current = series[:, window:]
+    baseline = np.median(history, axis=2)
+    deviations = np.abs(history - baseline[..., None])
+    scale = MAD_SCALE * np.median(deviations, axis=2)
+    # A flat history has a zero MAD; fall back to the mean absolute deviation
+    fallback = MEAN_AD_SCALE * deviations.mean(axis=2)
+    scale = np.where(scale > 0, scale, fallback)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(scale > 0, (current - baseline) / scale, 0.0)
+    return z, baseline
+
+
+def _daily_series(
+    rows: List[Tuple], business_index: Dict[int, int], start: date, days: int, target: np.ndarray
+):
+    for business_id, day, value in rows:
+        if business_id not in business_index or day is None:
+            continue
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        offset = (day - start).days
+        if 0 <= offset < days:
+            target[business_index[business_id], offset] += float(value or 0)
+
+
+def detect_anomalies(
+    db: Session,
+    end: Optional[date] = None,
+    lookback_days: int = 7,
+    window: int = DEFAULT_WINDOW_DAYS,
+    threshold: float = DEFAULT_Z_THRESHOLD
+) -> int:
+    """
+    Flag daily revenue and check-in spikes/dips for all businesses.
+    Scores the last `lookback_days` days ending yesterday (or `end`) and
+    replaces their ReconciliationAnomaly rows, so reruns are idempotent.
+    Returns the number of anomalies found.
+    """
+    end = end or date.today() - timedelta(days=1)
+    days = window + lookback_days
+    start = end - timedelta(days=days - 1)
+
+    day_column = func.date(Payment.created_at)
+    payment_rows = db.query(Payment.business_id, day_column, func.sum(Payment.amount)).filter(
+        Payment.business_id.isnot(None),
+        Payment.status == "completed",
+        day_column >= start,
+        day_column <= end
+    ).group_by(Payment.business_id, day_column).all()
+
+    member_day = func.date(MemberPayment.paid_at)
+    member_rows = db.query(Member.business_id, member_day, func.sum(MemberPayment.amount)).join(
+        Member, MemberPayment.member_id == Member.id
+    ).filter(
+        member_day >= start,
+        member_day <= end
+    ).group_by(Member.business_id, member_day).all()
+
+    check_in_business = func.coalesce(CheckIn.business_id, Center.business_id)
+    check_in_day = func.date(CheckIn.check_in_time)
+    check_in_rows = db.query(check_in_business, check_in_day, func.count(CheckIn.id)).outerjoin(
+        Center, CheckIn.center_id == Center.id
+    ).filter(
+        check_in_day >= start,
+        check_in_day <= end
+    ).group_by(check_in_business, check_in_day).all()
+
+    business_ids = sorted({
+        row[0] for row in list(payment_rows) + list(member_rows) + list(check_in_rows)
+        if row[0] is not None
+    })
+    if not business_ids:
+        # No activity at all, so nothing in the scored days is anomalous
+        db.query(ReconciliationAnomaly).filter(
+            ReconciliationAnomaly.date >= start + timedelta(days=window),
+            ReconciliationAnomaly.date <= end
+        ).delete(synchronize_session=False)
+        db.commit()
+        return 0
+    business_index = {business_id: i for i, business_id in enumerate(business_ids)}
+
+    revenue = np.zeros((len(business_ids), days))
+    check_ins = np.zeros((len(business_ids), days))
+    _daily_series(payment_rows, business_index, start, days, revenue)
+    _daily_series(member_rows, business_index, start, days, revenue)
+    _daily_series(check_in_rows, business_index, start, days, check_ins)
+
+    scored_days = [start + timedelta(days=window + i) for i in range(lookback_days)]
+    existing = {
+        (row.business_id, row.date, row.metric): row
+        for row in db.query(ReconciliationAnomaly).filter(
+            ReconciliationAnomaly.date >= scored_days[0],
+            ReconciliationAnomaly.date <= end
+        ).all()
+    }
+
+    flagged: Dict[tuple, Dict] = {}
+    now = datetime.utcnow()
+    for metric, series in (("revenue", revenue), ("check_ins", check_ins)):
+        z, baseline = rolling_robust_z(series, window)
+        rows, cols = np.nonzero(np.abs(z) >= threshold)
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            flagged[(business_ids[i], scored_days[j], metric)] = {
+                "value": float(series[i, window + j]),
+                "baseline": float(baseline[i, j]),
+                "robust_z": round(float(z[i, j]), 3),
+                "direction": "spike" if z[i, j] > 0 else "dip",
+                "detected_at": now,
+            }
+
+    # A rerun replaces the scored days: days no longer anomalous (e.g. after a late
+    # payment import) lose their rows, the rest are updated in place
+    for key, anomaly in existing.items():
+        if key not in flagged:
+            db.delete(anomaly)
+    for key, values in flagged.items():
+        anomaly = existing.get(key)
+        if anomaly is None:
+            try:
+                with db.begin_nested():
+                    db.add(ReconciliationAnomaly(business_id=key[0], date=key[1], metric=key[2], **values))
+                continue
+            except IntegrityError:
+                # Written by a concurrent run
+                anomaly = db.query(ReconciliationAnomaly).filter(
+                    ReconciliationAnomaly.business_id == key[0],
+                    ReconciliationAnomaly.date == key[1],
+                    ReconciliationAnomaly.metric == key[2]
+                ).one()
+        for name, value in values.items():
+            setattr(anomaly, name, value)
+    found = len(flagged)
+
+    db.commit()
+    return found
@@ -0,0 +1,294 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app.models.business import BusinessProfile
+from app.models.center import Center
+from app.utils.geo import EARTH_RADIUS_KM, GRID_CELL_DEGREES, bounding_box, cell_range
+from app.utils.rating import RATING_PRIOR_MEAN
+
+CATALOG_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("lat", np.float64),
+    ("lon", np.float64),
+    ("center_type", np.int32),
+    ("credit_required", np.int32),
+    ("active", np.bool_),
+    ("score", np.float64),
+])
+
+# Grid cells per row of the spatial index; a cell's key is row * _GRID_COLUMNS + col
+_GRID_COLUMNS = int(round(360.0 / GRID_CELL_DEGREES)) + 1
+
+# How often a worker checks the database for writes made by other workers
+DEFAULT_CHECK_INTERVAL_SECONDS = 5.0
+
+# updated_at is stamped at flush time, so a transaction can commit a timestamp older
+# than the watermark; incremental reloads re-read this far behind it to pick those up
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def haversine_km_vector(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance from one point to many, in kilometres"""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lons - lon)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _cell_index(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (sorted cell keys, positions) of the active rows, bucketed on the same grid as
+    app.utils.geo.grid_cell. The keys of one grid row are contiguous, so a radius
+    query finds its candidates with two binary searches per grid row.
+    """
+    positions = np.flatnonzero(rows["active"])
+    cell_rows = np.floor((rows["lat"][positions] + 90.0) / GRID_CELL_DEGREES).astype(np.int64)
+    cell_cols = np.floor((rows["lon"][positions] + 180.0) / GRID_CELL_DEGREES).astype(np.int64)
+    keys = cell_rows * _GRID_COLUMNS + cell_cols
+    order = np.argsort(keys, kind="stable")
+    return keys[order], positions[order]
+
+
+class CenterCatalog:
+    """
+    Per worker, array backed copy of the center coordinates, types and credit cost.
+
+    Writes in this worker mark the catalog dirty through ORM listeners; writes
+    from other workers are picked up by a cheap max(updated_at)/count check, which
+    also compares the centers in the overlap window to notice late commits.
+    Reloads only fetch centers changed since the watermark less WATERMARK_OVERLAP;
+    a full rebuild is only needed when centers were deleted by another worker.
+    Radius queries only scan the centers in the grid cells the radius touches.
+    """
+
+    def __init__(self, check_interval: float = DEFAULT_CHECK_INTERVAL_SECONDS):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (rows, positions by center id, cell index), replaced as a whole on reload and
+        # never modified after, so readers that take one reference see a consistent set
+        empty = np.zeros(0, dtype=CATALOG_DTYPE)
+        self._snapshot: Tuple[np.ndarray, Dict[int, int], Tuple[np.ndarray, np.ndarray]] = (
+            empty, {}, _cell_index(empty)
+        )
+        self._type_codes: Dict[Optional[str], int] = {None: 0}
+        self._watermark: Optional[datetime] = None
+        # (id, updated_at) of the loaded centers with updated_at >= _window_start
+        self._window_start: Optional[datetime] = None
+        self._window: set = set()
+        self._loaded = False
+        self._dirty = True
+        self._removed: set = set()
+        self._last_check = 0.0
+        # Bumped on every reload so caches derived from the catalog can key on it
+        self.version = 0
+        self._subscribers: List[Callable] = []
+
+    def mark_dirty(self, removed_id: Optional[int] = None, full: bool = False):
+        """Reload on the next read; `full` rebuilds from every center instead of those past the watermark"""
+        with self._lock:
+            self._dirty = True
+            if full:
+                self._loaded = False
+            if removed_id is not None:
+                self._removed.add(removed_id)
+
+    def subscribe(self, callback: Callable):
+        """
+        Register `callback(full, upserts, removed_ids)` to be told about every reload.
+        `upserts` holds (center_id, latitude, longitude, center_type, credit_required,
+        services, hours_bitmap) rows as read from the database. A late subscriber
+        gets a full reload.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+            self._loaded = False
+
+    def type_code(self, center_type: Optional[str]) -> Optional[int]:
+        return self._type_codes.get(center_type)
+
+    def _code_for(self, center_type: Optional[str]) -> int:
+        code = self._type_codes.get(center_type)
+        if code is None:
+            code = len(self._type_codes)
+            self._type_codes[center_type] = code
+        return code
+
+    def _needs_reload(self, db: Session) -> Tuple[bool, bool]:
+        """(reload, full_rebuild)"""
+        if not self._loaded:
+            return True, True
+        if self._dirty:
+            return True, False
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False, False
+        self._last_check = now
+        latest, total = db.query(func.max(Center.updated_at), func.count(Center.id)).one()
+        known = len(self._snapshot[1])
+        if total < known:
+            return True, True
+        changed = latest is not None and (self._watermark is None or latest > self._watermark)
+        if not changed and total == known and self._window_start is not None:
+            # A late commit lands behind the watermark, so max(updated_at) does not move
+            changed = set(db.query(Center.id, Center.updated_at).filter(
+                Center.updated_at >= self._window_start
+            ).all()) != self._window
+        return changed or total > known, False
+
+    def _apply(self, centers: List[tuple], full: bool):
+        if full:
+            rows, positions = np.zeros(0, dtype=CATALOG_DTYPE), {}
+        else:
+            # Copy on write: readers may still hold the published snapshot
+            rows, positions = self._snapshot[0].copy(), dict(self._snapshot[1])
+
+        appended = []
+        upserts = []
+        for center_id, lat, lon, center_type, credit_required, services, hours_bitmap, score, updated_at in centers:
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+            record = (
+                center_id,
+                lat if lat is not None else np.nan,
+                lon if lon is not None else np.nan,
+                self._code_for(center_type),
+                credit_required if credit_required is not None else 1,
+                lat is not None and lon is not None,
+                score if score is not None else RATING_PRIOR_MEAN,
+            )
+            upserts.append((center_id, lat, lon, center_type, credit_required, services, hours_bitmap))
+            position = positions.get(center_id)
+            if position is None:
+                positions[center_id] = len(rows) + len(appended)
+                appended.append(record)
+            else:
+                rows[position] = record
+
+        if appended:
+            rows = np.concatenate([rows, np.array(appended, dtype=CATALOG_DTYPE)])
+
+        removed = list(self._removed)
+        for center_id in removed:
+            position = positions.pop(center_id, None)
+            if position is not None:
+                rows["active"][position] = False
+        self._removed = set()
+        self._snapshot = (rows, positions, _cell_index(rows))
+
+        for callback in self._subscribers:
+            callback(full, upserts, removed)
+
+    def refresh(self, db: Session):
+        with self._lock:
+            reload, full = self._needs_reload(db)
+            if not reload:
+                return
+            columns = (Center.id, Center.latitude, Center.longitude, Center.center_type,
+                       Center.credit_required, Center.services, Center.hours_bitmap,
+                       Center.bayesian_score, Center.updated_at)
+            query = db.query(*columns)
+            if not full and self._watermark is not None:
+                # Rows at or shortly before the watermark are read again; upserts are idempotent
+                since = self._watermark - WATERMARK_OVERLAP
+                query = query.filter((Center.updated_at >= since) | (Center.updated_at.is_(None)))
+            centers = query.all()
+            self._apply(centers, full)
+            if self._watermark is not None:
+                # Every center inside the new window was part of this load
+                self._window_start = self._watermark - WATERMARK_OVERLAP
+                self._window = {
+                    (center[0], center[-1]) for center in centers
+                    if center[-1] is not None and center[-1] >= self._window_start
+                }
+            self.version += 1
+            self._loaded = True
+            self._dirty = False
+            self._last_check = time.monotonic()
+
+    def nearest(
+        self,
+        db: Session,
+        latitude: float,
+        longitude: float,
+        radius_km: Optional[float] = None,
+        k: Optional[int] = None,
+        center_type: Optional[str] = None,
+        max_credit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(center_ids, distances_km) of matching centers, nearest first"""
+        self.refresh(db)
+        rows, _, cells = self._snapshot
+        if radius_km is not None:
+            rows = rows[self._in_cells(cells, latitude, longitude, radius_km)]
+        mask = rows["active"].copy()
+        if center_type is not None:
+            code = self.type_code(center_type)
+            if code is None:
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            mask &= rows["center_type"] == code
+        if max_credit is not None:
+            mask &= rows["credit_required"] <= max_credit
+        if radius_km is not None:
+            min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+            mask &= (rows["lat"] >= min_lat) & (rows["lat"] <= max_lat)
+            mask &= (rows["lon"] >= min_lon) & (rows["lon"] <= max_lon)
+
+        candidates = rows[mask]
+        distances = haversine_km_vector(latitude, longitude, candidates["lat"], candidates["lon"])
+        ids = candidates["id"]
+        if radius_km is not None:
+            within = distances <= radius_km
+            ids, distances = ids[within], distances[within]
+
+        if k is not None and 0 < k < len(distances):
+            top = np.argpartition(distances, k - 1)[:k]
+            ids, distances = ids[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    @staticmethod
+    def _in_cells(cells: Tuple[np.ndarray, np.ndarray], latitude: float, longitude: float,
+                  radius_km: float) -> np.ndarray:
+        """Positions of the active rows in the grid cells a radius query touches"""
+        keys, positions = cells
+        min_row, max_row, min_col, max_col = cell_range(latitude, longitude, radius_km)
+        grid_rows = np.arange(min_row, max_row + 1, dtype=np.int64) * _GRID_COLUMNS
+        starts = np.searchsorted(keys, grid_rows + min_col, side="left")
+        ends = np.searchsorted(keys, grid_rows + max_col, side="right")
+        return np.concatenate([positions[:0]] + [
+            positions[start:end] for start, end in zip(starts.tolist(), ends.tolist())
+        ])
+
+    def rows_for(self, center_ids: np.ndarray) -> np.ndarray:
+        """Catalog rows of the given centers that are still active"""
+        rows, positions, _ = self._snapshot
+        found = [positions[center_id] for center_id in center_ids.tolist() if center_id in positions]
+        rows = rows[np.array(found, dtype=np.int64)]
+        return rows[rows["active"]]
+
+
+center_catalog = CenterCatalog()
+
+
+@event.listens_for(Center, "after_insert")
+@event.listens_for(Center, "after_update")
+def _center_written(mapper, connection, center):
+    center_catalog.mark_dirty()
+
+
+@event.listens_for(Center, "after_delete")
+def _center_deleted(mapper, connection, center):
+    center_catalog.mark_dirty(removed_id=center.id)
+
+
+@event.listens_for(BusinessProfile, "after_insert")
+@event.listens_for(BusinessProfile, "after_update")
+def _business_hours_written(mapper, connection, profile):
+    # Hours are copied onto the business's centers with a bulk UPDATE that skips the Center listeners
+    center_catalog.mark_dirty()
@@ -0,0 +1,155 @@
+import math
+import threading
+from typing import Dict, List, Tuple
+from sqlalchemy.orm import Session
+from app.services.center_catalog import center_catalog
+
+MAX_ZOOM = 16
+# Cluster cell size in screen pixels (256px tiles, so 4 cells per tile side)
+CELLS_PER_TILE = 4
+MAX_LATITUDE = 85.05112878
+
+
+def lon_to_x(longitude: float) -> float:
+    return (longitude + 180.0) / 360.0
+
+
+def lat_to_y(latitude: float) -> float:
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    sin = math.sin(math.radians(latitude))
+    return 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+
+
+class CenterClusterIndex:
+    """
+    Hierarchical grid clusters of centers for every zoom level (0..MAX_ZOOM).
+
+    A zoom z cell is one quarter of a 256px tile, in Web Mercator, so the
+    cell of a point at zoom z is its zoom z+1 cell halved: clusters nest.
+    Each cell keeps (count, sum_lat, sum_lon, sum_ids); adding or removing a
+    center touches one cell per zoom, and a single-center cell's id is its sum_ids.
+    """
+
+    def __init__(self, max_zoom: int = MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self._lock = threading.Lock()
+        self._levels: List[Dict[Tuple[int, int], List[float]]] = [dict() for _ in range(max_zoom + 1)]
+        self._points: Dict[int, Tuple[float, float]] = {}
+
+    def _cells(self, latitude: float, longitude: float):
+        scale = CELLS_PER_TILE << self.max_zoom
+        cx = min(int(lon_to_x(longitude) * scale), scale - 1)
+        cy = min(int(lat_to_y(latitude) * scale), scale - 1)
+        for zoom in range(self.max_zoom, -1, -1):
+            yield zoom, (cx, cy)
+            cx >>= 1
+            cy >>= 1
+
+    def _add(self, center_id: int, latitude: float, longitude: float):
+        self._points[center_id] = (latitude, longitude)
+        for zoom, key in self._cells(latitude, longitude):
+            cell = self._levels[zoom].get(key)
+            if cell is None:
+                self._levels[zoom][key] = [1, latitude, longitude, center_id]
+            else:
+                cell[0] += 1
+                cell[1] += latitude
+                cell[2] += longitude
+                cell[3] += center_id
+
+    def _remove(self, center_id: int):
+        point = self._points.pop(center_id, None)
+        if point is None:
+            return
+        latitude, longitude = point
+        for zoom, key in self._cells(latitude, longitude):
+            cell = self._levels[zoom][key]
+            if cell[0] <= 1:
+                del self._levels[zoom][key]
+            else:
+                cell[0] -= 1
+                cell[1] -= latitude
+                cell[2] -= longitude
+                cell[3] -= center_id
+
+    def _expansion_zoom(self, zoom: int, x: int, y: int) -> int:
+        """
+        First zoom after `zoom` at which the cell's centers fall into more than one
+        cell; max_zoom if they never split (e.g. centers at the same address).
+        Called with the lock held.
+        """
+        while zoom < self.max_zoom:
+            zoom += 1
+            children = self._levels[zoom]
+            occupied = [
+                (cx, cy) for cx in (2 * x, 2 * x + 1) for cy in (2 * y, 2 * y + 1)
+                if (cx, cy) in children
+            ]
+            if len(occupied) > 1:
+                return zoom
+            x, y = occupied[0]
+        return self.max_zoom
+
+    def apply_changes(self, full: bool, upserts: List[tuple], removed: List[int]):
+        """Catalog subscriber: keep the clusters in step with center writes"""
+        with self._lock:
+            if full:
+                self._levels = [dict() for _ in range(self.max_zoom + 1)]
+                self._points = {}
+            for center_id in removed:
+                self._remove(center_id)
+            for center_id, latitude, longitude, *_ in upserts:
+                self._remove(center_id)
+                if latitude is not None and longitude is not None:
+                    self._add(center_id, latitude, longitude)
+
+    def clusters(
+        self,
+        db: Session,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        zoom: int
+    ) -> List[Dict]:
+        """Clusters intersecting the bbox at the zoom level"""
+        center_catalog.refresh(db)
+        zoom = max(0, min(self.max_zoom, zoom))
+        scale = CELLS_PER_TILE << zoom
+        x0 = max(0, int(lon_to_x(min_lon) * scale))
+        x1 = min(scale - 1, int(lon_to_x(max_lon) * scale))
+        # Mercator y grows southwards
+        y0 = max(0, int(lat_to_y(max_lat) * scale))
+        y1 = min(scale - 1, int(lat_to_y(min_lat) * scale))
+
+        with self._lock:
+            level = self._levels[zoom]
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(level):
+                cells = (
+                    ((x, y), level[(x, y)])
+                    for x in range(x0, x1 + 1)
+                    for y in range(y0, y1 + 1)
+                    if (x, y) in level
+                )
+            else:
+                cells = (
+                    (key, cell) for key, cell in level.items()
+                    if x0 <= key[0] <= x1 and y0 <= key[1] <= y1
+                )
+
+            results = []
+            for (x, y), (count, sum_lat, sum_lon, sum_ids) in cells:
+                count = int(count)
+                results.append({
+                    "latitude": round(sum_lat / count, 6),
+                    "longitude": round(sum_lon / count, 6),
+                    "count": count,
+                    "center_id": int(sum_ids) if count == 1 else None,
+                    # Zoom at which the cluster starts splitting
+                    "expansion_zoom": self._expansion_zoom(zoom, x, y) if count > 1 else None,
+                })
+        return results
+
+
+cluster_index = CenterClusterIndex()
+center_catalog.subscribe(cluster_index.apply_changes)
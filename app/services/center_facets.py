@@ -0,0 +1,141 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.center_catalog import center_catalog
+
+SERVICE = "service"
+CENTER_TYPE = "center_type"
+CREDIT = "credit"
+
+# (label, min_credit, max_credit) buckets for the credit_required facet
+CREDIT_BUCKETS = (
+    ("1", 1, 1),
+    ("2", 2, 2),
+    ("3-5", 3, 5),
+    ("6+", 6, None),
+)
+
+
+def normalize_tag(tag) -> Optional[str]:
+    if not isinstance(tag, str):
+        return None
+    tag = " ".join(tag.strip().lower().split())
+    return tag or None
+
+
+def credit_bucket(credit_required: Optional[int]) -> str:
+    credit_required = credit_required if credit_required is not None else 1
+    for label, low, high in CREDIT_BUCKETS:
+        if credit_required >= low and (high is None or credit_required <= high):
+            return label
+    return CREDIT_BUCKETS[0][0]
+
+
+def ids_to_bitset(center_ids: np.ndarray) -> int:
+    """Pack center ids into an int with bit `id` set for each"""
+    if len(center_ids) == 0:
+        return 0
+    flags = np.zeros(int(center_ids.max()) + 1, dtype=bool)
+    flags[center_ids] = True
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+
+def bitset_contains(bits: int, center_ids: np.ndarray) -> np.ndarray:
+    """Boolean mask of which `center_ids` have their bit set"""
+    if bits <= 0 or len(center_ids) == 0:
+        return np.zeros(len(center_ids), dtype=bool)
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    flags = np.unpackbits(raw, bitorder="little")
+    inside = center_ids < len(flags)
+    mask = np.zeros(len(center_ids), dtype=bool)
+    mask[inside] = flags[center_ids[inside]].astype(bool)
+    return mask
+
+
+class CenterFacetIndex:
+    """
+    Inverted index from (facet, value) to a bitset of center ids.
+
+    Services, center type and credit bucket are indexed when the center
+    catalog reloads, so a filter or facet count is a handful of integer
+    ANDs and popcounts with no JSON parsing per request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._keys: Dict[int, Tuple[Tuple[str, str], ...]] = {}
+
+    def _unset(self, center_id: int):
+        bit = 1 << center_id
+        for key in self._keys.pop(center_id, ()):
+            remaining = self._postings[key] & ~bit
+            if remaining:
+                self._postings[key] = remaining
+            else:
+                del self._postings[key]
+
+    def apply_changes(self, full: bool, upserts: List[tuple], removed: List[int]):
+        """Catalog subscriber: re-index written centers"""
+        with self._lock:
+            if full:
+                self._postings = defaultdict(int)
+                self._keys = {}
+            for center_id in removed:
+                self._unset(center_id)
+            for center_id, latitude, longitude, center_type, credit_required, services, *_ in upserts:
+                self._unset(center_id)
+                if latitude is None or longitude is None:
+                    continue
+                keys = {(CREDIT, credit_bucket(credit_required))}
+                if center_type:
+                    keys.add((CENTER_TYPE, center_type))
+                for tag in services or []:
+                    tag = normalize_tag(tag)
+                    if tag:
+                        keys.add((SERVICE, tag))
+                bit = 1 << center_id
+                for key in keys:
+                    self._postings[key] |= bit
+                self._keys[center_id] = tuple(keys)
+
+    def matching(
+        self,
+        services: Optional[Iterable[str]] = None,
+        match_all: bool = True,
+        credit_buckets: Optional[Iterable[str]] = None
+    ) -> Optional[int]:
+        """
+        Bitset of centers having all (or any) of the services and falling in one
+        of the credit buckets. None when no facet filter was given.
+        """
+        with self._lock:
+            result = None
+            tags = [tag for tag in (normalize_tag(s) for s in services or []) if tag]
+            if tags:
+                postings = [self._postings.get((SERVICE, tag), 0) for tag in tags]
+                combined = postings[0]
+                for bits in postings[1:]:
+                    combined = combined & bits if match_all else combined | bits
+                result = combined
+            if credit_buckets:
+                combined = 0
+                for label in credit_buckets:
+                    combined |= self._postings.get((CREDIT, label), 0)
+                result = combined if result is None else result & combined
+            return result
+
+    def counts(self, within: int) -> Dict[str, Dict[str, int]]:
+        """Per facet value counts of the centers in the `within` bitset"""
+        counts: Dict[str, Dict[str, int]] = {SERVICE: {}, CENTER_TYPE: {}, CREDIT: {}}
+        with self._lock:
+            for (facet, value), bits in self._postings.items():
+                count = (bits & within).bit_count()
+                if count:
+                    counts[facet][value] = count
+        return counts
+
+
+facet_index = CenterFacetIndex()
+center_catalog.subscribe(facet_index.apply_changes)
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+from app.models.center import Center, CenterCommentEntry
+from app.services.center_catalog import center_catalog
+from app.utils.rating import bayesian_average
+
+DEFAULT_COMMENT_PAGE = 20
+
+
+def add_rating(db: Session, center_id: int, rating: float) -> Optional[Tuple[float, int, float]]:
+    """
+    Fold one rating into the center's aggregate with a single UPDATE, so concurrent
+    ratings are never lost. Returns (average, count, bayesian_score), or None if the
+    center does not exist. The caller commits.
+    """
+    count = func.coalesce(Center.rating_count, 0)
+    total = func.coalesce(Center.rating_sum, func.coalesce(Center.rating, 0.0) * count) + rating
+    result = db.execute(
+        update(Center).where(Center.id == center_id).values(
+            rating_sum=total,
+            rating_count=count + 1,
+            rating=total / (count + 1),
+            bayesian_score=bayesian_average(total, count + 1),
+            updated_at=datetime.utcnow(),
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    # Bulk UPDATEs skip the ORM listeners that normally flag the catalog
+    center_catalog.mark_dirty()
+    return db.query(Center.rating, Center.rating_count, Center.bayesian_score).filter(
+        Center.id == center_id
+    ).one()
+
+
+def add_comment(db: Session, center_id: int, comment: str) -> CenterCommentEntry:
+    """Append a comment; the caller commits"""
+    entry = CenterCommentEntry(center_id=center_id, comment=comment)
+    db.add(entry)
+    return entry
+
+
+def comments_page(
+    db: Session,
+    center_id: int,
+    before_id: Optional[int] = None,
+    limit: int = DEFAULT_COMMENT_PAGE
+) -> Tuple[List[CenterCommentEntry], Optional[int]]:
+    """Newest first page of comments older than `before_id`, plus the next cursor"""
+    query = db.query(CenterCommentEntry).filter(CenterCommentEntry.center_id == center_id)
+    if before_id is not None:
+        query = query.filter(CenterCommentEntry.id < before_id)
+    entries = query.order_by(CenterCommentEntry.id.desc()).limit(limit + 1).all()
+    next_cursor = entries[limit - 1].id if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def ensure_center_feedback(db: Session) -> int:
+    """
+    Move comments still stored in Center.comments into center_comments and fill in
+    rating sums and Bayesian scores for centers rated before they existed.
+    Returns the number of comments moved.
+    """
+    moved = 0
+    legacy = db.query(Center.id, Center.comments).filter(Center.comments.isnot(None)).all()
+    for center_id, comments in legacy:
+        if not comments:
+            continue
+        for comment in comments:
+            db.add(CenterCommentEntry(center_id=center_id, comment=str(comment)))
+            moved += 1
+        db.execute(update(Center).where(Center.id == center_id).values(comments=[]))
+
+    count = func.coalesce(Center.rating_count, 0)
+    total = func.coalesce(Center.rating, 0.0) * count
+    # Columns added to an existing table take their DEFAULT (0 and the prior), so a
+    # rated center with no sum still has to be rebuilt from its average
+    db.execute(
+        update(Center).where(
+            count > 0, or_(Center.rating_sum.is_(None), Center.rating_sum == 0)
+        ).values(
+            rating_sum=total,
+            bayesian_score=bayesian_average(total, count),
+        ).execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Center).where(or_(Center.rating_sum.is_(None), Center.bayesian_score.is_(None))).values(
+            rating_sum=func.coalesce(Center.rating_sum, 0.0),
+            bayesian_score=bayesian_average(func.coalesce(Center.rating_sum, 0.0), count),
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return moved
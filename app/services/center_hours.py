@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.business import BusinessProfile
+from app.services.center_catalog import center_catalog
+from app.utils.opening_hours import bitmap_to_int, compile_hours, week_slot
+
+BUSINESS_TZ = ZoneInfo(settings.BUSINESS_TIMEZONE)
+
+
+def local_time(moment: Optional[datetime] = None) -> datetime:
+    """`moment` (now by default) in business local time; naive values are taken as local"""
+    if moment is None:
+        return datetime.now(BUSINESS_TZ)
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(BUSINESS_TZ)
+
+
+def ensure_compiled_hours(db: Session) -> int:
+    """Compile hours saved before the bitmaps existed and copy them onto the centers"""
+    profiles = db.query(BusinessProfile).filter(
+        BusinessProfile.business_hours.isnot(None),
+        BusinessProfile.hours_bitmap.is_(None)
+    ).all()
+    compiled = 0
+    for profile in profiles:
+        bitmap = compile_hours(profile.business_hours)
+        if bitmap is None:
+            continue
+        # The BusinessProfile listeners copy the bitmap onto its centers on flush
+        profile.hours_bitmap = bitmap
+        compiled += 1
+    if compiled:
+        db.commit()
+    return compiled
+
+
+class CenterHoursIndex:
+    """Weekly open-interval bitmaps of centers, kept as ints for single bit tests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hours: Dict[int, int] = {}
+
+    def apply_changes(self, full: bool, upserts: List[tuple], removed: List[int]):
+        """Catalog subscriber: pick up recompiled hours"""
+        with self._lock:
+            if full:
+                self._hours = {}
+            for center_id in removed:
+                self._hours.pop(center_id, None)
+            for center_id, *_, hours_bitmap in upserts:
+                bits = bitmap_to_int(hours_bitmap)
+                if bits:
+                    self._hours[center_id] = bits
+                else:
+                    self._hours.pop(center_id, None)
+
+    def open_mask(self, center_ids: np.ndarray, moment: Optional[datetime] = None) -> np.ndarray:
+        """
+        Which centers are open at `moment` (now by default).
+        Centers without known hours count as closed.
+        """
+        slot = week_slot(local_time(moment))
+        hours = self._hours
+        return np.fromiter(
+            ((hours.get(center_id, 0) >> slot) & 1 for center_id in center_ids.tolist()),
+            dtype=bool,
+            count=len(center_ids)
+        )
+
+
+hours_index = CenterHoursIndex()
+center_catalog.subscribe(hours_index.apply_changes)
@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.models.business import BusinessProfile
+from app.models.center import Center
+from app.services.center_catalog import center_catalog
+from app.utils.rating import RATING_PRIOR_MEAN
+
+CSV = "csv"
+GEOJSON = "geojson"
+IMPORT_FORMATS = (CSV, GEOJSON)
+
+IMPORT_CHUNK = 500
+MAX_REPORTED_ERRORS = 1000
+
+_REQUIRED = ("name", "address", "state")
+_OPTIONAL_TEXT = ("center_type", "description", "booking_schedule", "cac_number",
+                  "bank_name", "account_number", "account_name")
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _list(value) -> List[str]:
+    """JSON list, or a ; or | separated string"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    value = str(value).strip()
+    if value.startswith("["):
+        try:
+            return _list(json.loads(value))
+        except ValueError:
+            pass
+    separator = "|" if "|" in value else ";"
+    return [item.strip() for item in value.split(separator) if item.strip()]
+
+
+def validate_row(fields: Dict) -> Tuple[Optional[Dict], List[str]]:
+    """(center values, errors) for one input record"""
+    errors = []
+    values = {}
+    for name in _REQUIRED:
+        values[name] = _text(fields.get(name))
+        if values[name] is None:
+            errors.append(f"{name} is required")
+    for name in _OPTIONAL_TEXT:
+        values[name] = _text(fields.get(name))
+
+    for name, low, high in (("latitude", -90.0, 90.0), ("longitude", -180.0, 180.0)):
+        try:
+            values[name] = float(fields.get(name))
+            if not low <= values[name] <= high:
+                errors.append(f"{name} must be between {low:g} and {high:g}")
+        except (TypeError, ValueError):
+            errors.append(f"{name} must be a number")
+
+    credit = fields.get("credit_required")
+    try:
+        values["credit_required"] = 1 if credit in (None, "") else int(credit)
+        if values["credit_required"] < 0:
+            errors.append("credit_required must not be negative")
+    except (TypeError, ValueError):
+        errors.append("credit_required must be an integer")
+
+    business_id = fields.get("business_id")
+    try:
+        values["business_id"] = None if business_id in (None, "") else int(business_id)
+    except (TypeError, ValueError):
+        errors.append("business_id must be an integer")
+
+    values["services"] = _list(fields.get("services"))
+    values["images"] = _list(fields.get("images"))
+    return (None if errors else values), errors
+
+
+def _csv_records(stream: BinaryIO) -> Iterator[Tuple[int, Dict]]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    try:
+        # Row 1 is the header
+        for line, row in enumerate(reader, start=2):
+            yield line, {(key or "").strip().lower(): value for key, value in row.items()}
+    except csv.Error as e:
+        raise ValueError(f"line {reader.line_num}: {e}")
+
+
+def _geojson_records(stream: BinaryIO) -> Iterator[Tuple[int, Dict]]:
+    """Features of a FeatureCollection; a Point geometry gives the coordinates"""
+    document = json.load(stream)
+    features = document.get("features", []) if isinstance(document, dict) else []
+    for index, feature in enumerate(features, start=1):
+        feature = feature if isinstance(feature, dict) else {}
+        fields = {key.lower(): value for key, value in (feature.get("properties") or {}).items()}
+        geometry = feature.get("geometry") or {}
+        coordinates = geometry.get("coordinates")
+        if geometry.get("type") == "Point" and isinstance(coordinates, list) and len(coordinates) >= 2:
+            fields["longitude"], fields["latitude"] = coordinates[0], coordinates[1]
+        yield index, fields
+
+
+def _insert_chunk(db: Session, chunk: List[Tuple[int, Dict]], errors: List[Dict]) -> int:
+    """Bulk insert a chunk; if the database rejects it, retry row by row to isolate the bad rows"""
+    # Stamped at insert time, not once per import, so a long import does not write
+    # timestamps older than changes other sessions committed meanwhile
+    now = datetime.utcnow()
+    for _, values in chunk:
+        values["updated_at"] = now
+    try:
+        db.execute(insert(Center), [values for _, values in chunk])
+        db.commit()
+        return len(chunk)
+    except SQLAlchemyError:
+        db.rollback()
+
+    inserted = 0
+    for row, values in chunk:
+        try:
+            db.execute(insert(Center), [values])
+            db.commit()
+            inserted += 1
+        except SQLAlchemyError as e:
+            db.rollback()
+            errors.append({"row": row, "errors": [str(e.orig) if getattr(e, "orig", None) else str(e)]})
+    return inserted
+
+
+def import_centers(db: Session, stream: BinaryIO, file_format: str, chunk_size: int = IMPORT_CHUNK) -> Dict:
+    """
+    Validate and bulk insert centers from a CSV (header row, one center per line)
+    or GeoJSON FeatureCollection. Invalid rows are reported and skipped; valid rows
+    are inserted in chunks. The center catalog is brought up to date once at the
+    end rather than per center.
+    """
+    records = _csv_records(stream) if file_format == CSV else _geojson_records(stream)
+    errors: List[Dict] = []
+    total = inserted = 0
+    hours_by_business: Dict[int, Optional[bytes]] = {}
+    chunk: List[Tuple[int, Dict]] = []
+
+    for row, fields in records:
+        total += 1
+        values, row_errors = validate_row(fields)
+        if row_errors:
+            errors.append({"row": row, "errors": row_errors})
+            continue
+        # Bulk inserts skip the ORM listeners, so copy the owning business's hours here
+        business_id = values["business_id"]
+        if business_id is not None and business_id not in hours_by_business:
+            hours_by_business[business_id] = db.query(BusinessProfile.hours_bitmap).filter(
+                BusinessProfile.business_id == business_id
+            ).scalar()
+        values.update(
+            hours_bitmap=hours_by_business.get(business_id),
+            rating=0.0,
+            rating_count=0,
+            rating_sum=0.0,
+            bayesian_score=RATING_PRIOR_MEAN,
+            comments=[],
+        )
+        chunk.append((row, values))
+        if len(chunk) >= chunk_size:
+            inserted += _insert_chunk(db, chunk, errors)
+            chunk = []
+    if chunk:
+        inserted += _insert_chunk(db, chunk, errors)
+
+    if inserted:
+        # Full reload: the catalog's updated_at watermark may already be past the first chunks
+        center_catalog.mark_dirty(full=True)
+    return {
+        "total_rows": total,
+        "inserted": inserted,
+        "failed": total - inserted,
+        "errors": sorted(errors, key=lambda error: error["row"])[:MAX_REPORTED_ERRORS],
+    }
@@ -0,0 +1,245 @@
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import event, func, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, object_session
+from app.models.center import Center
+from app.services.center_catalog import center_catalog
+
+# Previous versions per state a client can still get a delta from
+DELTA_HISTORY = 8
+RESOLVE_BATCH = 500
+# ETag suffix of the gzip encoded representation
+GZIP_ETAG_SUFFIX = "-gz"
+
+
+def _state_key(state: Optional[str]) -> str:
+    return (state or "").strip().lower()
+
+
+def _center_item(center: Center) -> Dict:
+    """CenterOut fields (comments are paged separately) plus the base64 weekly hours bitmap"""
+    return {
+        "id": center.id,
+        "name": center.name,
+        "address": center.address,
+        "state": center.state,
+        "latitude": center.latitude,
+        "longitude": center.longitude,
+        "center_type": center.center_type,
+        "images": center.images or [],
+        "services": center.services or [],
+        "description": center.description,
+        "booking_schedule": center.booking_schedule,
+        "credit_required": center.credit_required if center.credit_required is not None else 1,
+        "rating": center.rating,
+        "rating_count": center.rating_count or 0,
+        "bayesian_score": center.bayesian_score,
+        "hours_bitmap": base64.b64encode(center.hours_bitmap).decode() if center.hours_bitmap else None,
+    }
+
+
+def _encode(payload: Dict) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+class StateSnapshot:
+    def __init__(self, state: str, items: Dict[int, Dict]):
+        self.state = state
+        self.items = items
+        self.item_hashes = {
+            center_id: hashlib.sha1(_encode(item)).hexdigest() for center_id, item in items.items()
+        }
+        # Strong validator: identical content gives the same ETag on every worker
+        digest = hashlib.sha256()
+        for center_id in sorted(self.item_hashes):
+            digest.update(f"{center_id}:{self.item_hashes[center_id]};".encode())
+        self.etag = f'"{digest.hexdigest()[:32]}"'
+        self.body = _encode({
+            "kind": "full",
+            "state": state,
+            "etag": self.etag,
+            "centers": [items[center_id] for center_id in sorted(items)],
+        })
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        self._deltas: Dict[str, tuple] = {}
+
+    def delta_from(self, base: "StateSnapshot") -> tuple:
+        """(body, gzipped) of the changes since `base`"""
+        cached = self._deltas.get(base.etag)
+        if cached is None:
+            upserts = [
+                self.items[center_id] for center_id in sorted(self.items)
+                if base.item_hashes.get(center_id) != self.item_hashes[center_id]
+            ]
+            removed = sorted(set(base.item_hashes) - set(self.item_hashes))
+            body = _encode({
+                "kind": "delta",
+                "state": self.state,
+                "base": base.etag,
+                "etag": self.etag,
+                "upserts": upserts,
+                "removed": removed,
+            })
+            cached = (body, gzip.compress(body, mtime=0))
+            self._deltas[base.etag] = cached
+        return cached
+
+
+class SnapshotStore:
+    """
+    Per worker gzip snapshots of the centers in each state.
+
+    Centers committed in this worker have their old and new states rebuilt in a
+    background thread right after the commit. Changes from other workers arrive
+    with center catalog reloads and are rebuilt after the next read. Either way the
+    previous snapshot keeps being served until the new one is ready.
+    """
+
+    def __init__(self, history: int = DELTA_HISTORY):
+        self.history = history
+        self._lock = threading.Lock()
+        self._current: Dict[str, StateSnapshot] = {}
+        self._previous: Dict[str, "OrderedDict[str, StateSnapshot]"] = {}
+        self._center_states: Dict[int, str] = {}
+        self._pending_ids: Set[int] = set()
+        self._stale: Set[str] = set()
+        self._building: Set[str] = set()
+
+    def apply_changes(self, full: bool, upserts: List[tuple], removed: List[int]):
+        """Catalog subscriber: note which states have to be rebuilt"""
+        with self._lock:
+            if full:
+                # Every built state is rebuilt anyway, no need to resolve each center
+                self._stale.update(self._current)
+                return
+            for center_id in removed:
+                state = self._center_states.pop(center_id, None)
+                if state is not None:
+                    self._stale.add(state)
+            for row in upserts:
+                center_id = row[0]
+                state = self._center_states.get(center_id)
+                if state is not None:
+                    self._stale.add(state)
+                self._pending_ids.add(center_id)
+
+    def states_changed(self, bind: Engine, states: Iterable[Optional[str]]):
+        """Rebuild the built snapshots of these states in background threads"""
+        keys = {_state_key(state) for state in states}
+        with self._lock:
+            # States nobody has asked for yet are built on first read
+            keys &= set(self._current)
+            self._stale.update(keys)
+            keys -= self._building
+            self._building.update(keys)
+        for key in keys:
+            threading.Thread(target=self.rebuild_in_background, args=(bind, key), daemon=True).start()
+
+    def _resolve_pending(self, db: Session):
+        with self._lock:
+            pending = list(self._pending_ids)
+            self._pending_ids = set()
+        if not pending:
+            return
+        states = set()
+        for start in range(0, len(pending), RESOLVE_BATCH):
+            batch = pending[start:start + RESOLVE_BATCH]
+            states.update(state for (state,) in db.query(Center.state).filter(Center.id.in_(batch)).distinct())
+        with self._lock:
+            self._stale.update(_state_key(state) for state in states)
+
+    def build(self, db: Session, state: str) -> StateSnapshot:
+        key = _state_key(state)
+        with self._lock:
+            self._stale.discard(key)
+        centers = db.query(Center).filter(func.lower(func.trim(Center.state)) == key).all()
+        snapshot = StateSnapshot(key, {center.id: _center_item(center) for center in centers})
+        with self._lock:
+            for center in centers:
+                self._center_states[center.id] = key
+            current = self._current.get(key)
+            if current is None or current.etag != snapshot.etag:
+                if current is not None:
+                    previous = self._previous.setdefault(key, OrderedDict())
+                    previous[current.etag] = current
+                    previous.move_to_end(current.etag)
+                    while len(previous) > self.history:
+                        previous.popitem(last=False)
+                self._current[key] = snapshot
+            else:
+                snapshot = current
+            self._building.discard(key)
+        return snapshot
+
+    def rebuild_in_background(self, bind: Engine, state: str):
+        """Background task body: rebuild one state's snapshot with its own session"""
+        db = Session(bind=bind)
+        try:
+            self.build(db, state)
+        finally:
+            with self._lock:
+                self._building.discard(_state_key(state))
+            db.close()
+
+    def snapshot(self, db: Session, state: str) -> tuple:
+        """
+        (snapshot, needs_rebuild). The first request for a state builds it inline;
+        afterwards a stale snapshot is served and the caller schedules the rebuild.
+        """
+        key = _state_key(state)
+        center_catalog.refresh(db)
+        self._resolve_pending(db)
+        with self._lock:
+            current = self._current.get(key)
+            needs_rebuild = current is not None and key in self._stale and key not in self._building
+            if needs_rebuild:
+                self._building.add(key)
+        if current is None:
+            current = self.build(db, key)
+        return current, needs_rebuild
+
+    def previous(self, state: str, etag: str) -> Optional[StateSnapshot]:
+        with self._lock:
+            return self._previous.get(_state_key(state), {}).get(etag)
+
+
+snapshot_store = SnapshotStore()
+center_catalog.subscribe(snapshot_store.apply_changes)
+
+_CHANGED_STATES_KEY = "snapshot_states_changed"
+
+
+def _note_states(center: Center, states: Iterable[Optional[str]]):
+    session = object_session(center)
+    if session is not None:
+        session.info.setdefault(_CHANGED_STATES_KEY, set()).update(states)
+
+
+@event.listens_for(Center, "after_insert")
+@event.listens_for(Center, "after_delete")
+def _center_added_or_removed(mapper, connection, center):
+    _note_states(center, [center.state])
+
+
+@event.listens_for(Center, "after_update")
+def _center_changed(mapper, connection, center):
+    history = inspect(center).attrs.state.history
+    _note_states(center, [center.state, *history.deleted])
+
+
+@event.listens_for(Session, "after_commit")
+def _rebuild_changed_states(session):
+    states = session.info.pop(_CHANGED_STATES_KEY, None)
+    if states:
+        snapshot_store.states_changed(session.get_bind(), states)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changed_states(session):
+    session.info.pop(_CHANGED_STATES_KEY, None)
@@ -0,0 +1,156 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+from app.models.activity import Activity
+from app.models.activity_meta import ActivityJoin
+from app.models.booking import Booking, BookingStatus
+from app.models.discovery import ACTIVITY, SCHEDULE, ClassSlot, slot_values
+from app.models.schedule import Schedule, ScheduleStatus
+from app.utils.geo import cell_range, haversine_km
+
+DEFAULT_RADIUS_KM = 5.0
+DEFAULT_WINDOW_HOURS = 3.0
+MAX_DISCOVERY_RESULTS = 200
+
+# Bookings in these states do not hold a spot on their schedule
+RELEASED_STATUSES = (BookingStatus.cancelled, BookingStatus.rejected)
+
+
+def _reserve(db: Session, kind: str, source_id: int, counter, capacity, key) -> bool:
+    """Take one spot with a conditional UPDATE on the source row and mirror it on its slot"""
+    result = db.execute(
+        update(counter.class_).where(
+            key == source_id,
+            or_(capacity.is_(None), func.coalesce(counter, 0) < capacity)
+        ).values({counter.key: func.coalesce(counter, 0) + 1}).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return False
+    db.execute(
+        update(ClassSlot).where(ClassSlot.kind == kind, ClassSlot.source_id == source_id).values(
+            booked=ClassSlot.booked + 1
+        )
+    )
+    return True
+
+
+def _release(db: Session, kind: str, source_id: int, counter, key):
+    """Give back one spot with a conditional UPDATE that never takes the counters below zero"""
+    db.execute(
+        update(counter.class_).where(key == source_id, counter > 0).values({counter.key: counter - 1})
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(ClassSlot).where(
+            ClassSlot.kind == kind, ClassSlot.source_id == source_id, ClassSlot.booked > 0
+        ).values(booked=ClassSlot.booked - 1)
+    )
+
+
+def reserve_schedule_spot(db: Session, schedule_id: int) -> bool:
+    """Increment Schedule.current_bookings unless the schedule is full; the caller commits"""
+    return _reserve(db, SCHEDULE, schedule_id, Schedule.current_bookings, Schedule.capacity, Schedule.id)
+
+
+def reserve_activity_spot(db: Session, activity_id: int) -> bool:
+    """Increment Activity.join_count unless the activity is full; the caller commits"""
+    return _reserve(db, ACTIVITY, activity_id, Activity.join_count, Activity.capacity, Activity.id)
+
+
+def release_schedule_spot(db: Session, schedule_id: int):
+    """Decrement Schedule.current_bookings for a cancelled or rejected booking; the caller commits"""
+    _release(db, SCHEDULE, schedule_id, Schedule.current_bookings, Schedule.id)
+
+
+def release_activity_spot(db: Session, activity_id: int):
+    """Decrement Activity.join_count for a user leaving the activity; the caller commits"""
+    _release(db, ACTIVITY, activity_id, Activity.join_count, Activity.id)
+
+
+def discover_classes(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float = DEFAULT_RADIUS_KM,
+    starts_from: Optional[datetime] = None,
+    within_hours: float = DEFAULT_WINDOW_HOURS,
+    min_spots: int = 1,
+    kind: Optional[str] = None,
+    limit: int = 50
+) -> List[Tuple[ClassSlot, float]]:
+    """
+    (slot, distance_km) pairs for classes and activities within the radius that start
+    inside the time window and have at least `min_spots` spots left, soonest first.
+    One range query over the (cell, start_time) index; distances are exact.
+    """
+    starts_from = starts_from or datetime.now()
+    min_row, max_row, min_col, max_col = cell_range(latitude, longitude, radius_km)
+    query = db.query(ClassSlot).filter(
+        ClassSlot.cell_row.between(min_row, max_row),
+        ClassSlot.cell_col.between(min_col, max_col),
+        ClassSlot.start_time >= starts_from,
+        ClassSlot.start_time <= starts_from + timedelta(hours=within_hours),
+    )
+    if min_spots > 0:
+        query = query.filter(or_(ClassSlot.capacity.is_(None), ClassSlot.capacity - ClassSlot.booked >= min_spots))
+    if kind:
+        query = query.filter(ClassSlot.kind == kind)
+
+    results = []
+    for slot in query.order_by(ClassSlot.start_time, ClassSlot.id):
+        distance_km = haversine_km(latitude, longitude, slot.latitude, slot.longitude)
+        if distance_km <= radius_km:
+            results.append((slot, distance_km))
+            if len(results) >= limit:
+                break
+    return results
+
+
+def ensure_class_slots(db: Session) -> int:
+    """
+    Index upcoming schedules and activities that have no slot yet (created before
+    the index existed). Schedule booking and activity join counters are reconciled
+    from their bookings and joins first, since they were not maintained before;
+    duplicate joins are dropped so the unique join index can be built. Returns
+    slots written.
+    """
+    first_joins = select(func.min(ActivityJoin.id)).group_by(ActivityJoin.activity_id, ActivityJoin.user_id)
+    db.execute(delete(ActivityJoin).where(ActivityJoin.id.notin_(first_joins)))
+    for index in ActivityJoin.__table__.indexes:
+        index.create(db.connection(), checkfirst=True)
+
+    existing = select(ClassSlot.source_id)
+    schedules_missing = and_(
+        Schedule.id.notin_(existing.where(ClassSlot.kind == SCHEDULE)),
+        Schedule.end_time >= datetime.now(),
+        Schedule.status.notin_([ScheduleStatus.cancelled, ScheduleStatus.completed]),
+    )
+    booked = select(func.count(Booking.id)).where(
+        Booking.schedule_id == Schedule.id,
+        Booking.status.notin_([BookingStatus.cancelled, BookingStatus.rejected]),
+    ).scalar_subquery()
+    db.execute(
+        update(Schedule).where(schedules_missing).values(current_bookings=booked)
+        .execution_options(synchronize_session=False)
+    )
+
+    activities_missing = and_(
+        Activity.id.notin_(existing.where(ClassSlot.kind == ACTIVITY)),
+        Activity.is_active == True,
+        Activity.date >= date.today(),
+    )
+    joined = select(func.count(ActivityJoin.id)).where(ActivityJoin.activity_id == Activity.id).scalar_subquery()
+    db.execute(
+        update(Activity).where(activities_missing).values(join_count=joined)
+        .execution_options(synchronize_session=False)
+    )
+
+    connection = db.connection()
+    sources = [(SCHEDULE, schedule) for schedule in db.query(Schedule).filter(schedules_missing)]
+    sources += [(ACTIVITY, activity) for activity in db.query(Activity).filter(activities_missing)]
+    slots = [values for values in (slot_values(connection, kind, source) for kind, source in sources) if values]
+    if slots:
+        db.execute(ClassSlot.__table__.insert(), slots)
+    db.commit()
+    return len(slots)
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from app.models.credit_ledger import DEDUCTION, OPENING, REFUND, REWARD, TOPUP, CreditBalanceSnapshot, CreditLedgerEntry
+from app.models.user import User
+
+_ADDED_KINDS = (TOPUP, REWARD, REFUND)
+# Entries younger than this are left in the tail, in case a transaction holding a
+# lower entry ID has not committed yet
+SNAPSHOT_GRACE = timedelta(minutes=1)
+
+
+def _ledger_totals():
+    """Aggregates over ledger entries: (balance change, spent, added, last entry id)"""
+    return (
+        func.coalesce(func.sum(CreditLedgerEntry.delta), 0),
+        func.coalesce(func.sum(case((CreditLedgerEntry.kind == DEDUCTION, -CreditLedgerEntry.delta), else_=0)), 0),
+        func.coalesce(func.sum(case((CreditLedgerEntry.kind.in_(_ADDED_KINDS), CreditLedgerEntry.delta), else_=0)), 0),
+        func.max(CreditLedgerEntry.id),
+    )
+
+
+def credit_totals(db: Session, user_id: int, at: Optional[datetime] = None) -> Dict:
+    """
+    The user's balance, credits spent and credits added, now or as of `at`: the
+    latest snapshot at or before that time (one index seek) plus the ledger tail
+    after it. The tail is short because the snapshot job runs regularly.
+    """
+    snapshots = db.query(CreditBalanceSnapshot).filter(CreditBalanceSnapshot.user_id == user_id)
+    if at is not None:
+        snapshots = snapshots.filter(CreditBalanceSnapshot.as_of <= at)
+    snapshot = snapshots.order_by(CreditBalanceSnapshot.entry_id.desc()).first()
+
+    tail = db.query(*_ledger_totals()).filter(CreditLedgerEntry.user_id == user_id)
+    if snapshot is not None:
+        tail = tail.filter(CreditLedgerEntry.id > snapshot.entry_id)
+    if at is not None:
+        tail = tail.filter(CreditLedgerEntry.created_at <= at)
+    delta, spent, added, last_entry_id = tail.one()
+    return {
+        "balance": (snapshot.balance if snapshot else 0) + delta,
+        "credits_spent": (snapshot.credits_spent if snapshot else 0) + spent,
+        "credits_added": (snapshot.credits_added if snapshot else 0) + added,
+        "last_entry_id": last_entry_id or (snapshot.entry_id if snapshot else None),
+        "as_of": at or datetime.utcnow(),
+    }
+
+
+def ledger_page(
+    db: Session,
+    user_id: int,
+    before_id: Optional[int] = None,
+    limit: int = 50
+) -> Tuple[List[CreditLedgerEntry], Optional[int]]:
+    """Newest first page of the user's ledger entries older than `before_id`, plus the next cursor"""
+    query = db.query(CreditLedgerEntry).filter(CreditLedgerEntry.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(CreditLedgerEntry.id < before_id)
+    entries = query.order_by(CreditLedgerEntry.id.desc()).limit(limit + 1).all()
+    next_cursor = entries[limit - 1].id if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def snapshot_credit_balances(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Job: fold each user's ledger tail into a new snapshot, so balance reads stay a
+    snapshot plus a short tail. Users with no new entries are skipped.
+    Returns snapshots written. Commits.
+    """
+    now = now or datetime.utcnow()
+    latest = select(
+        CreditBalanceSnapshot.user_id, func.max(CreditBalanceSnapshot.entry_id).label("entry_id")
+    ).group_by(CreditBalanceSnapshot.user_id).subquery()
+    tails = db.query(CreditLedgerEntry.user_id, latest.c.entry_id, *_ledger_totals()).outerjoin(
+        latest, latest.c.user_id == CreditLedgerEntry.user_id
+    ).filter(
+        CreditLedgerEntry.id > func.coalesce(latest.c.entry_id, 0),
+        CreditLedgerEntry.created_at < now - SNAPSHOT_GRACE
+    ).group_by(CreditLedgerEntry.user_id, latest.c.entry_id).all()
+    if not tails:
+        return 0
+
+    previous = {
+        (snapshot.user_id, snapshot.entry_id): snapshot
+        for snapshot in db.query(CreditBalanceSnapshot).filter(
+            CreditBalanceSnapshot.user_id.in_([user_id for user_id, entry_id, *_ in tails if entry_id is not None]),
+            CreditBalanceSnapshot.entry_id.in_([entry_id for user_id, entry_id, *_ in tails if entry_id is not None])
+        )
+    }
+    as_of = dict(db.query(CreditLedgerEntry.id, CreditLedgerEntry.created_at).filter(
+        CreditLedgerEntry.id.in_([last_entry_id for *_, last_entry_id in tails])
+    ))
+    rows = []
+    for user_id, entry_id, delta, spent, added, last_entry_id in tails:
+        base = previous.get((user_id, entry_id))
+        rows.append({
+            "user_id": user_id,
+            "entry_id": last_entry_id,
+            "as_of": as_of[last_entry_id],
+            "balance": (base.balance if base else 0) + delta,
+            "credits_spent": (base.credits_spent if base else 0) + spent,
+            "credits_added": (base.credits_added if base else 0) + added,
+            "created_at": datetime.utcnow(),
+        })
+    db.execute(CreditBalanceSnapshot.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
+
+
+def ensure_credit_ledger(db: Session) -> int:
+    """
+    Open the ledger of users who held credit before it existed with one opening
+    entry for their balance, so ledger totals match User.flex_credit. The entry is
+    dated when the user signed up, so as-of totals before the backfill still
+    include the balance (its history before the ledger is not known).
+    Returns entries written.
+    """
+    has_entries = select(CreditLedgerEntry.id).where(CreditLedgerEntry.user_id == User.id).exists()
+    now = datetime.utcnow()
+    openings = [
+        {"user_id": user_id, "kind": OPENING, "delta": balance, "created_at": created_at or now}
+        for user_id, balance, created_at in db.query(User.id, User.flex_credit, User.created_at).filter(
+            User.flex_credit.isnot(None), User.flex_credit != 0, ~has_entries
+        )
+    ]
+    if openings:
+        db.execute(CreditLedgerEntry.__table__.insert(), openings)
+    db.commit()
+    return len(openings)
@@ -0,0 +1,78 @@
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Event types that are always stored raw, whatever their volume
+NEVER_SAMPLED = {"check_in", "check_out", "payment", "booking", "signup"}
+NEVER_SAMPLED_PREFIXES = ("payment", "check_in", "check_out")
+
+# Keep rate once a business goes over its free budget for the event type.
+# Types not listed here are never sampled.
+SAMPLING_POLICIES: Dict[str, float] = {
+    "view": 0.1,
+    "page_view": 0.1,
+    "screen_view": 0.1,
+    "scroll": 0.05,
+    "impression": 0.1,
+    "click": 0.25,
+}
+
+# Number of events per business and type kept unsampled in each window
+DEFAULT_FREE_EVENTS_PER_WINDOW = 100
+DEFAULT_WINDOW_SECONDS = 60
+
+
+def is_never_sampled(event_type: str) -> bool:
+    return event_type in NEVER_SAMPLED or event_type.startswith(NEVER_SAMPLED_PREFIXES)
+
+
+class AdaptiveSampler:
+    """
+    Per worker adaptive sampler for the event ingestion path.
+
+    Low volume businesses keep every event (weight 1.0). Once a business
+    sends more than `free_per_window` events of a sampled type within the
+    window, further events are kept with the policy's probability p and
+    carry weight 1/p, so weighted sums stay unbiased.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, float]] = None,
+        free_per_window: int = DEFAULT_FREE_EVENTS_PER_WINDOW,
+        window_seconds: int = DEFAULT_WINDOW_SECONDS,
+        seed: Optional[int] = None
+    ):
+        self.policies = SAMPLING_POLICIES if policies is None else policies
+        self.free_per_window = free_per_window
+        self.window_seconds = window_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._counts: Dict[Tuple[int, str], int] = {}
+
+    def decide(self, business_id: int, event_type: str) -> Optional[float]:
+        """Return the weight to store the event with, or None to drop it"""
+        rate = self.policies.get(event_type)
+        if rate is None or rate >= 1.0 or is_never_sampled(event_type):
+            return 1.0
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window_seconds:
+                self._window_start = now
+                self._counts.clear()
+            key = (business_id, event_type)
+            seen = self._counts.get(key, 0) + 1
+            self._counts[key] = seen
+            if seen <= self.free_per_window:
+                return 1.0
+            keep = self._random.random() < rate
+
+        if not keep or rate <= 0:
+            return None
+        return 1.0 / rate
+
+
+event_sampler = AdaptiveSampler()
@@ -0,0 +1,125 @@
+import base64
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.services.center_catalog import center_catalog, haversine_km_vector
+from app.services.center_facets import bitset_contains, facet_index, ids_to_bitset
+from app.services.center_hours import hours_index
+from app.utils.geo import geohash_bounds, geohash_encode, haversine_km
+from app.utils.ttl_cache import TTLCache
+
+# ~1.2km x 0.6km cells; every caller inside a cell shares the candidate list
+CACHE_GEOHASH_PRECISION = 6
+CANDIDATE_CACHE_TTL_SECONDS = 30
+
+candidate_cache = TTLCache(maxsize=4096, ttl=CANDIDATE_CACHE_TTL_SECONDS)
+
+SORT_DISTANCE = "distance"
+SORT_RATING = "rating"
+
+
+def encode_cursor(sort_key: float, center_id: int) -> str:
+    raw = f"{sort_key:.9f}:{center_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Raises ValueError on a malformed cursor"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        sort_key, center_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return float(sort_key), int(center_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _cell_candidates(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    center_type: Optional[str]
+) -> np.ndarray:
+    """Ids of every center that can be within `radius_km` of any point in the caller's geohash cell"""
+    center_catalog.refresh(db)
+    cell = geohash_encode(latitude, longitude, CACHE_GEOHASH_PRECISION)
+    key = (cell, round(radius_km, 3), center_type, center_catalog.version)
+    cached = candidate_cache.get(key)
+    if cached is not None:
+        return cached
+
+    min_lat, max_lat, min_lon, max_lon = geohash_bounds(cell)
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+    margin_km = haversine_km(center_lat, center_lon, max_lat, max_lon)
+    ids, _ = center_catalog.nearest(
+        db, center_lat, center_lon, radius_km=radius_km + margin_km, center_type=center_type
+    )
+    candidate_cache.set(key, ids)
+    return ids
+
+
+def nearby_centers_page(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    center_type: Optional[str] = None,
+    k: Optional[int] = None,
+    cursor: Optional[str] = None,
+    allowed: Optional[int] = None,
+    open_at: Optional[datetime] = None,
+    sort: str = SORT_DISTANCE
+) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+    """
+    One page of centers within the radius ordered by (distance, id), or by
+    descending Bayesian rating score with `sort="rating"`, plus the cursor for
+    the next page. Candidates come from the per-cell cache and are re-ranked for
+    the caller's exact location. `allowed` is an optional facet bitset of center
+    ids to keep; `open_at` keeps centers open at that time.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    candidates = _cell_candidates(db, latitude, longitude, radius_km, center_type)
+    if allowed is not None:
+        candidates = candidates[bitset_contains(allowed, candidates)]
+    if open_at is not None:
+        candidates = candidates[hours_index.open_mask(candidates, open_at)]
+    if len(candidates) == 0:
+        return candidates, np.zeros(0), None
+
+    rows = center_catalog.rows_for(candidates)
+    distances = haversine_km_vector(latitude, longitude, rows["lat"], rows["lon"])
+    within = distances <= radius_km
+    rows, distances = rows[within], distances[within]
+    ids = rows["id"]
+    # Rank at the cursor's precision so page boundaries are stable
+    keys = np.round(-rows["score"] if sort == SORT_RATING else distances, 9)
+
+    if after is not None:
+        after_key, after_id = after
+        keep = (keys > after_key) | ((keys == after_key) & (ids > after_id))
+        ids, distances, keys = ids[keep], distances[keep], keys[keep]
+
+    order = np.lexsort((ids, keys))
+    ids, distances, keys = ids[order], distances[order], keys[order]
+
+    next_cursor = None
+    if k is not None and len(ids) > k:
+        ids, distances, keys = ids[:k], distances[:k], keys[:k]
+        next_cursor = encode_cursor(float(keys[-1]), int(ids[-1]))
+    return ids, distances, next_cursor
+
+
+def nearby_facet_counts(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    center_type: Optional[str] = None
+) -> Dict:
+    """Service, type and credit bucket counts over the centers within the radius"""
+    center_ids, _, _ = nearby_centers_page(db, latitude, longitude, radius_km, center_type=center_type)
+    counts = facet_index.counts(ids_to_bitset(center_ids))
+    counts["total"] = len(center_ids)
+    return counts
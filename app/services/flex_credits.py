@@ -0,0 +1,62 @@
+from typing import Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.models.center import Center
+from app.models.credit_ledger import DEDUCTION, TOPUP, CreditLedgerEntry
+from app.models.user import User
+
+
+def center_credit_cost(center_id: int):
+    """Scalar subquery for a center's credit price, so a deduction needs no prior read"""
+    return select(func.coalesce(Center.credit_required, 0)).where(Center.id == center_id).scalar_subquery()
+
+
+def _record(db: Session, user_id: int, kind: str, delta: int, reference: Optional[str]):
+    db.execute(CreditLedgerEntry.__table__.insert().values(
+        user_id=user_id, kind=kind, delta=delta, reference=reference
+    ))
+
+
+def deduct_flex_credit(
+    db: Session,
+    user_id: int,
+    credits,
+    kind: str = DEDUCTION,
+    reference: Optional[str] = None
+) -> Optional[int]:
+    """
+    Spend `credits` with one conditional UPDATE ... RETURNING, so concurrent scans
+    can never overdraw a balance and no row lock is held across a read.
+    `credits` is an int or a SQL expression such as `center_credit_cost`.
+    Returns the remaining balance, or None if the user (or center) is missing or short.
+    The ledger entry is written alongside; the caller inserts the check-in and
+    commits in the same transaction.
+    """
+    row = db.execute(
+        update(User).where(User.id == user_id, User.flex_credit >= credits).values(
+            flex_credit=User.flex_credit - credits
+        ).returning(User.flex_credit, credits).execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+    remaining, spent = row
+    _record(db, user_id, kind, -spent, reference)
+    return remaining
+
+
+def add_flex_credit(
+    db: Session,
+    user_id: int,
+    credits: int,
+    kind: str = TOPUP,
+    reference: Optional[str] = None
+) -> Optional[int]:
+    """Atomic top-up (or reward/refund); returns the new balance, or None if the user is missing. The caller commits."""
+    remaining = db.execute(
+        update(User).where(User.id == user_id).values(
+            flex_credit=func.coalesce(User.flex_credit, 0) + credits
+        ).returning(User.flex_credit).execution_options(synchronize_session=False)
+    ).scalar()
+    if remaining is not None:
+        _record(db, user_id, kind, credits, reference)
+    return remaining
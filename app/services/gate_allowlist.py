@@ -0,0 +1,109 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user import User
+
+# Versions kept per credit price so devices a few refreshes behind still get a delta
+ALLOWLIST_HISTORY = 8
+# Recompute at most this often per credit price, however many devices poll
+ALLOWLIST_REFRESH_SECONDS = 30.0
+
+
+def _version(user_ids: FrozenSet[int]) -> str:
+    digest = hashlib.sha256(",".join(map(str, sorted(user_ids))).encode())
+    return digest.hexdigest()[:16]
+
+
+def sign_allowlist(body: Dict, secret: Optional[str] = None) -> str:
+    """HMAC-SHA256 over the canonical JSON of the body (sorted keys, no spaces)"""
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hmac.new((secret or settings.ALLOWLIST_SIGNING_SECRET).encode(), canonical.encode(), hashlib.sha256).hexdigest()
+
+
+class AllowlistStore:
+    """
+    Users with enough flex credit for a given price, kept per price (not per
+    center) since every center with the same price shares one list. Recent
+    versions are kept so a device can be sent only what changed.
+    """
+
+    def __init__(self, history: int = ALLOWLIST_HISTORY, refresh_seconds: float = ALLOWLIST_REFRESH_SECONDS):
+        self.history = history
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._versions: Dict[int, "OrderedDict[str, FrozenSet[int]]"] = {}
+        self._refreshed_at: Dict[int, float] = {}
+
+    def current(self, db: Session, credits: int) -> Tuple[str, FrozenSet[int]]:
+        with self._lock:
+            versions = self._versions.get(credits)
+            if versions and time.monotonic() - self._refreshed_at[credits] < self.refresh_seconds:
+                version = next(reversed(versions))
+                return version, versions[version]
+
+        user_ids = frozenset(
+            user_id for (user_id,) in db.query(User.id).filter(
+                User.flex_credit >= credits, User.is_active != False
+            ).all()
+        )
+        version = _version(user_ids)
+        with self._lock:
+            versions = self._versions.setdefault(credits, OrderedDict())
+            versions.pop(version, None)
+            versions[version] = user_ids
+            while len(versions) > self.history:
+                versions.popitem(last=False)
+            self._refreshed_at[credits] = time.monotonic()
+        return version, user_ids
+
+    def previous(self, credits: int, version: str) -> Optional[FrozenSet[int]]:
+        with self._lock:
+            return self._versions.get(credits, {}).get(version)
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+            self._refreshed_at.clear()
+
+
+allowlist_store = AllowlistStore()
+
+
+def build_allowlist(db: Session, center_id: int, credits: int, since: Optional[str] = None) -> Dict:
+    """
+    Signed allowlist for a center: the full user list, or only the users added and
+    removed since `since` when that version is still known. Devices cache it to
+    admit people while offline and should refresh before `expires_at`.
+    The signature covers every other field, nulls included.
+    """
+    version, user_ids = allowlist_store.current(db, credits)
+    issued_at = datetime.utcnow().replace(microsecond=0)
+    body = {
+        "center_id": center_id,
+        "credit_required": credits,
+        "version": version,
+        "base_version": None,
+        "user_ids": None,
+        "added": None,
+        "removed": None,
+        "issued_at": issued_at.isoformat(),
+        "expires_at": (issued_at + timedelta(seconds=settings.ALLOWLIST_TTL_SECONDS)).isoformat(),
+    }
+    base = allowlist_store.previous(credits, since) if since else None
+    if base is not None:
+        body.update(
+            base_version=since,
+            added=sorted(user_ids - base),
+            removed=sorted(base - user_ids),
+        )
+    else:
+        body["user_ids"] = sorted(user_ids)
+    body["signature"] = sign_allowlist(body)
+    return body
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.scan_check_in import GateScan, ScanCheckIn, SpentQRToken
+from app.models.user import User
+from app.services.flex_credits import center_credit_cost, deduct_flex_credit
+from app.services.occupancy import admit
+from app.services.qr_tokens import InvalidQRToken, ReplayedQRToken, qr_nonce_cache, spend_qr_token, verify_qr_token
+
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+DUPLICATE = "duplicate"
+
+# How long a device may stay offline, and how far ahead its clock may run
+MAX_OFFLINE_AGE = timedelta(hours=24)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def _result(scan: GateScan, status: Optional[str] = None) -> Dict:
+    return {
+        "scan_id": scan.scan_id,
+        "status": status or scan.status,
+        "detail": scan.detail,
+        "user_id": scan.user_id,
+        "remaining_flex_credit": scan.remaining_flex_credit,
+    }
+
+
+def _stored_scan(db: Session, scan_id: str) -> Optional[GateScan]:
+    return db.query(GateScan).filter(GateScan.scan_id == scan_id).first()
+
+
+def _apply_scan(db: Session, center_id: int, scan: GateScan, token: Union[str, bytes], now: datetime):
+    """Validate and charge one scan, filling in `scan`; runs inside a savepoint"""
+    if scan.scanned_at > now + MAX_CLOCK_SKEW or scan.scanned_at < now - MAX_OFFLINE_AGE:
+        scan.status, scan.detail = REJECTED, "Scan time out of range"
+        return
+    try:
+        # The token only had to be valid when the device scanned it
+        claims = verify_qr_token(token, now=(scan.scanned_at - datetime(1970, 1, 1)).total_seconds())
+    except InvalidQRToken as e:
+        scan.status, scan.detail = REJECTED, str(e)
+        return
+    scan.user_id = claims.user_id
+    if claims.center_id != center_id:
+        scan.status, scan.detail = REJECTED, "QR code does not match this user or center"
+        return
+    nonce = claims.nonce.hex()
+    # Live scans and other uploads spend tokens in the same table
+    if claims.nonce in qr_nonce_cache or db.query(SpentQRToken.nonce).filter(SpentQRToken.nonce == nonce).first():
+        scan.status, scan.detail = REJECTED, "QR code already used"
+        return
+
+    remaining = deduct_flex_credit(db, claims.user_id, center_credit_cost(center_id), reference=f"center:{center_id}")
+    if remaining is None:
+        exists = db.query(User.id).filter(User.id == claims.user_id).first()
+        scan.status = REJECTED
+        scan.detail = "Insufficient flex credit" if exists else "User not found"
+        return
+    check_in = ScanCheckIn(user_id=claims.user_id, center_id=center_id, timestamp=scan.scanned_at)
+    db.add(check_in)
+    db.flush()
+    # The gate already let them in, so a full center still counts them
+    admit(db, center_id, user_id=claims.user_id, started_at=scan.scanned_at, enforce_capacity=False)
+    # Only charged scans spend the token, so a rejected scan does not burn it;
+    # a concurrent spend raises ReplayedQRToken and the caller undoes the charge
+    spend_qr_token(db, claims)
+    scan.nonce = nonce
+    scan.status, scan.detail = ACCEPTED, None
+    scan.remaining_flex_credit = remaining
+    scan.scan_check_in_id = check_in.id
+
+
+def process_scan_batch(
+    db: Session,
+    center_id: int,
+    device_id: Optional[str],
+    scans: List[Dict],
+    now: Optional[datetime] = None
+) -> List[Dict]:
+    """
+    Apply scans uploaded by a gate device in order, in one transaction, each in
+    its own savepoint so one bad scan cannot undo the others. Every outcome is
+    stored under the scan ID: re-sent scans get their original result back with
+    status "duplicate", and a QR token (nonce) is charged at most once.
+    `scans` items have scan_id, token (text or raw bytes) and scanned_at (naive UTC). Commits.
+    """
+    now = now or datetime.utcnow()
+    scan_ids = [item["scan_id"] for item in scans]
+    stored = {
+        scan.scan_id: scan
+        for scan in db.query(GateScan).filter(GateScan.scan_id.in_(scan_ids)).all()
+    } if scan_ids else {}
+
+    results = []
+    for item in scans:
+        previous = stored.get(item["scan_id"])
+        if previous is not None:
+            results.append(_result(previous, DUPLICATE))
+            continue
+
+        scan = GateScan(
+            scan_id=item["scan_id"],
+            device_id=device_id,
+            center_id=center_id,
+            scanned_at=item["scanned_at"],
+        )
+        savepoint = db.begin_nested()
+        try:
+            _apply_scan(db, center_id, scan, item["token"], now)
+            db.add(scan)
+            savepoint.commit()
+        except (IntegrityError, ReplayedQRToken):
+            savepoint.rollback()
+            previous = _stored_scan(db, item["scan_id"])
+            if previous is not None:
+                # A concurrent upload of the same scan (a retry after reconnecting) stored it first
+                stored[previous.scan_id] = previous
+                results.append(_result(previous, DUPLICATE))
+                continue
+            # Another scan spent the same token concurrently
+            scan = GateScan(
+                scan_id=item["scan_id"], device_id=device_id, center_id=center_id,
+                user_id=scan.user_id, scanned_at=item["scanned_at"],
+                status=REJECTED, detail="QR code already used",
+            )
+            try:
+                with db.begin_nested():
+                    db.add(scan)
+            except IntegrityError:
+                scan = _stored_scan(db, item["scan_id"])
+                stored[scan.scan_id] = scan
+                results.append(_result(scan, DUPLICATE))
+                continue
+        stored[scan.scan_id] = scan
+        results.append(_result(scan))
+    db.commit()
+    return results
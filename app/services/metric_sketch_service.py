@@ -0,0 +1,125 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.analytics import MetricSketch, MetricValue
+from app.utils.quantile_sketch import KLLSketch
+
+SESSION_DURATION = "session_duration"
+PAYMENT_AMOUNT = "payment_amount"
+SKETCH_METRICS = (SESSION_DURATION, PAYMENT_AMOUNT)
+
+
+def record_metric_value(
+    db: Session,
+    business_id: Optional[int],
+    metric: str,
+    value: float,
+    day: Optional[date] = None
+) -> Optional[MetricValue]:
+    """
+    Queue a value for the business's sketch for the day. It is a plain insert, so
+    concurrent writers never overwrite each other's update of the sketch row; reads
+    include it at once and the rollup folds it into the sketch.
+    Does not commit: callers write it in the same transaction as the source row.
+    """
+    if business_id is None or value is None:
+        return None
+    row = MetricValue(business_id=business_id, date=day or datetime.utcnow().date(), metric=metric, value=value)
+    db.add(row)
+    return row
+
+
+def _fold(db: Session, business_id: int, day: date, metric: str, values: List[float]):
+    """Add values to a sketch row, holding its lock while it is rewritten"""
+    key = (MetricSketch.business_id == business_id, MetricSketch.date == day, MetricSketch.metric == metric)
+    row = db.query(MetricSketch).filter(*key).with_for_update().first()
+    if row is None:
+        try:
+            with db.begin_nested():
+                row = MetricSketch(business_id=business_id, date=day, metric=metric, count=0, sketch={})
+                db.add(row)
+        except IntegrityError:
+            # Created concurrently
+            row = db.query(MetricSketch).filter(*key).with_for_update().first()
+
+    sketch = KLLSketch.from_dict(row.sketch)
+    sketch.extend(values)
+    # Reassign so SQLAlchemy notices the JSON change
+    row.sketch = sketch.to_dict()
+    row.count = sketch.n
+
+
+def fold_metric_values(db: Session) -> int:
+    """
+    Job: fold queued metric values into their daily sketches. DELETE ... RETURNING
+    claims the values, so overlapping runs never fold a value twice.
+    Returns values folded. Commits.
+    """
+    claimed = db.execute(
+        delete(MetricValue).returning(MetricValue.business_id, MetricValue.date, MetricValue.metric, MetricValue.value)
+    ).all()
+    groups: Dict[tuple, List[float]] = defaultdict(list)
+    for business_id, day, metric, value in claimed:
+        groups[(business_id, day, metric)].append(value)
+    for (business_id, day, metric), values in groups.items():
+        _fold(db, business_id, day, metric, values)
+    db.commit()
+    return len(claimed)
+
+
+def merged_sketch(
+    db: Session,
+    business_id: int,
+    metric: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> KLLSketch:
+    """Merge the daily sketches in the range, and values not yet folded in, into a single sketch"""
+    query = db.query(MetricSketch).filter(
+        MetricSketch.business_id == business_id,
+        MetricSketch.metric == metric
+    )
+    if date_from:
+        query = query.filter(MetricSketch.date >= date_from)
+    if date_to:
+        query = query.filter(MetricSketch.date <= date_to)
+
+    pending = db.query(MetricValue.value).filter(
+        MetricValue.business_id == business_id,
+        MetricValue.metric == metric
+    )
+    if date_from:
+        pending = pending.filter(MetricValue.date >= date_from)
+    if date_to:
+        pending = pending.filter(MetricValue.date <= date_to)
+
+    merged = KLLSketch()
+    for row in query.all():
+        merged.merge(KLLSketch.from_dict(row.sketch))
+    # Values the rollup has not folded in yet
+    merged.extend(value for (value,) in pending)
+    return merged
+
+
+def metric_quantiles(
+    db: Session,
+    business_id: int,
+    metric: str,
+    quantiles: List[float],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> Dict:
+    sketch = merged_sketch(db, business_id, metric, date_from, date_to)
+    values = sketch.quantiles(quantiles)
+    return {
+        "metric": metric,
+        "count": sketch.n,
+        "min": sketch.min_value,
+        "max": sketch.max_value,
+        "quantiles": [
+            {"q": q, "value": value} for q, value in zip(quantiles, values)
+        ]
+    }
@@ -0,0 +1,97 @@
+from datetime import date
+from typing import Dict, Iterable, Optional
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from app.models.analytics import AnalyticsEvent, BusinessMetrics
+from app.models.booking import Booking
+from app.models.member import Member, MemberPayment
+from app.models.payment import Payment
+from app.services.metric_sketch_service import fold_metric_values
+from app.services.occupancy import business_session_minutes
+
+
+def _weighted_event_totals(db: Session, day: date) -> Dict[int, Dict]:
+    # Sampled events carry their inverse sampling weight, so sums stay unbiased
+    rows = db.query(
+        AnalyticsEvent.business_id,
+        func.sum(AnalyticsEvent.sample_weight),
+        func.sum(case((AnalyticsEvent.event_type == "check_in", AnalyticsEvent.sample_weight), else_=0)),
+        func.count(func.distinct(AnalyticsEvent.user_id))
+    ).filter(
+        func.date(AnalyticsEvent.event_timestamp) == day
+    ).group_by(AnalyticsEvent.business_id).all()
+    return {
+        business_id: {
+            "total_events": int(round(total or 0)),
+            "total_check_ins": int(round(check_ins or 0)),
+            "unique_users": users or 0
+        }
+        for business_id, total, check_ins, users in rows
+    }
+
+
+def _revenue_totals(db: Session, day: date) -> Dict[int, float]:
+    totals: Dict[int, float] = {}
+    payments = db.query(Payment.business_id, func.sum(Payment.amount)).filter(
+        Payment.business_id.isnot(None),
+        Payment.status == "completed",
+        func.date(Payment.created_at) == day
+    ).group_by(Payment.business_id).all()
+    member_payments = db.query(Member.business_id, func.sum(MemberPayment.amount)).join(
+        Member, MemberPayment.member_id == Member.id
+    ).filter(
+        func.date(MemberPayment.paid_at) == day
+    ).group_by(Member.business_id).all()
+    for business_id, amount in list(payments) + list(member_payments):
+        totals[business_id] = totals.get(business_id, 0.0) + float(amount or 0.0)
+    return totals
+
+
+def _booking_totals(db: Session, day: date) -> Dict[int, int]:
+    rows = db.query(Booking.business_id, func.count(Booking.id)).filter(
+        func.date(Booking.created_at) == day
+    ).group_by(Booking.business_id).all()
+    return {business_id: count for business_id, count in rows}
+
+
+def rollup_business_metrics(
+    db: Session,
+    day: date,
+    business_ids: Optional[Iterable[int]] = None
+) -> int:
+    """
+    Compute the BusinessMetrics row of every business with activity on `day`.
+    Event based totals use sample weights; avg_session_duration (minutes) comes from
+    the running dwell totals. Queued metric values are folded into their sketches
+    first. Returns the number of rows written.
+    """
+    fold_metric_values(db)
+    events = _weighted_event_totals(db, day)
+    revenue = _revenue_totals(db, day)
+    bookings = _booking_totals(db, day)
+    session_minutes = business_session_minutes(db, day)
+
+    ids = set(events) | set(revenue) | set(bookings) | set(session_minutes)
+    ids.discard(None)
+    if business_ids is not None:
+        ids &= set(business_ids)
+
+    existing = {
+        row.business_id: row
+        for row in db.query(BusinessMetrics).filter(BusinessMetrics.date == day).all()
+    }
+    for business_id in ids:
+        row = existing.get(business_id)
+        if row is None:
+            row = BusinessMetrics(business_id=business_id, date=day)
+            db.add(row)
+        event_totals = events.get(business_id, {})
+        row.total_revenue = revenue.get(business_id, 0.0)
+        row.total_bookings = bookings.get(business_id, 0)
+        row.unique_users = event_totals.get("unique_users", 0)
+        row.total_check_ins = event_totals.get("total_check_ins", 0)
+        row.total_events = event_totals.get("total_events", 0)
+        row.avg_session_duration = session_minutes.get(business_id, 0.0)
+
+    db.commit()
+    return len(ids)
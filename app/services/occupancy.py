@@ -0,0 +1,237 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.center import Center
+from app.models.occupancy import CHECKED_OUT, EXPIRED, CenterDwellDay, CenterOccupancy, UserCenterDwell, Visit
+from app.services.metric_sketch_service import SESSION_DURATION, record_metric_value
+from app.services.occupancy_feed import mark_occupancy_changed
+
+
+def _stale_after() -> timedelta:
+    return timedelta(hours=settings.VISIT_MAX_HOURS)
+
+
+def _adjust(db: Session, center_id: int, delta: int):
+    """Move a center's counter by `delta`, never below zero"""
+    active = CenterOccupancy.active + delta
+    db.execute(
+        update(CenterOccupancy).where(CenterOccupancy.center_id == center_id).values(
+            active=case((active < 0, 0), else_=active), updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+    mark_occupancy_changed(db, center_id)
+
+
+def _increment(db: Session, model, key: Dict, amounts: Dict, **values):
+    """Add `amounts` to the totals row at `key` (and set `values`), creating the row on first use"""
+    statement = update(model).where(*(getattr(model, name) == value for name, value in key.items())).values(
+        **{name: getattr(model, name) + amount for name, amount in amounts.items()}, **values
+    ).execution_options(synchronize_session=False)
+    if db.execute(statement).rowcount == 1:
+        return
+    try:
+        with db.begin_nested():
+            db.add(model(**key, **amounts, **values))
+    except IntegrityError:
+        # Created concurrently
+        db.execute(statement)
+
+
+def _record_dwell(db: Session, visit: Visit):
+    """Add a checked-out visit to the user and center dwell totals and the session length sketch"""
+    if visit.user_id is not None:
+        _increment(
+            db, UserCenterDwell, {"user_id": visit.user_id, "center_id": visit.center_id},
+            {"visits": 1, "total_seconds": visit.duration_seconds}, last_visit_at=visit.started_at
+        )
+    _increment(
+        db, CenterDwellDay, {"center_id": visit.center_id, "date": visit.started_at.date()},
+        {"visits": 1, "total_seconds": visit.duration_seconds}
+    )
+    business_id = db.query(Center.business_id).filter(Center.id == visit.center_id).scalar()
+    record_metric_value(db, business_id, SESSION_DURATION, visit.duration_seconds / 60, day=visit.started_at.date())
+
+
+def _close(db: Session, visit: Visit, ended_at: datetime, reason: str) -> bool:
+    """
+    Close an open visit, store its duration and release its place; False if something
+    else closed it first. Only checked-out visits count towards dwell totals, since an
+    expired visit's length is not known.
+    """
+    duration_seconds = max(int((ended_at - visit.started_at).total_seconds()), 0)
+    closed = db.execute(
+        update(Visit).where(Visit.id == visit.id, Visit.ended_at.is_(None)).values(
+            ended_at=ended_at, end_reason=reason, duration_seconds=duration_seconds
+        ).execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if closed:
+        _adjust(db, visit.center_id, -1)
+        visit.ended_at, visit.end_reason, visit.duration_seconds = ended_at, reason, duration_seconds
+        if reason == CHECKED_OUT:
+            _record_dwell(db, visit)
+    return closed
+
+
+def open_visit(db: Session, center_id: int, user_id: Optional[int] = None, member_id: Optional[int] = None) -> Optional[Visit]:
+    """The visitor's open visit at the center, if any (pass user_id or member_id)"""
+    query = db.query(Visit).filter(Visit.center_id == center_id, Visit.ended_at.is_(None))
+    if user_id is not None:
+        query = query.filter(Visit.user_id == user_id)
+    else:
+        query = query.filter(Visit.member_id == member_id)
+    return query.order_by(Visit.started_at.desc()).first()
+
+
+def is_full(db: Session, center_id: int) -> bool:
+    """Whether a new visitor would be turned away right now"""
+    row = db.query(CenterOccupancy.active, CenterOccupancy.max_occupancy).filter(
+        CenterOccupancy.center_id == center_id
+    ).first()
+    return row is not None and row.max_occupancy is not None and row.active >= row.max_occupancy
+
+
+def admit(
+    db: Session,
+    center_id: int,
+    user_id: Optional[int] = None,
+    member_id: Optional[int] = None,
+    started_at: Optional[datetime] = None,
+    enforce_capacity: bool = True
+) -> Optional[Visit]:
+    """
+    Open a visit and take a place with one conditional UPDATE on the center's counter,
+    so concurrent admissions cannot overshoot max_occupancy. A visitor already inside
+    keeps their open visit. Returns None if the center is full. The caller commits.
+    Pass enforce_capacity=False for admissions that already happened (offline gates).
+    """
+    started_at = started_at or datetime.utcnow()
+    current = open_visit(db, center_id, user_id=user_id, member_id=member_id)
+    if current is not None:
+        if current.started_at > started_at - _stale_after():
+            return current
+        _close(db, current, current.started_at + _stale_after(), EXPIRED)
+
+    condition = [CenterOccupancy.center_id == center_id]
+    if enforce_capacity:
+        condition.append(or_(
+            CenterOccupancy.max_occupancy.is_(None), CenterOccupancy.active < CenterOccupancy.max_occupancy
+        ))
+    taken = db.execute(
+        update(CenterOccupancy).where(*condition).values(
+            active=CenterOccupancy.active + 1, updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not taken:
+        if db.query(CenterOccupancy.center_id).filter(CenterOccupancy.center_id == center_id).first():
+            return None
+        # Center predates the counters and startup has not backfilled it yet
+        db.add(CenterOccupancy(center_id=center_id, active=1))
+
+    visit = Visit(center_id=center_id, user_id=user_id, member_id=member_id, started_at=started_at)
+    db.add(visit)
+    db.flush()
+    mark_occupancy_changed(db, center_id)
+    return visit
+
+
+def depart(
+    db: Session,
+    center_id: int,
+    user_id: Optional[int] = None,
+    member_id: Optional[int] = None,
+    ended_at: Optional[datetime] = None
+) -> Optional[Visit]:
+    """Close the visitor's open visit and free their place; None if they were not inside. The caller commits."""
+    visit = open_visit(db, center_id, user_id=user_id, member_id=member_id)
+    if visit is None or not _close(db, visit, ended_at or datetime.utcnow(), CHECKED_OUT):
+        return None
+    return visit
+
+
+def close_stale_visits(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Job: close visits open longer than VISIT_MAX_HOURS (visitors who left without
+    checking out) as expired, ending them at that limit. They are left out of the
+    dwell totals. Returns visits closed. Commits.
+    """
+    now = now or datetime.utcnow()
+    stale = db.query(Visit).filter(Visit.ended_at.is_(None), Visit.started_at < now - _stale_after()).all()
+    closed = Counter()
+    for visit in stale:
+        if db.execute(
+            update(Visit).where(Visit.id == visit.id, Visit.ended_at.is_(None)).values(
+                ended_at=visit.started_at + _stale_after(), end_reason=EXPIRED,
+                duration_seconds=int(_stale_after().total_seconds())
+            ).execution_options(synchronize_session=False)
+        ).rowcount == 1:
+            closed[visit.center_id] += 1
+    for center_id, count in closed.items():
+        _adjust(db, center_id, -count)
+    db.commit()
+    return sum(closed.values())
+
+
+def user_dwell_summary(db: Session, user_id: int) -> List[Dict]:
+    """Total minutes the user has spent at each center, from the running totals"""
+    rows = db.query(UserCenterDwell.center_id, Center.name, UserCenterDwell.total_seconds).outerjoin(
+        Center, Center.id == UserCenterDwell.center_id
+    ).filter(UserCenterDwell.user_id == user_id).order_by(UserCenterDwell.total_seconds.desc()).all()
+    return [
+        {"center_id": center_id, "center_name": name or str(center_id), "total_minutes": total_seconds // 60}
+        for center_id, name, total_seconds in rows
+    ]
+
+
+def business_session_minutes(db: Session, day: date) -> Dict[int, float]:
+    """Average checked-out visit length in minutes per business, for visits started on `day`"""
+    rows = db.query(
+        Center.business_id, func.sum(CenterDwellDay.total_seconds), func.sum(CenterDwellDay.visits)
+    ).join(Center, Center.id == CenterDwellDay.center_id).filter(
+        CenterDwellDay.date == day, Center.business_id.isnot(None)
+    ).group_by(Center.business_id).all()
+    return {business_id: total / visits / 60 for business_id, total, visits in rows if visits}
+
+
+def business_occupancy(db: Session, business_id: int) -> List[Dict]:
+    """Live counters for each of a business's centers"""
+    rows = db.query(
+        Center.id, Center.name, CenterOccupancy.active, CenterOccupancy.max_occupancy, CenterOccupancy.updated_at
+    ).outerjoin(CenterOccupancy, CenterOccupancy.center_id == Center.id).filter(
+        Center.business_id == business_id
+    ).order_by(Center.id).all()
+    return [
+        {
+            "center_id": center_id,
+            "center_name": name,
+            "active": active or 0,
+            "max_occupancy": max_occupancy,
+            "updated_at": updated_at,
+        }
+        for center_id, name, active, max_occupancy, updated_at in rows
+    ]
+
+
+def ensure_center_occupancy(db: Session) -> int:
+    """
+    Add counters for centers created before they existed, close stale visits and
+    reset every counter to the number of open visits. Returns counters added.
+    """
+    missing = [
+        {"center_id": center_id, "active": 0}
+        for (center_id,) in db.query(Center.id).filter(Center.id.notin_(select(CenterOccupancy.center_id)))
+    ]
+    if missing:
+        db.execute(CenterOccupancy.__table__.insert(), missing)
+    close_stale_visits(db)
+    open_visits = select(func.count(Visit.id)).where(
+        Visit.center_id == CenterOccupancy.center_id, Visit.ended_at.is_(None)
+    ).scalar_subquery()
+    db.execute(
+        update(CenterOccupancy).values(active=open_visits).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(missing)
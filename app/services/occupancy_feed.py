@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.database import get_db
+
+_CHANGED_KEY = "occupancy_changed"
+
+
+def mark_occupancy_changed(db: Session, center_id: int):
+    """Have the feed push the center's counters once the session commits"""
+    db.info.setdefault(_CHANGED_KEY, set()).add(center_id)
+
+
+def _load(business_id: int) -> List[Dict]:
+    from app.services.occupancy import business_occupancy
+    db = next(get_db())
+    try:
+        return jsonable_encoder(business_occupancy(db, business_id))
+    finally:
+        db.close()
+
+
+class _BusinessFeed:
+    def __init__(self):
+        self.listeners: Set[asyncio.Queue] = set()
+        self.wake = asyncio.Event()
+        self.center_ids: Set[int] = set()
+        self.last: Optional[List[Dict]] = None
+
+
+class OccupancyFeed:
+    """
+    Per worker fan-out of live occupancy to SSE listeners. Each business with open
+    streams has one poller, however many dashboards are watching; it reloads as
+    soon as a change commits in this worker, and every
+    OCCUPANCY_STREAM_INTERVAL_SECONDS for changes made by other workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._feeds: Dict[int, _BusinessFeed] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, business_id: int) -> asyncio.Queue:
+        """Queue of the business's counters: the current ones first, then each change"""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            feed = self._feeds.get(business_id)
+            if feed is None:
+                feed = self._feeds[business_id] = _BusinessFeed()
+                asyncio.create_task(self._poll(business_id, feed))
+            elif feed.last is not None:
+                queue.put_nowait(feed.last)
+            feed.listeners.add(queue)
+        return queue
+
+    def unsubscribe(self, business_id: int, queue: asyncio.Queue):
+        with self._lock:
+            feed = self._feeds.get(business_id)
+            if feed is None:
+                return
+            feed.listeners.discard(queue)
+            if not feed.listeners:
+                # The poller sees no listeners when it wakes and stops
+                del self._feeds[business_id]
+                feed.wake.set()
+
+    def notify(self, center_ids: Iterable[int]):
+        """Wake the pollers of businesses owning these centers; safe to call from any thread"""
+        center_ids = set(center_ids)
+        with self._lock:
+            feeds = [feed for feed in self._feeds.values() if feed.center_ids & center_ids]
+        if feeds and self._loop is not None and not self._loop.is_closed():
+            for feed in feeds:
+                self._loop.call_soon_threadsafe(feed.wake.set)
+
+    async def _poll(self, business_id: int, feed: _BusinessFeed):
+        while feed.listeners:
+            # Cleared before reading so a change committed during the read wakes the next one
+            feed.wake.clear()
+            snapshot = await run_in_threadpool(_load, business_id)
+            if snapshot != feed.last:
+                with self._lock:
+                    feed.last = snapshot
+                    feed.center_ids = {row["center_id"] for row in snapshot}
+                    listeners = list(feed.listeners)
+                for queue in listeners:
+                    queue.put_nowait(snapshot)
+            try:
+                await asyncio.wait_for(feed.wake.wait(), settings.OCCUPANCY_STREAM_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+occupancy_feed = OccupancyFeed()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_occupancy_changes(session):
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if changed:
+        occupancy_feed.notify(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_occupancy_changes(session):
+    session.info.pop(_CHANGED_KEY, None)
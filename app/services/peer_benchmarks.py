@@ -0,0 +1,204 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from app.models.analytics import BusinessMetrics, BusinessBenchmark
+from app.models.booking import Booking
+from app.models.business import Business, BusinessProfile
+from app.models.center import Center
+from app.models.member import Member
+
+BENCHMARK_METRICS = (
+    "checkins_per_member",
+    "revenue_per_member",
+    "booking_approval_rate",
+    "peak_utilization",
+)
+
+
+def percentile_rank_within_groups(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    Percentile rank (0-100, ties share the mid rank) of every value within its group.
+    NaN values get a NaN rank and do not count towards their group.
+    """
+    n = values.shape[0]
+    ranks = np.full(n, np.nan)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return ranks
+
+    idx = np.nonzero(valid)[0]
+    v = values[idx]
+    g = groups[idx]
+    order = np.lexsort((v, g))
+    sv = v[order]
+    sg = g[order]
+    m = sv.shape[0]
+    positions = np.arange(m)
+
+    # Start and size of each group in the sorted arrays
+    group_change = np.ones(m, dtype=bool)
+    group_change[1:] = sg[1:] != sg[:-1]
+    group_start = np.maximum.accumulate(np.where(group_change, positions, 0))
+    group_ids = np.cumsum(group_change) - 1
+    group_size = np.bincount(group_ids)[group_ids]
+
+    # First and last position of each run of equal (group, value)
+    run_change = group_change.copy()
+    run_change[1:] |= sv[1:] != sv[:-1]
+    first = np.maximum.accumulate(np.where(run_change, positions, 0))
+    run_end = np.ones(m, dtype=bool)
+    run_end[:-1] = run_change[1:]
+    last = np.minimum.accumulate(np.where(run_end, positions, m - 1)[::-1])[::-1]
+
+    below = first - group_start
+    equal = last - first + 1
+    sorted_ranks = (below + 0.5 * equal) / group_size * 100.0
+
+    result = np.empty(m)
+    result[order] = sorted_ranks
+    ranks[idx] = result
+    return ranks
+
+
+def _peer_groups(db: Session, business_ids: List[int]) -> Dict[int, tuple]:
+    """(state, center_type) of each business, from its centers then its profile"""
+    groups: Dict[int, tuple] = {}
+    for business_id, state, center_type in db.query(
+        Center.business_id, Center.state, Center.center_type
+    ).filter(Center.business_id.isnot(None)).order_by(Center.id).all():
+        groups.setdefault(business_id, (state, center_type))
+    for business_id, state in db.query(BusinessProfile.business_id, BusinessProfile.state).all():
+        if business_id not in groups:
+            groups[business_id] = (state, None)
+    return {business_id: groups.get(business_id, (None, None)) for business_id in business_ids}
+
+
+def compute_peer_benchmarks(db: Session, period_days: int = 30, today: Optional[date] = None) -> int:
+    """
+    Nightly job: compute benchmark ratios for every business from the daily
+    rollups and percentile rank them within (state, center_type) peers.
+    Returns the number of snapshots written.
+    """
+    today = today or date.today()
+    start = today - timedelta(days=period_days)
+
+    business_ids = [row[0] for row in db.query(Business.id).order_by(Business.id).all()]
+    if not business_ids:
+        return 0
+    position = {business_id: i for i, business_id in enumerate(business_ids)}
+    n = len(business_ids)
+
+    check_ins = np.zeros(n)
+    revenue = np.zeros(n)
+    peak_check_ins = np.zeros(n)
+    for business_id, total_check_ins, total_revenue, max_check_ins in db.query(
+        BusinessMetrics.business_id,
+        func.sum(BusinessMetrics.total_check_ins),
+        func.sum(BusinessMetrics.total_revenue),
+        func.max(BusinessMetrics.total_check_ins)
+    ).filter(
+        BusinessMetrics.date >= start,
+        BusinessMetrics.date < today
+    ).group_by(BusinessMetrics.business_id).all():
+        if business_id in position:
+            i = position[business_id]
+            check_ins[i] = total_check_ins or 0
+            revenue[i] = total_revenue or 0.0
+            peak_check_ins[i] = max_check_ins or 0
+
+    members = np.zeros(n)
+    for business_id, count in db.query(Member.business_id, func.count(Member.id)).filter(
+        Member.is_active == True
+    ).group_by(Member.business_id).all():
+        if business_id in position:
+            members[position[business_id]] = count
+
+    approved = np.zeros(n)
+    decided = np.zeros(n)
+    for business_id, approved_count, decided_count in db.query(
+        Booking.business_id,
+        func.sum(case((Booking.status.in_(["approved", "completed"]), 1), else_=0)),
+        func.sum(case((Booking.status.in_(["approved", "completed", "rejected"]), 1), else_=0))
+    ).filter(
+        func.date(Booking.created_at) >= start
+    ).group_by(Booking.business_id).all():
+        if business_id in position:
+            i = position[business_id]
+            approved[i] = approved_count or 0
+            decided[i] = decided_count or 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_member = np.where(members > 0, 1.0 / members, np.nan)
+        metrics = {
+            "checkins_per_member": check_ins * per_member,
+            "revenue_per_member": revenue * per_member,
+            "booking_approval_rate": np.where(decided > 0, approved / decided, np.nan),
+            # Share of active members that showed up on the busiest day
+            "peak_utilization": peak_check_ins * per_member,
+        }
+
+    peer_groups = _peer_groups(db, business_ids)
+    labels = [peer_groups[business_id] for business_id in business_ids]
+    _, group_codes = np.unique(np.array([f"{state}|{center_type}" for state, center_type in labels]), return_inverse=True)
+    peer_counts = np.bincount(group_codes)[group_codes]
+
+    percentiles = {
+        name: percentile_rank_within_groups(values, group_codes)
+        for name, values in metrics.items()
+    }
+
+    existing = {row.business_id: row for row in db.query(BusinessBenchmark).all()}
+    now = datetime.utcnow()
+    for i, business_id in enumerate(business_ids):
+        row = existing.get(business_id)
+        if row is None:
+            row = BusinessBenchmark(business_id=business_id)
+            db.add(row)
+        row.state, row.center_type = labels[i]
+        row.peer_count = int(peer_counts[i])
+        row.period_days = period_days
+        for name in BENCHMARK_METRICS:
+            value = metrics[name][i]
+            rank = percentiles[name][i]
+            setattr(row, name, None if np.isnan(value) else round(float(value), 4))
+            setattr(row, f"{name}_percentile", None if np.isnan(rank) else round(float(rank), 1))
+        row.computed_at = now
+
+    db.commit()
+    return n
+
+
+def _normalized(value: Optional[str]) -> Optional[str]:
+    return " ".join(value.lower().split()) if value else None
+
+
+def ensure_center_business(db: Session) -> int:
+    """
+    Link centers uploaded before Center.business_id existed to their business:
+    by the CAC number on the business profile, else by a business or profile name
+    equal to the center's name. Ambiguous matches are left unlinked.
+    Returns centers linked.
+    """
+    by_cac: Dict[str, set] = {}
+    by_name: Dict[str, set] = {}
+    for business_id, cac_number, profile_name in db.query(
+        BusinessProfile.business_id, BusinessProfile.cac_number, BusinessProfile.name
+    ).filter(BusinessProfile.business_id.isnot(None)):
+        if cac_number:
+            by_cac.setdefault(cac_number.strip(), set()).add(business_id)
+        if _normalized(profile_name):
+            by_name.setdefault(_normalized(profile_name), set()).add(business_id)
+    for business_id, business_name, name in db.query(Business.id, Business.business_name, Business.name):
+        for value in {_normalized(business_name), _normalized(name)} - {None}:
+            by_name.setdefault(value, set()).add(business_id)
+
+    linked = 0
+    for center in db.query(Center).filter(Center.business_id.is_(None)).all():
+        owners = by_cac.get((center.cac_number or "").strip()) or by_name.get(_normalized(center.name)) or set()
+        if len(owners) == 1:
+            center.business_id = next(iter(owners))
+            linked += 1
+    db.commit()
+    return linked
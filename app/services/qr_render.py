@@ -0,0 +1,131 @@
+import atexit
+import base64
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+import qrcode
+from app.core.config import settings
+
+PNG = "png"
+SVG = "svg"
+TOKEN = "token"
+QR_FORMATS = (PNG, SVG, TOKEN)
+QR_FORMAT_PATTERN = f"^({'|'.join(QR_FORMATS)})$"
+
+QR_BORDER = 4
+# A fixed mask skips scoring all eight masks, which is most of the encoding time;
+# any mask is valid for scanners, the choice only tweaks module balance
+QR_MASK_PATTERN = 0
+# Seconds to wait on the process pool before rendering in the request thread
+RENDER_TIMEOUT = 5.0
+
+
+def _encode(payload: str) -> qrcode.QRCode:
+    qr = qrcode.QRCode(border=QR_BORDER, mask_pattern=QR_MASK_PATTERN)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png_base64(payload: str) -> str:
+    """Base64 PNG of the payload's QR code"""
+    qr_img = _encode(payload).make_image()
+    buf = io.BytesIO()
+    qr_img.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def render_svg(payload: str) -> str:
+    """
+    QR code as a compact SVG: one path of horizontal runs, one unit per module,
+    scaled by the client. No image library involved.
+    """
+    matrix = _encode(payload).get_matrix()
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        width = len(row)
+        while x < width:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < width and row[x]:
+                x += 1
+            runs.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    size = len(matrix)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/><path fill="#000" d="{"".join(runs)}"/></svg>'
+    )
+
+
+class PNGRenderer:
+    """
+    PNG rendering off the request threads: a small process pool does the work
+    and an LRU keyed by payload answers repeats. Falls back to rendering inline
+    when the pool is disabled (0 processes) or has died.
+    """
+
+    def __init__(self, processes: int = 2, cache_size: int = 1024):
+        self.processes = processes
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._pool
+
+    def render(self, payload: str) -> str:
+        with self._lock:
+            cached = self._cache.get(payload)
+            if cached is not None:
+                self._cache.move_to_end(payload)
+                return cached
+
+        pool = self._executor()
+        try:
+            png = pool.submit(render_png_base64, payload).result(RENDER_TIMEOUT) if pool else None
+        except TimeoutError:
+            png = None
+        except (BrokenProcessPool, OSError):
+            # Recreated on the next render
+            self.shutdown()
+            png = None
+        if png is None:
+            png = render_png_base64(payload)
+
+        with self._lock:
+            self._cache[payload] = png
+            self._cache.move_to_end(payload)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return png
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+png_renderer = PNGRenderer(processes=settings.QR_RENDER_PROCESSES, cache_size=settings.QR_PNG_CACHE_SIZE)
+atexit.register(png_renderer.shutdown)
+
+
+def render_qr(payload: str, qr_format: str = PNG) -> dict:
+    """Response fields for the requested format: base64 PNG, SVG markup, or neither"""
+    if qr_format == SVG:
+        return {"qr_code_base64": "", "qr_code_svg": render_svg(payload)}
+    if qr_format == TOKEN:
+        return {"qr_code_base64": ""}
+    return {"qr_code_base64": png_renderer.render(payload)}
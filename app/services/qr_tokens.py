@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional, Union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.scan_check_in import SpentQRToken
+from app.utils.nonce_cache import NonceCache
+
+TOKEN_VERSION = 1
+NONCE_BYTES = 8
+MAC_BYTES = 16
+# version, user_id, center_id, expires_at (epoch seconds), nonce
+_CLAIMS = struct.Struct(f">BIII{NONCE_BYTES}s")
+TOKEN_BYTES = _CLAIMS.size + MAC_BYTES
+
+
+class QRClaims(NamedTuple):
+    user_id: int
+    center_id: int
+    expires_at: int
+    nonce: bytes
+
+
+class InvalidQRToken(ValueError):
+    """Raised for tokens that are malformed, forged or expired"""
+
+
+class ReplayedQRToken(InvalidQRToken):
+    """Raised when a token is redeemed a second time"""
+
+
+def _mac(body: bytes, secret: str) -> bytes:
+    return hmac.new(secret.encode(), body, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def issue_qr_token(
+    user_id: int,
+    center_id: int,
+    ttl_seconds: Optional[int] = None,
+    now: Optional[float] = None,
+    secret: Optional[str] = None
+) -> str:
+    """Compact URL safe token: packed claims followed by a truncated HMAC-SHA256"""
+    now = time.time() if now is None else now
+    expires_at = int(now) + (settings.QR_TOKEN_TTL_SECONDS if ttl_seconds is None else ttl_seconds)
+    body = _CLAIMS.pack(TOKEN_VERSION, user_id, center_id, expires_at, os.urandom(NONCE_BYTES))
+    raw = body + _mac(body, secret or settings.QR_TOKEN_SECRET)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def verify_qr_token(token: Union[str, bytes], now: Optional[float] = None, secret: Optional[str] = None) -> QRClaims:
+    """
+    Claims of a genuine, unexpired token; no database access. Accepts the base64
+    text from the QR code or the raw TOKEN_BYTES the binary scan protocol carries.
+    """
+    if isinstance(token, bytes):
+        raw = token
+    else:
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (ValueError, TypeError):
+            raise InvalidQRToken("Invalid QR code")
+    if len(raw) != TOKEN_BYTES:
+        raise InvalidQRToken("Invalid QR code")
+    body, mac = raw[:_CLAIMS.size], raw[_CLAIMS.size:]
+    if not hmac.compare_digest(mac, _mac(body, secret or settings.QR_TOKEN_SECRET)):
+        raise InvalidQRToken("Invalid QR code")
+    version, user_id, center_id, expires_at, nonce = _CLAIMS.unpack(body)
+    if version != TOKEN_VERSION:
+        raise InvalidQRToken("Invalid QR code")
+    if expires_at <= (time.time() if now is None else now):
+        raise InvalidQRToken("QR code expired")
+    return QRClaims(user_id, center_id, expires_at, nonce)
+
+
+# Seen nonces live as long as their token could still verify. The cache is per
+# worker and only saves a database round trip; spent_qr_tokens is what stops a
+# replay on another worker.
+qr_nonce_cache = NonceCache(horizon=settings.QR_TOKEN_TTL_SECONDS + 1)
+
+
+def check_qr_token(
+    token: Union[str, bytes],
+    center_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    now: Optional[float] = None
+) -> QRClaims:
+    """Verify a token and optionally check it against the scanning center/user"""
+    claims = verify_qr_token(token, now=now)
+    if (center_id is not None and center_id != claims.center_id) or \
+            (user_id is not None and user_id != claims.user_id):
+        raise InvalidQRToken("QR code does not match this user or center")
+    return claims
+
+
+def spend_qr_token(db: Session, claims: QRClaims, now: Optional[float] = None):
+    """
+    Mark a checked token used in spent_qr_tokens, inside the caller's transaction;
+    a second spend on any worker fails with ReplayedQRToken. Call it just before
+    committing, so a refused scan leaves the token usable.
+    """
+    if claims.nonce in qr_nonce_cache:
+        raise ReplayedQRToken("QR code already used")
+    try:
+        with db.begin_nested():
+            db.add(SpentQRToken(
+                nonce=claims.nonce.hex(),
+                user_id=claims.user_id,
+                center_id=claims.center_id,
+                expires_at=datetime.utcfromtimestamp(claims.expires_at),
+            ))
+    except IntegrityError:
+        raise ReplayedQRToken("QR code already used")
+    qr_nonce_cache.add(claims.nonce, claims.expires_at, now=now)
+
+
+def redeem_qr_token(
+    db: Session,
+    token: Union[str, bytes],
+    center_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    now: Optional[float] = None
+) -> QRClaims:
+    """check_qr_token then spend_qr_token"""
+    claims = check_qr_token(token, center_id=center_id, user_id=user_id, now=now)
+    spend_qr_token(db, claims, now=now)
+    return claims
@@ -0,0 +1,196 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.check_in import CheckIn
+from app.models.community import CommunityMember
+from app.models.group_activity import GroupMember, GroupMemberStatus
+from app.models.recommendation import SimilarItems
+
+CENTER = "center"
+COMMUNITY = "community"
+GROUP = "group"
+ITEM_TYPES = (CENTER, COMMUNITY, GROUP)
+
+DEFAULT_TOP_N = 20
+# Only a user's most visited items count; bounds the per-user pair explosion
+MAX_ITEMS_PER_USER = 50
+# Co-occurrence pairs generated per chunk before they are aggregated
+PAIR_CHUNK = 2_000_000
+# Seeds used when assembling a user's recommendations
+MAX_SEEDS = 20
+
+
+def _aggregate(keys: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights)
+
+
+def cooccurrence_top_n(
+    users: np.ndarray,
+    items: np.ndarray,
+    top_n: int = DEFAULT_TOP_N,
+    max_items_per_user: int = MAX_ITEMS_PER_USER
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Item-item cosine similarity from (user, item) interaction pairs, keeping the
+    `top_n` best neighbours of every item. Users are down-weighted by 1/log2(1 + items)
+    so very active users do not dominate. Returns (item, neighbor, score) arrays
+    sorted by item then descending score; ids are the caller's own.
+    """
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+    if len(users) == 0:
+        return empty
+    _, user_index = np.unique(users, return_inverse=True)
+    item_ids, item_index = np.unique(items, return_inverse=True)
+    n_items = len(item_ids)
+
+    # Distinct (user, item) with visit counts, most visited first within each user
+    pair_keys, visits = np.unique(user_index.astype(np.int64) * n_items + item_index, return_counts=True)
+    pair_users = pair_keys // n_items
+    pair_items = pair_keys % n_items
+    order = np.lexsort((-visits, pair_users))
+    pair_users, pair_items = pair_users[order], pair_items[order]
+
+    starts = np.r_[0, np.flatnonzero(pair_users[1:] != pair_users[:-1]) + 1]
+    sizes = np.diff(np.r_[starts, len(pair_users)])
+    rank = np.arange(len(pair_users)) - np.repeat(starts, sizes)
+    keep = rank < max_items_per_user
+    pair_users, pair_items = pair_users[keep], pair_items[keep]
+
+    starts = np.r_[0, np.flatnonzero(pair_users[1:] != pair_users[:-1]) + 1]
+    sizes = np.diff(np.r_[starts, len(pair_users)])
+    row_start = np.repeat(starts, sizes)
+    row_size = np.repeat(sizes, sizes)
+    row_weight = 1.0 / np.log2(1.0 + row_size)
+    norms = np.sqrt(np.bincount(pair_items, weights=row_weight, minlength=n_items))
+
+    # Every row pairs with every row of its user; generate those pairs in bounded chunks
+    partial_keys, partial_weights = [], []
+    pairs_per_row = row_size.astype(np.int64)
+    cumulative = np.cumsum(pairs_per_row)
+    cuts = np.searchsorted(cumulative, np.arange(PAIR_CHUNK, cumulative[-1], PAIR_CHUNK), side="right")
+    bounds = np.unique(np.r_[0, cuts, len(pair_items)])
+    for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        counts = pairs_per_row[lo:hi]
+        left = np.repeat(pair_items[lo:hi], counts)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+        right = pair_items[np.repeat(row_start[lo:hi], counts) + offsets]
+        weights = np.repeat(row_weight[lo:hi], counts)
+        distinct = left != right
+        keys, sums = _aggregate(left[distinct] * n_items + right[distinct], weights[distinct])
+        partial_keys.append(keys)
+        partial_weights.append(sums)
+    if not partial_keys:
+        return empty
+
+    keys, co_weight = _aggregate(np.concatenate(partial_keys), np.concatenate(partial_weights))
+    left, right = keys // n_items, keys % n_items
+    scores = co_weight / (norms[left] * norms[right])
+
+    order = np.lexsort((right, -scores, left))
+    left, right, scores = left[order], right[order], scores[order]
+    starts = np.r_[0, np.flatnonzero(left[1:] != left[:-1]) + 1]
+    rank = np.arange(len(left)) - np.repeat(starts, np.diff(np.r_[starts, len(left)]))
+    keep = rank < top_n
+    return item_ids[left[keep]], item_ids[right[keep]], scores[keep]
+
+
+def _interactions(db: Session, item_type: str) -> List[Tuple[int, int]]:
+    if item_type == CENTER:
+        return db.query(CheckIn.user_id, CheckIn.center_id).filter(
+            CheckIn.user_id.isnot(None), CheckIn.center_id.isnot(None)
+        ).all()
+    if item_type == COMMUNITY:
+        return db.query(CommunityMember.user_id, CommunityMember.community_id).filter(
+            CommunityMember.user_id.isnot(None), CommunityMember.community_id.isnot(None)
+        ).all()
+    return db.query(GroupMember.user_id, GroupMember.group_id).filter(
+        GroupMember.status == GroupMemberStatus.active
+    ).all()
+
+
+def build_similar_items(db: Session, top_n: int = DEFAULT_TOP_N) -> Dict[str, int]:
+    """
+    Batch job: recompute the top-N similar centers (co-visits), communities and
+    groups (co-membership) and store one SimilarItems row per item.
+    Returns the number of items written per type.
+    """
+    written = {}
+    now = datetime.utcnow()
+    for item_type in ITEM_TYPES:
+        rows = _interactions(db, item_type)
+        pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        items, neighbors, scores = cooccurrence_top_n(pairs[:, 0], pairs[:, 1], top_n=top_n)
+
+        lists: Dict[int, list] = {}
+        for item_id, neighbor_id, score in zip(items.tolist(), neighbors.tolist(), scores.tolist()):
+            lists.setdefault(item_id, []).append([neighbor_id, round(score, 4)])
+
+        existing = {
+            row.item_id: row
+            for row in db.query(SimilarItems).filter(SimilarItems.item_type == item_type).all()
+        }
+        for item_id, row in existing.items():
+            if item_id not in lists:
+                db.delete(row)
+        for item_id, neighbor_list in lists.items():
+            row = existing.get(item_id)
+            if row is None:
+                row = SimilarItems(item_type=item_type, item_id=item_id)
+                db.add(row)
+            row.neighbors = neighbor_list
+            row.computed_at = now
+        written[item_type] = len(lists)
+    db.commit()
+    return written
+
+
+def similar_items(db: Session, item_type: str, item_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+    row = db.query(SimilarItems).filter(
+        SimilarItems.item_type == item_type, SimilarItems.item_id == item_id
+    ).first()
+    if row is None:
+        return []
+    return [(neighbor_id, score) for neighbor_id, score in (row.neighbors or [])[:limit]]
+
+
+def _user_seeds(db: Session, item_type: str, user_id: int) -> Dict[int, float]:
+    """The user's own items with a weight each"""
+    if item_type == CENTER:
+        rows = db.query(CheckIn.center_id, func.count(CheckIn.id)).filter(
+            CheckIn.user_id == user_id, CheckIn.center_id.isnot(None)
+        ).group_by(CheckIn.center_id).order_by(func.max(CheckIn.check_in_time).desc()).all()
+        return {center_id: 1.0 + math.log1p(visits) for center_id, visits in rows}
+    if item_type == COMMUNITY:
+        rows = db.query(CommunityMember.community_id).filter(CommunityMember.user_id == user_id).all()
+    else:
+        rows = db.query(GroupMember.group_id).filter(
+            GroupMember.user_id == user_id, GroupMember.status == GroupMemberStatus.active
+        ).all()
+    return {item_id: 1.0 for (item_id,) in rows if item_id is not None}
+
+
+def recommend_for_user(db: Session, item_type: str, user_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+    """
+    Personalized (item_id, score) list: the precomputed neighbour lists of the
+    user's own items summed by seed weight, minus what the user already has.
+    """
+    seeds = _user_seeds(db, item_type, user_id)
+    if not seeds:
+        return []
+    seed_ids = list(seeds)[:MAX_SEEDS]
+    rows = db.query(SimilarItems).filter(
+        SimilarItems.item_type == item_type, SimilarItems.item_id.in_(seed_ids)
+    ).all()
+
+    scores: Dict[int, float] = {}
+    for row in rows:
+        weight = seeds[row.item_id]
+        for neighbor_id, score in row.neighbors or []:
+            if neighbor_id not in seeds:
+                scores[neighbor_id] = scores.get(neighbor_id, 0.0) + weight * score
+    ranked = sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))
+    return [(item_id, round(score, 4)) for item_id, score in ranked[:limit]]
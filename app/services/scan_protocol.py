@@ -0,0 +1,123 @@
+"""
+Fixed-layout binary encoding of gate scanner traffic, an alternative to JSON
+for devices on metered links. Selected by Content-Type; every integer is
+big-endian and QR tokens travel as their raw bytes instead of base64.
+
+Single scan request   B version, I center_id (0 = not given), token
+Single scan response  B version, i remaining flex credit
+Batch request         B version, I center_id, 16s device_id, H count,
+                      then per scan: 16s scan_id, I scanned_at (epoch seconds UTC), token
+Batch response        B version, H accepted, H rejected, H duplicates,
+                      then per scan: 16s scan_id, B status, B reason, I user_id (0 = none),
+                      i remaining flex credit (-1 = none)
+
+16 byte ids are NUL padded text, or raw bytes (e.g. a UUID) which are sent
+back verbatim and stored as hex.
+"""
+import struct
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.services.qr_tokens import TOKEN_BYTES
+
+SCAN_CONTENT_TYPE = "application/vnd.fitaccess.scan"
+PROTOCOL_VERSION = 1
+
+_SCAN_REQUEST = struct.Struct(f">BI{TOKEN_BYTES}s")
+_SCAN_RESPONSE = struct.Struct(">Bi")
+_BATCH_HEADER = struct.Struct(">BI16sH")
+_BATCH_ITEM = struct.Struct(f">16sI{TOKEN_BYTES}s")
+_RESULTS_HEADER = struct.Struct(">BHHH")
+_RESULT_ITEM = struct.Struct(">16sBBIi")
+
+STATUSES = ("accepted", "rejected", "duplicate")
+# Reason codes for result details; index 0 is no detail, anything unlisted is 255
+REASONS = (
+    None,
+    "Invalid QR code",
+    "QR code expired",
+    "QR code already used",
+    "QR code does not match this user or center",
+    "Insufficient flex credit",
+    "User not found",
+    "Scan time out of range",
+)
+UNKNOWN_REASON = 255
+
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+_REASON_CODES = {reason: code for code, reason in enumerate(REASONS)}
+
+
+def _decode_id(raw: bytes) -> str:
+    text = raw.rstrip(b"\0")
+    try:
+        decoded = text.decode("ascii")
+        if decoded.isprintable():
+            return decoded
+    except UnicodeDecodeError:
+        pass
+    return raw.hex()
+
+
+def _encode_id(scan_id: str) -> bytes:
+    if len(scan_id) == 32:
+        try:
+            return bytes.fromhex(scan_id)
+        except ValueError:
+            pass
+    return scan_id.encode("ascii", "replace")[:16]
+
+
+def _check_version(version: int):
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version {version}")
+
+
+def decode_scan_request(body: bytes) -> Tuple[Optional[int], bytes]:
+    """(center_id or None, raw token)"""
+    if len(body) != _SCAN_REQUEST.size:
+        raise ValueError(f"Scan request must be {_SCAN_REQUEST.size} bytes")
+    version, center_id, token = _SCAN_REQUEST.unpack(body)
+    _check_version(version)
+    return center_id or None, token
+
+
+def encode_scan_response(remaining_flex_credit: int) -> bytes:
+    return _SCAN_RESPONSE.pack(PROTOCOL_VERSION, remaining_flex_credit)
+
+
+def decode_batch_request(body: bytes, max_scans: Optional[int] = None) -> Tuple[int, Optional[str], List[Dict]]:
+    """
+    (center_id, device_id, scans) with scans shaped for process_scan_batch.
+    A count over `max_scans` is refused from the header, before any scan is read.
+    """
+    if len(body) < _BATCH_HEADER.size:
+        raise ValueError("Batch request is truncated")
+    version, center_id, device_id, count = _BATCH_HEADER.unpack_from(body)
+    _check_version(version)
+    if max_scans is not None and count > max_scans:
+        raise ValueError(f"At most {max_scans} scans per batch")
+    if len(body) != _BATCH_HEADER.size + count * _BATCH_ITEM.size:
+        raise ValueError(f"Batch request length does not match {count} scans")
+    scans = [
+        {
+            "scan_id": _decode_id(scan_id),
+            "token": token,
+            "scanned_at": datetime.fromtimestamp(scanned_at, timezone.utc).replace(tzinfo=None),
+        }
+        for scan_id, scanned_at, token in _BATCH_ITEM.iter_unpack(memoryview(body)[_BATCH_HEADER.size:])
+    ]
+    return center_id, _decode_id(device_id) or None, scans
+
+
+def encode_batch_response(results: List[Dict], accepted: int, rejected: int, duplicates: int) -> bytes:
+    parts = [_RESULTS_HEADER.pack(PROTOCOL_VERSION, accepted, rejected, duplicates)]
+    for result in results:
+        remaining = result.get("remaining_flex_credit")
+        parts.append(_RESULT_ITEM.pack(
+            _encode_id(result["scan_id"]),
+            _STATUS_CODES[result["status"]],
+            _REASON_CODES.get(result.get("detail"), UNKNOWN_REASON),
+            result.get("user_id") or 0,
+            -1 if remaining is None else remaining,
+        ))
+    return b"".join(parts)
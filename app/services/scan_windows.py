@@ -0,0 +1,40 @@
+import os
+import tempfile
+from typing import Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.utils.sliding_window import SlidingWindowStore
+
+sliding_windows = SlidingWindowStore(
+    path=settings.SLIDING_WINDOW_STORE or os.path.join(tempfile.gettempdir(), "fitaccess-windows.db")
+)
+
+
+def scan_key(user_id: int, center_id: int) -> str:
+    return f"scan:{user_id}:{center_id}"
+
+
+def once_per_scan_window(user_id: int, center_id: int, charge: Callable[[], Dict]) -> Tuple[Optional[Dict], bool]:
+    """
+    Run `charge` for the first scan of a user at a center within the dedup window
+    and share its result with repeats (scanner double reads) instead of charging
+    again. Returns (result, repeated); result is None for a repeat that arrives
+    while the first scan is still being charged. A failed charge releases the
+    window so the user can retry.
+    """
+    key = scan_key(user_id, center_id)
+    owner, result = sliding_windows.claim(key, settings.SCAN_DEDUP_WINDOW_SECONDS)
+    if not owner:
+        return result, True
+    try:
+        result = charge()
+    except BaseException:
+        sliding_windows.release(key)
+        raise
+    sliding_windows.complete(key, result)
+    return result, False
+
+
+def topup_velocity(user_id: int) -> Tuple[int, bool]:
+    """Record a top-up; (top-ups in the velocity window, whether that is anomalous)"""
+    count = sliding_windows.hit(f"topup:{user_id}", settings.TOPUP_VELOCITY_WINDOW_SECONDS)
+    return count, count > settings.TOPUP_VELOCITY_MAX
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.models.analytics import AnalyticsEvent, AnalyticsSession
+
+DEFAULT_INACTIVITY_GAP = timedelta(minutes=30)
+DEFAULT_MAX_OPEN_SESSIONS = 10000
+# How late an event may be recorded after its timestamp and still be sessionized
+DEFAULT_ALLOWED_LATENESS = timedelta(minutes=5)
+
+
+class OpenSession:
+    __slots__ = (
+        "record", "business_id", "user_id", "session_id", "started_at", "ended_at",
+        "event_count", "entry_event", "exit_event", "first_event_id", "last_event_id",
+        "device_type", "browser", "os"
+    )
+
+    def __init__(self, event: AnalyticsEvent):
+        self.record = None
+        self.business_id = event.business_id
+        self.user_id = event.user_id
+        self.session_id = event.session_id
+        self.started_at = event.event_timestamp
+        self.ended_at = event.event_timestamp
+        self.event_count = 1
+        self.entry_event = event.event_type
+        self.exit_event = event.event_type
+        self.first_event_id = event.id
+        self.last_event_id = event.id
+        self.device_type = event.device_type
+        self.browser = event.browser
+        self.os = event.os
+
+    @classmethod
+    def from_record(cls, record: AnalyticsSession) -> "OpenSession":
+        session = cls.__new__(cls)
+        session.record = record
+        for field in cls.__slots__[1:]:
+            setattr(session, field, getattr(record, field))
+        return session
+
+    def add(self, event: AnalyticsEvent):
+        self.ended_at = event.event_timestamp
+        self.event_count += 1
+        self.exit_event = event.event_type
+        self.last_event_id = event.id
+
+
+def session_key(event) -> tuple:
+    """Sessions are per user within a business; anonymous events fall back to the client session id"""
+    if event.user_id is not None:
+        return (event.business_id, "user", event.user_id)
+    return (event.business_id, "session", event.session_id)
+
+
+class EventSessionizer:
+    """
+    Streaming sessionizer. Feed events in timestamp order with `process`;
+    sessions are closed after `gap` of inactivity, when the client session id
+    changes, or when the open map grows past `max_open` (oldest first).
+    """
+
+    def __init__(self, gap: timedelta = DEFAULT_INACTIVITY_GAP, max_open: int = DEFAULT_MAX_OPEN_SESSIONS):
+        self.gap = gap
+        self.max_open = max_open
+        # Ordered by last activity so the idle sessions are always at the front
+        self.open: "OrderedDict[tuple, OpenSession]" = OrderedDict()
+
+    def resume(self, session: OpenSession):
+        self.open[session_key(session)] = session
+
+    def _expire(self, now: datetime) -> List[OpenSession]:
+        closed = []
+        while self.open:
+            key, session = next(iter(self.open.items()))
+            if now - session.ended_at <= self.gap:
+                break
+            closed.append(self.open.pop(key))
+        return closed
+
+    def process(self, event: AnalyticsEvent) -> List[OpenSession]:
+        """Consume one event and return any sessions it caused to close"""
+        timestamp = event.event_timestamp
+        closed = self._expire(timestamp)
+
+        key = session_key(event)
+        current = self.open.get(key)
+        if current is not None:
+            client_changed = (
+                event.session_id is not None
+                and current.session_id is not None
+                and event.session_id != current.session_id
+            )
+            if client_changed or timestamp - current.ended_at > self.gap:
+                closed.append(self.open.pop(key))
+                current = None
+
+        if current is None:
+            self.open[key] = OpenSession(event)
+        else:
+            current.add(event)
+            self.open.move_to_end(key)
+
+        while len(self.open) > self.max_open:
+            closed.append(self.open.popitem(last=False)[1])
+        return closed
+
+    def flush(self, now: Optional[datetime] = None) -> List[OpenSession]:
+        """Close every session (or only the idle ones when `now` is given)"""
+        if now is not None:
+            return self._expire(now)
+        closed = list(self.open.values())
+        self.open.clear()
+        return closed
+
+
+def _write_session(db: Session, session: OpenSession, is_open: bool):
+    record = session.record
+    if record is None:
+        record = AnalyticsSession(business_id=session.business_id)
+        db.add(record)
+        session.record = record
+    record.user_id = session.user_id
+    record.session_id = session.session_id
+    record.started_at = session.started_at
+    record.ended_at = session.ended_at
+    record.duration_seconds = (session.ended_at - session.started_at).total_seconds()
+    record.event_count = session.event_count
+    record.entry_event = session.entry_event
+    record.exit_event = session.exit_event
+    record.first_event_id = session.first_event_id
+    record.last_event_id = session.last_event_id
+    record.device_type = session.device_type
+    record.browser = session.browser
+    record.os = session.os
+    record.is_open = is_open
+
+
+def _watermark(db: Session) -> Optional[tuple]:
+    """
+    (event_timestamp, id) of the last event sessionized. Events are consumed in that
+    order and each is its session's last event when consumed, so it is the largest
+    (ended_at, last_event_id) over the stored sessions.
+    """
+    return db.query(AnalyticsSession.ended_at, AnalyticsSession.last_event_id).filter(
+        AnalyticsSession.last_event_id.isnot(None)
+    ).order_by(AnalyticsSession.ended_at.desc(), AnalyticsSession.last_event_id.desc()).first()
+
+
+def run_sessionizer(
+    db: Session,
+    gap: timedelta = DEFAULT_INACTIVITY_GAP,
+    max_open: int = DEFAULT_MAX_OPEN_SESSIONS,
+    batch_size: int = 1000,
+    allowed_lateness: timedelta = DEFAULT_ALLOWED_LATENESS,
+    now: Optional[datetime] = None
+) -> Dict:
+    """
+    Sessionize events after the (timestamp, id) watermark of the last run, up to
+    `allowed_lateness` before now. Holding back the newest events lets ones recorded
+    a little late still be consumed in timestamp order; an event recorded later than
+    that, behind the watermark, is skipped.
+    Sessions still open at the end are stored with is_open=True and picked up
+    again by the next run, so runs can be scheduled as often as needed.
+    """
+    cutoff = (now or datetime.utcnow()) - allowed_lateness
+    sessionizer = EventSessionizer(gap=gap, max_open=max_open)
+    # Resumed in the order their last events were consumed, which expiry and eviction rely on
+    for record in db.query(AnalyticsSession).filter(AnalyticsSession.is_open == True).order_by(
+        AnalyticsSession.ended_at, AnalyticsSession.last_event_id, AnalyticsSession.id
+    ):
+        sessionizer.resume(OpenSession.from_record(record))
+
+    events = db.query(AnalyticsEvent).filter(
+        AnalyticsEvent.event_timestamp.isnot(None),
+        AnalyticsEvent.event_timestamp <= cutoff
+    )
+    watermark = _watermark(db)
+    if watermark is not None:
+        timestamp, event_id = watermark
+        events = events.filter(or_(
+            AnalyticsEvent.event_timestamp > timestamp,
+            and_(AnalyticsEvent.event_timestamp == timestamp, AnalyticsEvent.id > event_id)
+        ))
+    events = events.order_by(AnalyticsEvent.event_timestamp, AnalyticsEvent.id).yield_per(batch_size)
+
+    processed = 0
+    closed_count = 0
+    for event in events:
+        processed += 1
+        for session in sessionizer.process(event):
+            _write_session(db, session, is_open=False)
+            closed_count += 1
+
+    # Everything up to the cutoff has been seen, so sessions idle since before it are done
+    for session in sessionizer.flush(now=cutoff):
+        _write_session(db, session, is_open=False)
+        closed_count += 1
+    for session in sessionizer.open.values():
+        _write_session(db, session, is_open=True)
+
+    db.commit()
+    return {
+        "events_processed": processed,
+        "sessions_closed": closed_count,
+        "sessions_open": len(sessionizer.open)
+    }
@@ -0,0 +1,71 @@
+import math
+import threading
+import time
+from typing import Hashable, List, Optional, Set
+
+
+class NonceCache:
+    """
+    Thread safe set of recently seen nonces, each kept until its own expiry.
+    Expiry runs on a timing wheel of `resolution` second slots covering `horizon`
+    seconds, so forgetting old nonces is one slot sweep per tick rather than a
+    scan of the whole set. When `maxsize` is reached the slot closest to expiry
+    is dropped early to keep memory bounded.
+    """
+
+    def __init__(self, horizon: float = 300.0, resolution: float = 1.0, maxsize: int = 100_000):
+        self.resolution = resolution
+        self.maxsize = maxsize
+        self._slots: List[List[Hashable]] = [[] for _ in range(int(math.ceil(horizon / resolution)) + 1)]
+        self._seen: Set[Hashable] = set()
+        self._tick = None
+        self._lock = threading.Lock()
+
+    def _advance(self, tick: int):
+        """Forget every slot whose tick has been reached since the last call"""
+        if self._tick is not None and tick > self._tick:
+            for passed in range(self._tick + 1, self._tick + 1 + min(tick - self._tick, len(self._slots))):
+                self._drop(passed)
+        if self._tick is None or tick > self._tick:
+            self._tick = tick
+
+    def _drop(self, tick: int):
+        slot = self._slots[tick % len(self._slots)]
+        self._seen.difference_update(slot)
+        slot.clear()
+
+    def add(self, nonce: Hashable, expires_at: float, now: Optional[float] = None) -> bool:
+        """Record a nonce valid until `expires_at` (epoch seconds); False if it was already seen"""
+        now = time.time() if now is None else now
+        tick = int(now // self.resolution)
+        with self._lock:
+            self._advance(tick)
+            if nonce in self._seen:
+                return False
+            # Land in the first slot after expiry, clamped to the wheel's reach
+            expires_tick = int(math.ceil(expires_at / self.resolution))
+            expires_tick = min(max(expires_tick, tick + 1), tick + len(self._slots) - 1)
+            while len(self._seen) >= self.maxsize:
+                self._evict_soonest(tick)
+            self._slots[expires_tick % len(self._slots)].append(nonce)
+            self._seen.add(nonce)
+            return True
+
+    def _evict_soonest(self, tick: int):
+        for offset in range(1, len(self._slots)):
+            if self._slots[(tick + offset) % len(self._slots)]:
+                self._drop(tick + offset)
+                return
+
+    def __contains__(self, nonce: Hashable) -> bool:
+        return nonce in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def clear(self):
+        with self._lock:
+            for slot in self._slots:
+                slot.clear()
+            self._seen.clear()
+            self._tick = None
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+BITMAP_BYTES = SLOTS_PER_WEEK // 8
+
+# Monday is day 0, matching datetime.weekday()
+DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+def _day_index(name: str) -> Optional[int]:
+    name = name.strip().lower()
+    for index, day in enumerate(DAY_NAMES):
+        if name == day or (len(name) >= 3 and day.startswith(name)):
+            return index
+    return None
+
+
+def _slot_of(value: str) -> Optional[int]:
+    """Quarter hour slot of an "HH:MM" time; "24:00" is the end of the day"""
+    try:
+        hours, minutes = (int(part) for part in value.strip().split(":")[:2])
+    except (AttributeError, ValueError):
+        return None
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        return None
+    return (hours * 60 + minutes) // SLOT_MINUTES
+
+
+def compile_hours(business_hours: Optional[Dict]) -> Optional[bytes]:
+    """
+    Compile {"Monday": {"open": "06:00", "close": "22:00"}, ...} into a 7x96
+    quarter-hour bitmap (84 bytes, bit = day * 96 + slot). A close at or before
+    the open time runs into the next day. None when no hours are usable.
+    """
+    if not business_hours:
+        return None
+    bits = 0
+    usable = False
+    for name, hours in business_hours.items():
+        day = _day_index(str(name))
+        if day is None or not isinstance(hours, dict):
+            continue
+        start = _slot_of(hours.get("open", ""))
+        end = _slot_of(hours.get("close", ""))
+        if start is None or end is None:
+            continue
+        usable = True
+        if end <= start:
+            end += SLOTS_PER_DAY
+        for slot in range(day * SLOTS_PER_DAY + start, day * SLOTS_PER_DAY + end):
+            bits |= 1 << (slot % SLOTS_PER_WEEK)
+    if not usable:
+        return None
+    return bits.to_bytes(BITMAP_BYTES, "little")
+
+
+def bitmap_to_int(bitmap: Optional[bytes]) -> int:
+    return int.from_bytes(bitmap, "little") if bitmap else 0
+
+
+def week_slot(moment: datetime) -> int:
+    """Bit position of `moment` (a local time) in a weekly bitmap"""
+    return moment.weekday() * SLOTS_PER_DAY + (moment.hour * 60 + moment.minute) // SLOT_MINUTES
@@ -0,0 +1,140 @@
+import math
+import random
+from typing import Dict, Iterable, List, Optional
+
+
+class KLLSketch:
+    """
+    Mergeable streaming quantile sketch (KLL).
+
+    Holds a stack of compactors; level h items each stand for 2**h inputs.
+    Memory stays around a few times `k` regardless of how many values are
+    added, and two sketches can be merged to answer quantiles over the union.
+    """
+
+    def __init__(self, k: int = 200, c: float = 2.0 / 3.0, seed: Optional[int] = None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.min_value = None
+        self.max_value = None
+        self.compactors: List[List[float]] = [[]]
+        self._random = random.Random(seed)
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * self.c ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.compactors)
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compact_level(self, level: int) -> List[float]:
+        items = sorted(self.compactors[level])
+        keep = [items.pop()] if len(items) % 2 else []
+        offset = self._random.getrandbits(1)
+        self.compactors[level] = keep
+        return items[offset::2]
+
+    def _compress(self):
+        while self._size() >= self._max_size:
+            for level in range(len(self.compactors)):
+                if len(self.compactors[level]) >= self._capacity(level):
+                    if level + 1 >= len(self.compactors):
+                        self._grow()
+                    self.compactors[level + 1].extend(self._compact_level(level))
+                    if self._size() < self._max_size:
+                        break
+
+    def update(self, value: float):
+        """Add a single value to the sketch"""
+        value = float(value)
+        self.compactors[0].append(value)
+        self.n += 1
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+        self._compress()
+
+    def extend(self, values: Iterable[float]):
+        for value in values:
+            self.update(value)
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Merge another sketch into this one (in place) and return self"""
+        if other.n == 0:
+            return self
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        if self.min_value is None or other.min_value < self.min_value:
+            self.min_value = other.min_value
+        if self.max_value is None or other.max_value > self.max_value:
+            self.max_value = other.max_value
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        weighted = []
+        for level, items in enumerate(self.compactors):
+            weight = 1 << level
+            weighted.extend((item, weight) for item in items)
+        weighted.sort(key=lambda pair: pair[0])
+        return weighted
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """Return approximate values at each requested quantile (0..1)"""
+        qs = list(qs)
+        if self.n == 0:
+            return [None for _ in qs]
+        weighted = self._weighted_items()
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min_value)
+                continue
+            if q >= 1:
+                results.append(self.max_value)
+                continue
+            target = q * total
+            cumulative = 0
+            value = weighted[-1][0]
+            for item, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    value = item
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+    def to_dict(self) -> Dict:
+        """Serialize into a JSON friendly dict for storage"""
+        return {
+            "k": self.k,
+            "c": self.c,
+            "n": self.n,
+            "min": self.min_value,
+            "max": self.max_value,
+            "compactors": self.compactors,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "KLLSketch":
+        if not data:
+            return cls()
+        sketch = cls(k=data.get("k", 200), c=data.get("c", 2.0 / 3.0))
+        sketch.n = data.get("n", 0)
+        sketch.min_value = data.get("min")
+        sketch.max_value = data.get("max")
+        sketch.compactors = [list(items) for items in data.get("compactors", [[]])] or [[]]
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        return sketch
@@ -0,0 +1,8 @@
+# Bayesian average: every center starts with RATING_PRIOR_WEIGHT ratings of RATING_PRIOR_MEAN
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 5.0
+
+
+def bayesian_average(rating_sum, rating_count):
+    """Works on plain numbers and on SQL column expressions"""
+    return (RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT + rating_sum) / (RATING_PRIOR_WEIGHT + rating_count)
@@ -0,0 +1,162 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are swept after this many writes
+_SWEEP_EVERY = 1000
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS window_claims ("
+    " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, result TEXT)",
+    "CREATE TABLE IF NOT EXISTS window_events (key TEXT NOT NULL, ts REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_window_events_key_ts ON window_events (key, ts)",
+)
+
+
+class SlidingWindowStore:
+    """
+    Time windows keyed by string, for two jobs:
+
+    * claims: the first caller for a key owns it for `window` seconds and can
+      attach its result; repeats inside the window get that result back
+    * events: count how often a key was hit in the last `window` seconds
+
+    Each worker keeps recent keys in memory. Workers on the same host share
+    state through a small SQLite file (`path`), whose conditional upsert makes
+    the claim atomic across processes. Without a path, or if the file cannot
+    be used, windows are per worker.
+    """
+
+    def __init__(self, path: Optional[str] = None, maxkeys: int = 100_000):
+        self.path = path
+        self.maxkeys = maxkeys
+        self._lock = threading.Lock()
+        self._claims: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._events: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._local = threading.local()
+        self._writes = 0
+        self._longest_window = 0.0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+            except sqlite3.Error:
+                logger.exception("Sliding window store %s unavailable; using per-worker windows", self.path)
+                self.path = None
+                return None
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, expires_at: float, result: Optional[str]):
+        with self._lock:
+            self._claims[key] = (expires_at, result)
+            self._claims.move_to_end(key)
+            while len(self._claims) > self.maxkeys:
+                self._claims.popitem(last=False)
+
+    def _swept(self, conn: sqlite3.Connection, now: float):
+        self._writes += 1
+        if self._writes % _SWEEP_EVERY == 0:
+            conn.execute("DELETE FROM window_claims WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM window_events WHERE ts <= ?", (now - self._longest_window,))
+
+    def claim(self, key: str, window: float, now: Optional[float] = None) -> Tuple[bool, Optional[Dict]]:
+        """
+        (True, None) if the caller now owns `key` for `window` seconds. Otherwise
+        (False, result) with the owner's result, or None while the owner is still working.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._claims.get(key)
+        if entry is not None and entry[0] > now and entry[1] is not None:
+            return False, json.loads(entry[1])
+
+        conn = self._connection()
+        if conn is not None:
+            try:
+                claimed = conn.execute(
+                    "INSERT INTO window_claims (key, expires_at, result) VALUES (?, ?, NULL) "
+                    "ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at, result = NULL "
+                    "WHERE window_claims.expires_at <= ?",
+                    (key, now + window, now),
+                ).rowcount == 1
+                if claimed:
+                    self._swept(conn, now)
+                    self._remember(key, now + window, None)
+                    return True, None
+                row = conn.execute("SELECT expires_at, result FROM window_claims WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] is not None:
+                    self._remember(key, row[0], row[1])
+                return False, json.loads(row[1]) if row and row[1] else None
+            except sqlite3.Error:
+                logger.exception("Sliding window claim failed; using the per-worker window")
+
+        with self._lock:
+            entry = self._claims.get(key)
+            if entry is not None and entry[0] > now:
+                return False, json.loads(entry[1]) if entry[1] else None
+        self._remember(key, now + window, None)
+        return True, None
+
+    def complete(self, key: str, result: Dict):
+        """Attach the owner's result so repeats inside the window get it"""
+        value = json.dumps(result)
+        with self._lock:
+            entry = self._claims.get(key)
+        expires_at = entry[0] if entry is not None else time.time()
+        self._remember(key, expires_at, value)
+        conn = self._connection()
+        if conn is not None:
+            try:
+                conn.execute("UPDATE window_claims SET result = ? WHERE key = ?", (value, key))
+            except sqlite3.Error:
+                logger.exception("Sliding window result not shared")
+
+    def release(self, key: str):
+        """Give up a claim, e.g. because the owner failed and a retry should run"""
+        with self._lock:
+            self._claims.pop(key, None)
+        conn = self._connection()
+        if conn is not None:
+            try:
+                conn.execute("DELETE FROM window_claims WHERE key = ?", (key,))
+            except sqlite3.Error:
+                logger.exception("Sliding window claim not released")
+
+    def hit(self, key: str, window: float, now: Optional[float] = None) -> int:
+        """Record one event for `key`; returns the events in the last `window` seconds, this one included"""
+        now = time.time() if now is None else now
+        self._longest_window = max(self._longest_window, window)
+        conn = self._connection()
+        if conn is not None:
+            try:
+                conn.execute("INSERT INTO window_events (key, ts) VALUES (?, ?)", (key, now))
+                self._swept(conn, now)
+                return conn.execute(
+                    "SELECT COUNT(*) FROM window_events WHERE key = ? AND ts > ?", (key, now - window)
+                ).fetchone()[0]
+            except sqlite3.Error:
+                logger.exception("Sliding window event not shared; counting per worker")
+
+        with self._lock:
+            events = self._events.setdefault(key, deque())
+            self._events.move_to_end(key)
+            events.append(now)
+            while events and events[0] <= now - window:
+                events.popleft()
+            while len(self._events) > self.maxkeys:
+                self._events.popitem(last=False)
+            return len(events)
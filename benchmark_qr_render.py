@@ -0,0 +1,84 @@
+"""
+Benchmark of check-in QR rendering, in QR codes per second per core.
+
+    before   qrcode.make + PNG + base64 in the request thread (the old path)
+    inline   the new PNG encoding (fixed mask) in the request thread
+    png      the pooled renderer with a cold cache (unique payloads)
+    cached   the pooled renderer answering a repeated payload
+    svg      compact SVG path
+    token    raw token only, rendered by the client
+
+Request threads call the renderer concurrently, like the API's threadpool does.
+Per-core figures divide by the request process plus the pool processes.
+
+    python benchmark_qr_render.py --seconds 3 --threads 8 --processes 2
+"""
+import argparse
+import base64
+import io
+import os
+import threading
+import time
+import qrcode
+from app.services.qr_render import PNG, SVG, TOKEN, PNGRenderer, render_png_base64, render_qr
+from app.services.qr_tokens import issue_qr_token
+
+
+def render_before(payload):
+    qr_img = qrcode.make(payload)
+    buf = io.BytesIO()
+    qr_img.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def measure(render, seconds, threads):
+    done = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(index):
+        count = 0
+        while time.perf_counter() < stop:
+            render(issue_qr_token(index + 1, count % 500 + 1))
+            count += 1
+        done[index] = count
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    began = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(done) / (time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=2, help="PNG pool size")
+    args = parser.parse_args()
+
+    renderer = PNGRenderer(processes=args.processes)
+    renderer.render(issue_qr_token(1, 1))  # start the pool outside the timing
+    repeated = issue_qr_token(1, 1)
+    pooled_cores = min(1 + args.processes, os.cpu_count() or 1)
+
+    cases = [
+        ("before", render_before, 1),
+        ("inline", render_png_base64, 1),
+        (PNG, renderer.render, pooled_cores),
+        ("cached", lambda token: renderer.render(repeated), 1),
+        (SVG, lambda token: render_qr(token, SVG), 1),
+        (TOKEN, lambda token: render_qr(token, TOKEN), 1),
+    ]
+    print(f"{'mode':<8}{'codes/s':>12}{'cores':>7}{'per core':>12}")
+    try:
+        for name, render, cores in cases:
+            rate = measure(render, args.seconds, args.threads)
+            print(f"{name:<8}{rate:>12,.0f}{cores:>7}{rate / cores:>12,.0f}")
+    finally:
+        renderer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
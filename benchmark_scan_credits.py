@@ -0,0 +1,146 @@
+"""
+Concurrency benchmark for flex-credit deduction on the scan path.
+
+Many gate threads scan the same few users at once, each user holding fewer
+credits than the scans aimed at them. Reports gate throughput and overdrafts:
+check-ins recorded beyond what a user could pay for, or negative balances.
+Exits non-zero on any overdraft, on database errors, or if no scan was accepted.
+
+    python benchmark_scan_credits.py                  # atomic conditional UPDATE
+    python benchmark_scan_credits.py --naive          # old read, compare, write
+    python benchmark_scan_credits.py --url postgresql://...
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models.center import Center
+from app.models.check_in import CheckIn
+from app.models.credit_ledger import CreditLedgerEntry
+from app.models.user import User
+from app.services.flex_credits import deduct_flex_credit
+
+
+def atomic_scan(db, user_id, center):
+    if deduct_flex_credit(db, user_id, center.credit_required) is None:
+        db.rollback()
+        return False
+    db.add(CheckIn(user_id=user_id, center_id=center.id))
+    db.commit()
+    return True
+
+
+def naive_scan(db, user_id, center):
+    user = db.query(User).filter(User.id == user_id).first()
+    if user.flex_credit < center.credit_required:
+        db.rollback()
+        return False
+    user.flex_credit -= center.credit_required
+    db.add(CheckIn(user_id=user_id, center_id=center.id))
+    db.commit()
+    return True
+
+
+def run(url, threads, users, credits, scans_per_user, naive):
+    connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, pool_size=threads, max_overflow=0)
+    # Every table the deduction path writes to
+    Base.metadata.create_all(
+        bind=engine, tables=[User.__table__, Center.__table__, CheckIn.__table__, CreditLedgerEntry.__table__]
+    )
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        center = Center(name="Gate", address="1 Bench Road", state="Lagos", credit_required=1)
+        db.add(center)
+        db.add_all([
+            User(
+                email=f"bench{i}@example.com", full_name=f"Bench {i}", hashed_password="x",
+                flex_credit=credits
+            )
+            for i in range(users)
+        ])
+        db.commit()
+        center_id = center.id
+        user_ids = [user_id for (user_id,) in db.query(User.id).filter(User.email.like("bench%")).all()]
+
+    # Every thread walks all users, so each user is hit from many gates at once
+    per_thread = [user_ids * (scans_per_user // threads) for _ in range(threads)]
+    scan = naive_scan if naive else atomic_scan
+    counts = {"accepted": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def gate(targets):
+        accepted = rejected = errors = 0
+        with Session() as db:
+            center = db.get(Center, center_id)
+            start.wait()
+            for user_id in targets:
+                try:
+                    if scan(db, user_id, center):
+                        accepted += 1
+                    else:
+                        rejected += 1
+                except OperationalError:
+                    db.rollback()
+                    errors += 1
+        with lock:
+            counts["accepted"] += accepted
+            counts["rejected"] += rejected
+            counts["errors"] += errors
+
+    workers = [threading.Thread(target=gate, args=(targets,)) for targets in per_thread]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+
+    with Session() as db:
+        check_ins = dict(db.query(CheckIn.user_id, func.count(CheckIn.id)).filter(
+            CheckIn.user_id.in_(user_ids)
+        ).group_by(CheckIn.user_id).all())
+        balances = dict(db.query(User.id, User.flex_credit).filter(User.id.in_(user_ids)).all())
+    overdrafts = sum(max(0, check_ins.get(user_id, 0) - credits) for user_id in user_ids)
+    negative = sum(1 for balance in balances.values() if balance < 0)
+    lost = sum(1 for user_id in user_ids if balances[user_id] != credits - check_ins.get(user_id, 0))
+    engine.dispose()
+
+    attempts = sum(counts.values())
+    print(f"mode: {'naive read-compare-write' if naive else 'atomic conditional UPDATE'}")
+    print(f"gates: {threads}  users: {users}  credits each: {credits}  scans: {attempts}")
+    print(f"throughput: {attempts / elapsed:,.0f} scans/s  ({elapsed:.2f}s)")
+    print(f"accepted: {counts['accepted']}  rejected: {counts['rejected']}  db errors: {counts['errors']}")
+    print(f"overdrafted check-ins: {overdrafts}  negative balances: {negative}  balances out of step: {lost}")
+    # A run where scans failed or none went through proves nothing
+    failed = counts["errors"] > 0 or counts["accepted"] == 0
+    return overdrafts + negative + lost + failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL; defaults to a throwaway SQLite file")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--credits", type=int, default=25)
+    parser.add_argument("--scans-per-user", type=int, default=64)
+    parser.add_argument("--naive", action="store_true", help="Benchmark the old read-compare-write path")
+    args = parser.parse_args()
+
+    if args.url:
+        return run(args.url, args.threads, args.users, args.credits, args.scans_per_user, args.naive)
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        return run(url, args.threads, args.users, args.credits, args.scans_per_user, args.naive)
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if main() else 0)
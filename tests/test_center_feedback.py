@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.db.database import Base
+from app.db.migrations import add_missing_columns
+from app.models.center import Center
+from app.services.center_feedback import add_rating, ensure_center_feedback
+
+
+def test_upgraded_table_keeps_rating_history():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        # centers as created before rating sums and Bayesian scores existed
+        connection.execute(text(
+            "CREATE TABLE centers (id INTEGER PRIMARY KEY, name VARCHAR, address VARCHAR, state VARCHAR, "
+            "latitude FLOAT, longitude FLOAT, center_type VARCHAR, credit_required INTEGER, rating FLOAT, "
+            "rating_count INTEGER, comments JSON)"
+        ))
+        connection.execute(text(
+            "INSERT INTO centers (id, name, state, rating, rating_count, comments) "
+            "VALUES (1, 'Rated', 'Lagos', 4.5, 10, '[]'), (2, 'New', 'Lagos', 0.0, 0, '[]')"
+        ))
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    with Session(engine) as db:
+        ensure_center_feedback(db)
+        rated = db.get(Center, 1)
+        assert rated.rating_sum == 45.0
+        assert db.get(Center, 2).rating_sum == 0.0
+
+        average, count, _ = add_rating(db, 1, 5)
+        assert count == 11
+        assert abs(average - 50.0 / 11) < 1e-9
+
+        # A second startup does not count the history twice
+        ensure_center_feedback(db)
+        db.expire_all()
+        assert db.get(Center, 1).rating_sum == 50.0
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.database import Base
+from app.models.activity import Activity
+from app.models.activity_meta import ActivityJoin
+from app.models.center import Center
+from app.models.discovery import ClassSlot
+from app.services.class_discovery import ensure_class_slots, release_activity_spot, reserve_activity_spot
+
+
+def test_spots_are_taken_and_given_back():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        # activity_joins as created before joins were unique, holding a duplicate join
+        connection.execute(text("CREATE TABLE activity_joins (id INTEGER PRIMARY KEY, activity_id INTEGER, user_id INTEGER)"))
+        connection.execute(text("INSERT INTO activity_joins (activity_id, user_id) VALUES (1, 7), (1, 7)"))
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as db:
+        db.add(Center(name="Gym", address="1 Road", state="Lagos", latitude=6.5, longitude=3.3, business_id=1))
+        db.add(Activity(id=1, business_id=1, name="Run club", date=date.today() + timedelta(days=1),
+                        time="07:00", location="Park", capacity=2, is_active=True))
+        db.commit()
+        ensure_class_slots(db)
+
+        assert db.query(ActivityJoin).count() == 1
+        assert any(index["unique"] for index in inspect(engine).get_indexes("activity_joins"))
+        assert db.get(Activity, 1).join_count == 1
+
+        assert reserve_activity_spot(db, 1)
+        assert not reserve_activity_spot(db, 1)
+        for _ in range(3):
+            release_activity_spot(db, 1)
+        db.commit()
+
+        assert db.get(Activity, 1).join_count == 0
+        assert db.query(ClassSlot).filter_by(source_id=1).one().booked == 0
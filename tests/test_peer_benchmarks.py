@@ -0,0 +1,15 @@
+import numpy as np
+
+from app.services.peer_benchmarks import percentile_rank_within_groups
+
+
+def test_percentile_rank_is_computed_within_each_group():
+    values = np.array([3.0, 1.0, 2.0, 2.0, np.nan, 5.0, 10.0, 7.0])
+    groups = np.array([0, 0, 0, 0, 0, 1, 1, 1])
+
+    ranks = percentile_rank_within_groups(values, groups)
+
+    # Ties share the mid rank and NaN does not count towards the group
+    np.testing.assert_allclose(ranks[:4], [87.5, 12.5, 50.0, 50.0])
+    assert np.isnan(ranks[4])
+    np.testing.assert_allclose(ranks[5:], [100 / 6, 500 / 6, 50.0])
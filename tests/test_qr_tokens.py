@@ -0,0 +1,30 @@
+import pytest
+
+from app.services.qr_tokens import InvalidQRToken, issue_qr_token, verify_qr_token
+from app.utils.nonce_cache import NonceCache
+
+
+def test_token_round_trips_and_rejects_tampering():
+    token = issue_qr_token(42, 7, ttl_seconds=60, now=1000, secret="s")
+    claims = verify_qr_token(token, now=1030, secret="s")
+    assert (claims.user_id, claims.center_id, claims.expires_at) == (42, 7, 1060)
+
+    with pytest.raises(InvalidQRToken):
+        verify_qr_token(token, now=1030, secret="other")
+    with pytest.raises(InvalidQRToken):
+        verify_qr_token(token[:40] + ("A" if token[40] != "A" else "B") + token[41:], now=1030, secret="s")
+    with pytest.raises(InvalidQRToken, match="expired"):
+        verify_qr_token(token, now=1060, secret="s")
+
+
+def test_nonce_cache_rejects_replays_until_expiry():
+    cache = NonceCache(horizon=10, maxsize=3)
+    assert cache.add("a", expires_at=105, now=100)
+    assert not cache.add("a", expires_at=105, now=104)
+    assert cache.add("a", expires_at=115, now=105)
+
+    # Past maxsize the entries closest to expiry are dropped first
+    for nonce in ("b", "c", "d"):
+        cache.add(nonce, expires_at=110, now=105)
+    assert len(cache) <= 3
+    assert "a" in cache and "d" in cache
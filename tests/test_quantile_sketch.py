@@ -0,0 +1,24 @@
+import random
+
+from app.utils.quantile_sketch import KLLSketch
+
+
+def test_merged_sketch_quantiles_are_close_to_exact():
+    rng = random.Random(7)
+    values = [rng.uniform(0, 100) for _ in range(20000)]
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    left.extend(values[:10000])
+    right.extend(values[10000:])
+
+    merged = KLLSketch.from_dict(left.to_dict()).merge(right)
+    exact = sorted(values)
+
+    assert merged.n == len(values)
+    for q in (0.5, 0.9, 0.99):
+        assert abs(merged.quantile(q) - exact[int(q * len(exact)) - 1]) < 2.0
+    assert merged.quantile(0) == exact[0]
+    assert merged.quantile(1) == exact[-1]
+
+
+def test_empty_sketch_returns_none():
+    assert KLLSketch().quantiles([0.5]) == [None]
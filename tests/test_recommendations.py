@@ -0,0 +1,22 @@
+import numpy as np
+
+from app.services import recommendations
+from app.services.recommendations import cooccurrence_top_n
+
+
+def test_cooccurrence_top_n_ranks_co_visited_items(monkeypatch):
+    users = np.array([1, 1, 1, 2, 2, 3, 3, 3, 3, 4, 1])
+    items = np.array([10, 20, 30, 10, 20, 20, 30, 40, 10, 50, 10])
+
+    item, neighbor, score = cooccurrence_top_n(users, items, top_n=2)
+
+    # 50 was only visited by a user with nothing else, so it has no neighbours
+    assert 50 not in item and 50 not in neighbor
+    assert list(neighbor[item == 10]) == [20, 30]
+    assert np.all(np.diff(score[item == 10]) <= 0)
+
+    # Chunked pair generation gives the same answer
+    monkeypatch.setattr(recommendations, "PAIR_CHUNK", 3)
+    chunked = cooccurrence_top_n(users, items, top_n=2)
+    np.testing.assert_array_equal(chunked[1], neighbor)
+    np.testing.assert_allclose(chunked[2], score)
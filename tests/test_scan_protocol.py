@@ -0,0 +1,81 @@
+import base64
+import struct
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.services.qr_tokens import TOKEN_BYTES, issue_qr_token, verify_qr_token
+from app.services.scan_protocol import (
+    PROTOCOL_VERSION, UNKNOWN_REASON, decode_batch_request, decode_scan_request, encode_batch_response,
+    encode_scan_response
+)
+
+
+def _raw_token(user_id=42, center_id=7):
+    token = issue_qr_token(user_id, center_id, now=1000, secret="s")
+    return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+
+def _batch(scans, center_id=7, device_id=b"gate-1", version=PROTOCOL_VERSION, count=None):
+    body = struct.pack(">BI16sH", version, center_id, device_id, len(scans) if count is None else count)
+    for scan_id, scanned_at, token in scans:
+        body += struct.pack(f">16sI{TOKEN_BYTES}s", scan_id, scanned_at, token)
+    return body
+
+
+def test_batch_request_round_trips():
+    token = _raw_token()
+    raw_id = uuid.UUID(int=1).bytes
+    center_id, device_id, scans = decode_batch_request(
+        _batch([(b"scan-1", 1_700_000_000, token), (raw_id, 1_700_000_060, token)])
+    )
+
+    assert (center_id, device_id) == (7, "gate-1")
+    assert [scan["scan_id"] for scan in scans] == ["scan-1", raw_id.hex()]
+    assert scans[0]["scanned_at"] == datetime(2023, 11, 14, 22, 13, 20)
+    assert verify_qr_token(scans[0]["token"], now=1000, secret="s").user_id == 42
+
+    body = encode_batch_response([
+        {"scan_id": "scan-1", "status": "accepted", "detail": None, "user_id": 42, "remaining_flex_credit": 3},
+        {"scan_id": raw_id.hex(), "status": "rejected", "detail": "QR code already used", "user_id": 42,
+         "remaining_flex_credit": None},
+        {"scan_id": "scan-3", "status": "rejected", "detail": "Something new", "user_id": None,
+         "remaining_flex_credit": None},
+    ], accepted=1, rejected=2, duplicates=0)
+    assert struct.unpack_from(">BHHH", body) == (PROTOCOL_VERSION, 1, 2, 0)
+    items = list(struct.iter_unpack(">16sBBIi", body[struct.calcsize(">BHHH"):]))
+    assert items[0] == (b"scan-1".ljust(16, b"\0"), 0, 0, 42, 3)
+    assert items[1] == (raw_id, 1, 3, 42, -1)
+    assert items[2][2:] == (UNKNOWN_REASON, 0, -1)
+
+
+def test_single_scan_round_trips():
+    token = _raw_token()
+    assert decode_scan_request(struct.pack(f">BI{TOKEN_BYTES}s", PROTOCOL_VERSION, 0, token)) == (None, token)
+    assert struct.unpack(">Bi", encode_scan_response(5)) == (PROTOCOL_VERSION, 5)
+
+
+def test_truncated_frames_are_rejected():
+    token = bytes(TOKEN_BYTES)
+    body = _batch([(b"scan-1", 1_700_000_000, token)])
+    with pytest.raises(ValueError, match="truncated"):
+        decode_batch_request(body[:5])
+    with pytest.raises(ValueError, match="length"):
+        decode_batch_request(body[:-1])
+    with pytest.raises(ValueError):
+        decode_scan_request(struct.pack(f">BI{TOKEN_BYTES}s", PROTOCOL_VERSION, 7, token)[:-1])
+
+
+def test_bad_version_is_rejected():
+    with pytest.raises(ValueError, match="version"):
+        decode_batch_request(_batch([], version=PROTOCOL_VERSION + 1))
+    with pytest.raises(ValueError, match="version"):
+        decode_scan_request(struct.pack(f">BI{TOKEN_BYTES}s", PROTOCOL_VERSION + 1, 7, bytes(TOKEN_BYTES)))
+
+
+def test_oversize_batch_is_rejected_from_the_header():
+    # The count alone is enough: no scans need to be sent for the check
+    with pytest.raises(ValueError, match="At most 500"):
+        decode_batch_request(_batch([], count=501), max_scans=500)
+    assert decode_batch_request(_batch([]), max_scans=500)[2] == []
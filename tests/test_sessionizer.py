@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db.database import Base
+from app.models.analytics import AnalyticsSession
+from app.services.sessionizer import run_sessionizer
+
+
+def test_resumed_sessions_expire_in_activity_order():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1, 9, 0)
+
+    with Session(engine) as db:
+        # Stored out of order: the idle session has the middle id
+        for user_id, ended_at, last_event_id in ((1, start + timedelta(minutes=20), 3),
+                                                 (2, start, 1),
+                                                 (3, start + timedelta(minutes=10), 2)):
+            db.add(AnalyticsSession(business_id=1, user_id=user_id, started_at=ended_at, ended_at=ended_at,
+                                    event_count=1, last_event_id=last_event_id, is_open=True))
+        db.commit()
+
+        result = run_sessionizer(db, now=start + timedelta(minutes=40))
+
+        open_users = {user_id for (user_id,) in db.query(AnalyticsSession.user_id).filter(AnalyticsSession.is_open)}
+        assert open_users == {1, 3}
+        assert result["sessions_closed"] == 1
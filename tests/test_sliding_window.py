@@ -0,0 +1,26 @@
+import pytest
+
+from app.utils.sliding_window import SlidingWindowStore
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_claim_shares_the_first_result_until_the_window_ends(tmp_path, shared):
+    path = str(tmp_path / "windows.db") if shared else None
+    first, second = SlidingWindowStore(path), SlidingWindowStore(path)
+    other = second if shared else first
+
+    assert first.claim("scan:1:2", 10, now=100) == (True, None)
+    assert other.claim("scan:1:2", 10, now=101) == (False, None)
+    first.complete("scan:1:2", {"remaining_flex_credit": 4})
+    assert other.claim("scan:1:2", 10, now=105) == (False, {"remaining_flex_credit": 4})
+    assert other.claim("scan:1:2", 10, now=110) == (True, None)
+
+    other.release("scan:1:2")
+    assert first.claim("scan:1:2", 10, now=111) == (True, None)
+
+
+def test_hit_counts_events_inside_the_window(tmp_path):
+    store = SlidingWindowStore(str(tmp_path / "windows.db"))
+    assert [store.hit("topup:1", 60, now=t) for t in (0, 10, 20)] == [1, 2, 3]
+    assert store.hit("topup:1", 60, now=65) == 3
+    assert store.hit("topup:2", 60, now=65) == 1